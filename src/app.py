@@ -1,16 +1,131 @@
-from flask import Flask
+import os
+import hmac
+import click
+from functools import wraps
+from flask import Flask, Response, current_app, jsonify, request
 from flask_cors import CORS
 from routes.transacoes_routes import transacoes_bp
 from routes.auth_routes import auth_bp
 from routes.graficos_routes import charts_bp
+from sqlalchemy import select, func
+from models import engine, session, estatisticas_pool, migrar, explicar, indices_usados, Transacao, Usuario
+from services.resumo_service import reconstruir
+from services.cache_service import cache_graficos, colunas_usuarios, modelos_categorias
+from services.senhas_service import pool_hash
+from utils.metricas import instrumentar, exportar_prometheus
+from services.transacoes_service import filtros_transacoes
 
+MIGRAR_NA_INICIALIZACAO = os.environ.get("MIGRAR_NA_INICIALIZACAO", "0").lower() in ("1", "true")
+# Token exigido pelas rotas de operação; sem ele essas rotas não existem
+STATUS_TOKEN = os.environ.get("STATUS_TOKEN")
 
-app = Flask(__name__)
-CORS(app)
 
-app.register_blueprint(transacoes_bp)
-app.register_blueprint(auth_bp)
-app.register_blueprint(charts_bp)
+def status_interno(f):
+    """Restringe a rota a quem envia `Authorization: Bearer <STATUS_TOKEN>`"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        esperado = current_app.config["STATUS_TOKEN"]
+        if not esperado:
+            return jsonify({"error": "Não encontrado"}), 404
+        enviado = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+        if not hmac.compare_digest(enviado.encode(), esperado.encode()):
+            return jsonify({"error": "Token de status inválido"}), 401
+        return f(*args, **kwargs)
+    return decorated
+
+
+@click.command("reconstruir-resumos")
+@click.option("--user-id", type=int, default=None, help="Reconstrói apenas os resumos deste usuário")
+def reconstruir_resumos_command(user_id):
+    reconstruir(user_id)
+    click.echo("Resumos mensais reconstruídos")
+
+
+@click.command("init-db")
+def init_db_command():
+    """Cria o schema e aplica as migrações pendentes"""
+    aplicadas = migrar(engine)
+    click.echo(f"Migrações aplicadas: {aplicadas}" if aplicadas else "Banco já está atualizado")
+
+
+@click.command("explicar-consultas")
+@click.option("--user-id", type=int, default=1, help="Usuário usado como exemplo nos filtros")
+def explicar_consultas_command(user_id):
+    usuario = session.get(Usuario, user_id) or Usuario(id=user_id)
+    ordem = (Transacao.data.desc(), Transacao.id.desc())
+    consultas = {
+        "transacoes por período": select(Transacao).where(
+            *filtros_transacoes(usuario, {"data_inicio": "2024-01-01", "data_fim": "2024-12-31"})
+        ).order_by(*ordem),
+        "transacoes por categoria": select(Transacao).where(
+            *filtros_transacoes(usuario, {"categoria": "mercado"})
+        ).order_by(*ordem),
+        "total da categoria": select(func.sum(Transacao.valor)).where(
+            Transacao.user_id == usuario.id, func.lower(Transacao.categoria) == "mercado"
+        ),
+    }
+    with engine.connect() as conn:
+        for nome, consulta in consultas.items():
+            plano = explicar(conn, consulta)
+            click.echo(f"== {nome} (índices: {', '.join(sorted(indices_usados(conn, plano))) or 'nenhum'})")
+            for linha in plano:
+                click.echo(f"   {linha}")
+
+
+def create_app(migrar_schema=MIGRAR_NA_INICIALIZACAO):
+    """Monta a aplicação sem tocar no banco; o schema é criado por `flask init-db`.
+
+    Não abre conexões, então pode ser chamada no master do gunicorn com
+    `--preload` (veja gunicorn.conf.py).
+    """
+    if migrar_schema:
+        migrar(engine)
+
+    app = Flask(__name__)
+    app.config.setdefault("STATUS_TOKEN", STATUS_TOKEN)
+    CORS(app)
+    instrumentar(app, engine)
+
+    app.register_blueprint(transacoes_bp)
+    app.register_blueprint(auth_bp)
+    app.register_blueprint(charts_bp)
+
+    @app.teardown_appcontext
+    def remover_sessao(exc=None):
+        session.remove()
+
+    @app.route('/status/pool', methods=['GET'])
+    @status_interno
+    def route_estatisticas_pool():
+        return jsonify(estatisticas_pool())
+
+    @app.route('/status/cache', methods=['GET'])
+    @status_interno
+    def route_estatisticas_cache():
+        return jsonify(dict(
+            cache_graficos.estatisticas(), colunas=colunas_usuarios.tamanho(), modelos=modelos_categorias.tamanho()
+        ))
+
+    @app.route('/metrics', methods=['GET'])
+    @status_interno
+    def route_metricas():
+        pool = estatisticas_pool()
+        cache = cache_graficos.estatisticas()
+        extras = [
+            (f"invoice_pool_{nome}", pool[nome])
+            for nome in ("em_uso", "ociosas", "overflow", "checkouts", "timeouts", "espera_total_s")
+            if nome in pool
+        ] + [(f"invoice_cache_graficos_{nome}", cache[nome]) for nome in ("hits", "misses")]
+        extras += [(f"invoice_hash_senha_{nome}", valor) for nome, valor in pool_hash.estatisticas().items()]
+        return Response(exportar_prometheus(extras), mimetype="text/plain; version=0.0.4")
+
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(init_db_command, "migrar")
+    app.cli.add_command(reconstruir_resumos_command)
+    app.cli.add_command(explicar_consultas_command)
+
+    return app
+
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    create_app().run(debug=True)
@@ -0,0 +1,186 @@
+"""Modo ASGI: leituras do dashboard no event loop, com o engine assíncrono.
+
+Uso, a partir de src/:
+
+    uvicorn --factory asgi:create_asgi_app --workers 4 --port 5000
+
+/charts/* e GET /transacoes rodam em asyncio, com as mesmas respostas e ETags
+da aplicação Flask. As demais rotas, inclusive GET /transacoes?stream=1, seguem
+para `create_app()` numa thread, via asgiref. A aplicação síncrona continua
+disponível como antes, com gunicorn.conf.py.
+"""
+import json
+from urllib.parse import parse_qsl
+from asgiref.wsgi import WsgiToAsgi
+from werkzeug.http import parse_etags, quote_etag
+from app import create_app
+from models import engine_async, descartar_engine_async
+from services.leitura_async import (
+    gastos_por_categoria_async, gastos_gerais_async, insights_async, serie_temporal_async, linhas_transacoes_async
+)
+from services.transacoes_service import em_colunas
+from services.versao_service import versao_dados_async
+from utils.decorator import autenticar_async, calcular_etag
+
+ROTAS = {}
+
+
+def rota(caminho):
+    def registrar(funcao):
+        ROTAS[caminho] = funcao
+        return funcao
+    return registrar
+
+
+class Requisicao:
+    def __init__(self, scope):
+        self.metodo = scope["method"]
+        self.caminho = scope["path"]
+        self.argumentos = parse_qsl(scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True)
+        # como request.args.get do Flask: vale o primeiro valor de cada argumento
+        self.args = {}
+        for nome, valor in self.argumentos:
+            self.args.setdefault(nome, valor)
+        self.headers = {nome.decode("latin-1").lower(): valor.decode("latin-1") for nome, valor in scope["headers"]}
+
+
+@rota('/charts/categoria')
+async def rota_gastos_por_categoria(conexao, current_user, args):
+    try:
+        return 200, await gastos_por_categoria_async(
+            conexao, current_user, args.get('categoria'), args.get('data_inicio'), args.get('data_fim')
+        )
+    except ValueError:
+        return 400, {"error": "Formato de data inválido"}
+
+
+@rota('/charts/geral')
+async def rota_gastos_gerais(conexao, current_user, args):
+    try:
+        return 200, await gastos_gerais_async(
+            conexao, current_user, args.get('categoria'), args.get('data_inicio'), args.get('data_fim')
+        )
+    except ValueError:
+        return 400, {"error": "Formato de data inválido"}
+
+
+@rota('/charts/insights')
+async def rota_insights(conexao, current_user, args):
+    try:
+        return 200, await insights_async(conexao, current_user, args.get('data_inicio'), args.get('data_fim'))
+    except ValueError:
+        return 400, {"error": "Formato de data inválido"}
+
+
+@rota('/charts/serie')
+async def rota_serie_temporal(conexao, current_user, args):
+    try:
+        return 200, await serie_temporal_async(
+            conexao, current_user, args.get('granularidade', 'mes'), args.get('data_inicio'), args.get('data_fim'),
+            args.get('categoria'), args.get('por_categoria') in ('1', 'true'), args.get('max_pontos')
+        )
+    except ValueError as e:
+        return 400, {"error": str(e)}
+
+
+@rota('/transacoes')
+async def rota_listar_transacoes(conexao, current_user, args):
+    filtros = {nome: args.get(nome) for nome in ("categoria", "data_inicio", "data_fim", "valor_min", "valor_max", "busca")}
+    limit = args.get('limit')
+    cursor = args.get('cursor')
+    try:
+        paginado = bool(limit or cursor)
+        linhas, proximo_cursor = await linhas_transacoes_async(
+            conexao, current_user, filtros, (limit or 50) if paginado else None, cursor
+        )
+    except ValueError as e:
+        return 400, {"error": str(e)}
+
+    transacoes = em_colunas(linhas) if args.get('formato') == 'colunas' else [linha._asdict() for linha in linhas]
+    if paginado:
+        return 200, {"transacoes": transacoes, "proximo_cursor": proximo_cursor}
+    return 200, transacoes
+
+
+def _rota_assincrona(requisicao):
+    if requisicao.metodo != "GET":
+        return None
+    if requisicao.caminho == '/transacoes' and requisicao.args.get('stream') in ('1', 'true'):
+        return None
+    return ROTAS.get(requisicao.caminho)
+
+
+async def _processar(conexao, requisicao, funcao):
+    """Equivalente a `token_required` + `etag_por_versao` + a rota; retorna (status, dados, cabeçalhos)"""
+    token = None
+    auth_header = requisicao.headers.get('authorization', '')
+    if auth_header.startswith("Bearer "):
+        token = auth_header.split(" ")[1]
+    if not token:
+        return 401, {"error": "Token ausente"}, []
+
+    try:
+        current_user = await autenticar_async(conexao, token)
+        if not current_user:
+            return 401, {"error": "Usuário inválido"}, []
+    except Exception:
+        return 401, {"error": "Token inválido"}, []
+
+    versao = await versao_dados_async(conexao, current_user.id)
+    etag = calcular_etag(current_user.id, versao, requisicao.caminho, requisicao.argumentos)
+    cabecalhos = [
+        (b"etag", quote_etag(etag).encode()),
+        (b"cache-control", b"private, no-cache"),
+        (b"vary", b"Authorization"),
+    ]
+    if etag in parse_etags(requisicao.headers.get('if-none-match')):
+        return 304, None, cabecalhos
+
+    status, dados = await funcao(conexao, current_user, requisicao.args)
+    return status, dados, cabecalhos if status == 200 else []
+
+
+async def _atender(requisicao, funcao, send):
+    async with engine_async().connect() as conexao:
+        status, dados, cabecalhos = await _processar(conexao, requisicao, funcao)
+
+    corpo = b""
+    if dados is not None:
+        corpo = json.dumps(dados, separators=(",", ":"), sort_keys=True).encode("utf-8")
+        cabecalhos.append((b"content-type", b"application/json"))
+    cabecalhos.append((b"content-length", str(len(corpo)).encode()))
+    if "origin" in requisicao.headers:
+        # mesmo comportamento do CORS(app) da aplicação Flask
+        cabecalhos.append((b"access-control-allow-origin", b"*"))
+
+    await send({"type": "http.response.start", "status": status, "headers": cabecalhos})
+    await send({"type": "http.response.body", "body": corpo})
+
+
+async def _lifespan(receive, send):
+    while True:
+        mensagem = await receive()
+        if mensagem["type"] == "lifespan.startup":
+            engine_async()
+            await send({"type": "lifespan.startup.complete"})
+        elif mensagem["type"] == "lifespan.shutdown":
+            await descartar_engine_async()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+def create_asgi_app(app_wsgi=None):
+    """Aplicação ASGI; `app_wsgi` (padrão: `create_app()`) atende as rotas não assíncronas"""
+    sincrona = WsgiToAsgi(app_wsgi or create_app())
+
+    async def aplicacao(scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await _lifespan(receive, send)
+        if scope["type"] == "http":
+            requisicao = Requisicao(scope)
+            funcao = _rota_assincrona(requisicao)
+            if funcao is not None:
+                return await _atender(requisicao, funcao, send)
+        await sincrona(scope, receive, send)
+
+    return aplicacao
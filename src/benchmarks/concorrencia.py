@@ -0,0 +1,207 @@
+"""Requisições por segundo do dashboard com muitos clientes: Flask (WSGI) contra o modo ASGI.
+
+Uso, a partir de src/:
+
+    python -m benchmarks.concorrencia --clientes 128 --cargas 5
+    python -m benchmarks.concorrencia --clientes 256 --threads 16 --latencia-ms 5
+
+Cada cliente carrega o dashboard `--cargas` vezes (gráficos por categoria,
+geral, insights e a primeira página de transações), todos ao mesmo tempo. A
+aplicação Flask atende `--threads` requisições por vez, como um worker gthread
+do gunicorn; a ASGI atende todos os clientes num único event loop. Com
+`--latencia-ms`, cada comando SQL espera esse tempo na thread que o executa,
+simulando um banco acessado pela rede.
+"""
+import sys
+import json
+import time
+import asyncio
+import argparse
+import threading
+from collections import Counter
+from urllib.parse import urlsplit
+from datetime import datetime, timedelta, timezone
+from benchmarks.executar import _configurar_ambiente, _popular
+from benchmarks.login import _percentis
+
+DASHBOARD = ("/charts/categoria", "/charts/geral", "/charts/insights", "/transacoes?limit=50")
+
+
+def _argumentos(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clientes", type=int, default=128, help="Clientes do dashboard ao mesmo tempo")
+    parser.add_argument("--cargas", type=int, default=3, help="Vezes que cada cliente carrega o dashboard")
+    parser.add_argument("--threads", type=int, default=8, help="Requisições simultâneas na aplicação Flask")
+    parser.add_argument("--latencia-ms", type=float, default=0.0, help="Atraso por comando SQL")
+    parser.add_argument("--modos", default="wsgi,asgi")
+    parser.add_argument("--linhas", type=int, default=10_000)
+    parser.add_argument("--usuarios", type=int, default=10)
+    parser.add_argument("--anos", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--base", default=None, help="Arquivo SQLite da base sintética")
+    parser.add_argument("--saida", default=None, help="Arquivo JSON de resultado (padrão: stdout)")
+    return parser.parse_args(argv)
+
+
+def _simular_latencia(engine_sync, segundos, assincrono):
+    def atrasar(_sql):
+        time.sleep(segundos)
+
+    from sqlalchemy import event
+
+    @event.listens_for(engine_sync, "connect")
+    def _ao_conectar(dbapi_connection, _):
+        # o trace callback roda na thread que executa o comando: a da requisição ou a do aiosqlite
+        if assincrono:
+            dbapi_connection.run_async(lambda conexao: conexao.set_trace_callback(atrasar))
+        else:
+            dbapi_connection.set_trace_callback(atrasar)
+
+
+async def chamar_asgi(aplicacao, caminho, headers=None, metodo="GET", corpo=b""):
+    """Executa uma requisição na aplicação ASGI em processo; retorna (status, cabeçalhos, corpo)"""
+    url = urlsplit(caminho)
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": metodo, "scheme": "http", "path": url.path, "raw_path": url.path.encode(),
+        "query_string": url.query.encode(), "root_path": "",
+        "headers": [(nome.lower().encode(), valor.encode()) for nome, valor in (headers or {}).items()],
+        "server": ("localhost", 80), "client": ("127.0.0.1", 0),
+    }
+    enviado = False
+    resposta = {"status": None, "headers": {}, "corpo": b""}
+
+    async def receive():
+        nonlocal enviado
+        if enviado:
+            return {"type": "http.disconnect"}
+        enviado = True
+        return {"type": "http.request", "body": corpo, "more_body": False}
+
+    async def send(mensagem):
+        if mensagem["type"] == "http.response.start":
+            resposta["status"] = mensagem["status"]
+            resposta["headers"] = {n.decode().lower(): v.decode() for n, v in mensagem.get("headers", [])}
+        elif mensagem["type"] == "http.response.body":
+            resposta["corpo"] += mensagem.get("body", b"")
+
+    await aplicacao(scope, receive, send)
+    return resposta["status"], resposta["headers"], resposta["corpo"]
+
+
+def _resultado(duracao, status, tempos):
+    return {
+        "duracao_s": round(duracao, 3),
+        "requisicoes_por_s": round(sum(status.values()) / duracao, 2),
+        "status": {str(codigo): quantidade for codigo, quantidade in sorted(status.items())},
+        "latencia": _percentis(tempos),
+    }
+
+
+def _rodar_wsgi(app, tokens, args):
+    vagas = threading.BoundedSemaphore(args.threads)
+    tempos, status = [], Counter()
+    lock = threading.Lock()
+
+    def cliente(indice):
+        headers = {"Authorization": f"Bearer {tokens[indice % len(tokens)]}"}
+        with app.test_client() as client:
+            for _ in range(args.cargas):
+                for caminho in DASHBOARD:
+                    inicio = time.perf_counter()
+                    with vagas:
+                        codigo = client.get(caminho, headers=headers).status_code
+                    duracao = time.perf_counter() - inicio
+                    with lock:
+                        tempos.append(duracao)
+                        status[codigo] += 1
+
+    threads = [threading.Thread(target=cliente, args=(i,)) for i in range(args.clientes)]
+    inicio = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return _resultado(time.perf_counter() - inicio, status, tempos)
+
+
+async def _rodar_asgi(aplicacao, tokens, args):
+    from models import descartar_engine_async
+    tempos, status = [], Counter()
+
+    async def cliente(indice):
+        headers = {"Authorization": f"Bearer {tokens[indice % len(tokens)]}"}
+        for _ in range(args.cargas):
+            for caminho in DASHBOARD:
+                inicio = time.perf_counter()
+                codigo, _, _ = await chamar_asgi(aplicacao, caminho, headers)
+                tempos.append(time.perf_counter() - inicio)
+                status[codigo] += 1
+
+    try:
+        inicio = time.perf_counter()
+        await asyncio.gather(*(cliente(i) for i in range(args.clientes)))
+        return _resultado(time.perf_counter() - inicio, status, tempos)
+    finally:
+        await descartar_engine_async()
+
+
+def main(argv=None):
+    args = _argumentos(argv)
+    _configurar_ambiente(args)
+    _popular(args)
+
+    import jwt
+    from sqlalchemy import select
+    from app import create_app
+    from asgi import create_asgi_app
+    from models import engine, engine_async, session, Usuario
+    from utils.decorator import SECRET_KEY
+
+    expira = datetime.now(timezone.utc) + timedelta(hours=1)
+    tokens = [
+        jwt.encode({"user_id": user_id, "exp": expira}, SECRET_KEY, algorithm="HS256")
+        for user_id in session.execute(select(Usuario.id).order_by(Usuario.id)).scalars()
+    ]
+    session.remove()
+
+    modos = args.modos.split(",")
+    if args.latencia_ms:
+        engine.dispose()
+        _simular_latencia(engine, args.latencia_ms / 1000, False)
+        _simular_latencia(engine_async().sync_engine, args.latencia_ms / 1000, True)
+
+    app = create_app()
+    resultado = {
+        "meta": {
+            "clientes": args.clientes,
+            "cargas": args.cargas,
+            "requisicoes": args.clientes * args.cargas * len(DASHBOARD),
+            "threads_wsgi": args.threads,
+            "latencia_ms": args.latencia_ms,
+            "linhas": args.linhas,
+            "usuarios": args.usuarios,
+        },
+    }
+    if "wsgi" in modos:
+        print("wsgi...", file=sys.stderr)
+        resultado["wsgi"] = _rodar_wsgi(app, tokens, args)
+    if "asgi" in modos:
+        print("asgi...", file=sys.stderr)
+        resultado["asgi"] = asyncio.run(_rodar_asgi(create_asgi_app(app), tokens, args))
+    if "wsgi" in resultado and "asgi" in resultado:
+        resultado["asgi_sobre_wsgi"] = round(
+            resultado["asgi"]["requisicoes_por_s"] / resultado["wsgi"]["requisicoes_por_s"], 2
+        )
+
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            f.write(texto + "\n")
+    else:
+        print(texto)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,314 @@
+"""Benchmarks reprodutíveis do backend sobre uma base SQLite sintética.
+
+Uso, a partir de src/:
+
+    python -m benchmarks.executar --linhas 100000 --saida resultado.json
+    python -m benchmarks.executar --linhas 10000 --baseline benchmarks/baseline_10000.json
+
+A base é gerada com semente fixa e reaproveitada entre execuções com os mesmos
+parâmetros. O resultado é um JSON com os tempos de cada caso; com `--baseline`,
+cada caso é comparado com a mediana guardada e o processo sai com código 1 se
+`--falhar-em-regressao` estiver ligado e algum caso piorar além da tolerância.
+"""
+import os
+import io
+import sys
+import csv
+import json
+import time
+import argparse
+import platform
+import statistics
+import tempfile
+from datetime import datetime, timezone
+
+ESCALAS = (10_000, 100_000, 1_000_000)
+
+
+def _argumentos(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--linhas", type=int, default=ESCALAS[0], help="Transações na base (ex.: 10000, 100000, 1000000)")
+    parser.add_argument("--usuarios", type=int, default=10, help="Usuários entre os quais as linhas são divididas")
+    parser.add_argument("--anos", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--linhas-upload", type=int, default=None, help="Linhas do CSV de upload (padrão: 10%% da base, até 100 mil)")
+    parser.add_argument("--linhas-pdf", type=int, default=None, help="Linhas do PDF de upload (padrão: 1%% da base, até 5 mil)")
+    parser.add_argument("--base", default=None, help="Arquivo SQLite da base sintética")
+    parser.add_argument("--casos", default=None, help="Prefixos dos casos a rodar, separados por vírgula")
+    parser.add_argument("--saida", default=None, help="Arquivo JSON de resultado (padrão: stdout)")
+    parser.add_argument("--baseline", default=None, help="JSON de uma execução anterior para comparação")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="Variação relativa aceita antes de acusar regressão")
+    parser.add_argument("--falhar-em-regressao", action="store_true")
+    return parser.parse_args(argv)
+
+
+def _configurar_ambiente(args):
+    # precisa acontecer antes de importar `models`, que cria o engine na importação
+    caminho = args.base or os.path.join(
+        tempfile.gettempdir(), f"invoice-bench-{args.linhas}-{args.usuarios}-{args.anos}-{args.seed}.db"
+    )
+    os.environ["DATABASE_URL"] = f"sqlite:///{caminho}"
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    os.environ.setdefault("CACHE_GRAFICOS_BACKEND", "desligado")
+    return caminho
+
+
+def _popular(args):
+    from sqlalchemy import insert, select, func
+    from models import engine, session, migrar, Usuario, Transacao, reconstruir_resumos
+    from utils.categorias import categorizar_lote
+    from utils.faturas import gerar_historico_fake
+    from utils.validators import padronizar_categoria
+
+    migrar(engine)
+    if session.execute(select(func.count(Transacao.id))).scalar():
+        return False
+
+    usuarios = []
+    for i in range(args.usuarios):
+        usuario = Usuario(username=f"bench{i}", password_hash="-")
+        session.add(usuario)
+        usuarios.append(usuario)
+    session.commit()
+    ids = [u.id for u in usuarios]
+
+    def inserir(lote):
+        categorias = categorizar_lote([t["descricao"] for t in lote])
+        linhas = [
+            {
+                "user_id": ids[t["usuario"]],
+                "data": datetime.strptime(t["data"], "%Y-%m-%d").date(),
+                "descricao": t["descricao"],
+                "valor": t["valor"],
+                "categoria": padronizar_categoria(t["categoria"] or categoria),
+            }
+            for t, categoria in zip(lote, categorias)
+        ]
+        with engine.begin() as conn:
+            conn.execute(insert(Transacao.__table__), linhas)
+
+    lote = []
+    for transacao in gerar_historico_fake(args.linhas, args.usuarios, args.anos, args.seed):
+        lote.append(transacao)
+        if len(lote) == 10_000:
+            inserir(lote)
+            lote = []
+    if lote:
+        inserir(lote)
+
+    with engine.begin() as conn:
+        reconstruir_resumos(conn)
+    return True
+
+
+def _medir(funcao, repeticoes, preparar=None, limpar=None):
+    tempos = []
+    for _ in range(repeticoes):
+        contexto = preparar() if preparar else None
+        inicio = time.perf_counter()
+        funcao(contexto)
+        tempos.append(time.perf_counter() - inicio)
+        if limpar:
+            limpar(contexto)
+    return {
+        "repeticoes": repeticoes,
+        "min_s": round(min(tempos), 6),
+        "mediana_s": round(statistics.median(tempos), 6),
+        "media_s": round(statistics.fmean(tempos), 6),
+    }
+
+
+def _casos(args):
+    from sqlalchemy import delete, select
+    from models import session, Usuario, Transacao, ResumoMensal, VersaoDados, ModeloCategorias
+    from services import transacoes_service, graficos_service
+    from services.cache_service import colunas_usuarios
+    from services.graficos_service import gastos_por_categoria_service, gastos_gerais_service, insights_service, serie_temporal_service
+    from services.transacoes_service import (
+        listar_transacoes, linhas_transacoes, em_colunas, processar_csv, processar_pdf, gerar_fatura_pdf
+    )
+    from utils.categorias import categorizar, _categorizar_texto
+    from utils.decorator import Principal
+    from utils.faturas import gerar_historico_fake
+
+    usuario = Principal(*session.execute(
+        select(Usuario.id, Usuario.username).where(Usuario.username == "bench0")
+    ).one())
+    ano_final = 2024
+    ano_inicio = ano_final - args.anos + 1
+
+    # sufixo numérico: descrições reais trazem códigos de loja, e sem ele o lru_cache acerta tudo
+    descricoes = [
+        f"{t['descricao']} {i}"
+        for i, t in enumerate(gerar_historico_fake(min(args.linhas, 200_000), seed=args.seed + 1))
+    ]
+
+    def categorizar_tudo(_):
+        for descricao in descricoes:
+            categorizar(descricao)
+
+    linhas_upload = args.linhas_upload or min(max(args.linhas // 10, 1000), 100_000)
+    texto_csv = io.StringIO()
+    writer = csv.DictWriter(texto_csv, fieldnames=["data", "descricao", "valor", "categoria"])
+    writer.writeheader()
+    for t in gerar_historico_fake(linhas_upload, seed=args.seed + 2):
+        del t["usuario"]
+        writer.writerow(t)
+    conteudo_csv = texto_csv.getvalue()
+
+    linhas_pdf = args.linhas_pdf or min(max(args.linhas // 100, 100), 5000)
+    conteudo_pdf = gerar_fatura_pdf(qtd_itens=linhas_pdf, seed=args.seed + 3).getvalue()
+
+    def usuario_de_upload():
+        transacoes_service.cache_parse.limpar()
+        usuario = session.query(Usuario).filter_by(username="bench-upload").first()
+        if usuario is None:
+            usuario = Usuario(username="bench-upload", password_hash="-")
+            session.add(usuario)
+            session.commit()
+        return Principal(usuario.id, usuario.username)
+
+    def remover_uploads(usuario):
+        for modelo in (Transacao, ResumoMensal, VersaoDados, ModeloCategorias):
+            session.execute(delete(modelo).where(modelo.user_id == usuario.id))
+        session.commit()
+
+    filtros_listagem = {
+        "sem_filtro": {},
+        "categoria": {"categoria": "mercado"},
+        "periodo": {"data_inicio": f"{ano_final}-03-01", "data_fim": f"{ano_final}-05-31"},
+        "valor": {"valor_min": "100", "valor_max": "200"},
+        "busca": {"busca": "netflix"},
+    }
+    periodos = {
+        "tudo": {},
+        "meses_inteiros": {"data_inicio": f"{ano_inicio}-01-01", "data_fim": f"{ano_final}-12-31"},
+        "parcial": {"data_inicio": f"{ano_inicio}-01-15", "data_fim": f"{ano_final}-12-15"},
+    }
+
+    casos = {
+        "categorizar": (lambda _: (_categorizar_texto.cache_clear(), categorizar_tudo(_)), None, None),
+        "processar_csv": (
+            lambda u: processar_csv(u, io.StringIO(conteudo_csv)), usuario_de_upload, remover_uploads
+        ),
+        "processar_pdf": (
+            lambda u: processar_pdf(u, io.BytesIO(conteudo_pdf)), usuario_de_upload, remover_uploads
+        ),
+    }
+    for nome, filtros in filtros_listagem.items():
+        casos[f"listar_transacoes.{nome}"] = (lambda _, f=filtros: listar_transacoes(usuario, f), None, None)
+    casos["listar_transacoes.colunas"] = (lambda _: em_colunas(linhas_transacoes(usuario)[0]), None, None)
+    for nome, periodo in periodos.items():
+        casos[f"graficos.categoria.{nome}"] = (lambda _, p=periodo: gastos_por_categoria_service(usuario, **p), None, None)
+        casos[f"graficos.geral.{nome}"] = (lambda _, p=periodo: gastos_gerais_service(usuario, **p), None, None)
+        casos[f"graficos.insights.{nome}"] = (lambda _, p=periodo: insights_service(usuario, **p), None, None)
+    for granularidade in ("dia", "semana", "mes"):
+        casos[f"graficos.serie.{granularidade}"] = (
+            lambda _, g=granularidade: serie_temporal_service(usuario, g, por_categoria=True, max_pontos=365), None, None
+        )
+
+    def com_numpy(funcao):
+        def executar(_):
+            anterior, graficos_service.GRAFICOS_BACKEND = graficos_service.GRAFICOS_BACKEND, "numpy"
+            try:
+                return funcao()
+            finally:
+                graficos_service.GRAFICOS_BACKEND = anterior
+        return executar
+
+    # a primeira repetição carrega as colunas; `graficos_numpy.carga` mede só essa parte
+    casos["graficos_numpy.carga"] = (
+        com_numpy(lambda: (colunas_usuarios.limpar(), insights_service(usuario))), None, None
+    )
+    for nome, periodo in periodos.items():
+        casos[f"graficos_numpy.categoria.{nome}"] = (com_numpy(lambda p=periodo: gastos_por_categoria_service(usuario, **p)), None, None)
+        casos[f"graficos_numpy.geral.{nome}"] = (com_numpy(lambda p=periodo: gastos_gerais_service(usuario, **p)), None, None)
+        casos[f"graficos_numpy.insights.{nome}"] = (com_numpy(lambda p=periodo: insights_service(usuario, **p)), None, None)
+
+    tamanhos = {"categorizar": len(descricoes), "processar_csv": linhas_upload, "processar_pdf": linhas_pdf}
+    return casos, tamanhos
+
+
+def comparar(resultado, baseline, tolerancia=0.2):
+    """Razão entre as medianas de cada caso presente nas duas execuções"""
+    comparacao = {}
+    for nome, atual in resultado["casos"].items():
+        anterior = baseline.get("casos", {}).get(nome)
+        if not anterior or not anterior.get("mediana_s"):
+            continue
+        razao = atual["mediana_s"] / anterior["mediana_s"]
+        if razao > 1 + tolerancia:
+            situacao = "regressao"
+        elif razao < 1 - tolerancia:
+            situacao = "melhora"
+        else:
+            situacao = "igual"
+        comparacao[nome] = {
+            "baseline_s": anterior["mediana_s"],
+            "atual_s": atual["mediana_s"],
+            "razao": round(razao, 3),
+            "situacao": situacao,
+        }
+    return comparacao
+
+
+def main(argv=None):
+    args = _argumentos(argv)
+    caminho = _configurar_ambiente(args)
+
+    inicio = time.perf_counter()
+    populou = _popular(args)
+    tempo_populacao = time.perf_counter() - inicio
+    print(f"base {caminho} {'gerada' if populou else 'reaproveitada'} em {tempo_populacao:.1f}s", file=sys.stderr)
+
+    import sqlalchemy
+    casos, tamanhos = _casos(args)
+    prefixos = args.casos.split(",") if args.casos else None
+
+    resultado = {
+        "meta": {
+            "linhas": args.linhas,
+            "usuarios": args.usuarios,
+            "anos": args.anos,
+            "seed": args.seed,
+            "python": platform.python_version(),
+            "sqlalchemy": sqlalchemy.__version__,
+            "plataforma": platform.platform(),
+            "executado_em": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        },
+        "casos": {},
+    }
+    for nome, (funcao, preparar, limpar) in casos.items():
+        if prefixos and not any(nome.startswith(p) for p in prefixos):
+            continue
+        medida = _medir(funcao, args.repeticoes, preparar, limpar)
+        if nome in tamanhos:
+            medida["itens"] = tamanhos[nome]
+        resultado["casos"][nome] = medida
+        print(f"{nome:<40} {medida['mediana_s']:>10.4f}s", file=sys.stderr)
+
+    regressoes = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        escala = {k: baseline.get("meta", {}).get(k) for k in ("linhas", "usuarios", "anos", "seed")}
+        if escala != {k: resultado["meta"][k] for k in escala}:
+            print(f"aviso: baseline gerado com outra base ({escala})", file=sys.stderr)
+        resultado["comparacao"] = comparar(resultado, baseline, args.tolerancia)
+        for nome, c in resultado["comparacao"].items():
+            print(f"{nome:<40} x{c['razao']:<7} {c['situacao']}", file=sys.stderr)
+        regressoes = [n for n, c in resultado["comparacao"].items() if c["situacao"] == "regressao"]
+
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            f.write(texto + "\n")
+    else:
+        print(texto)
+
+    return 1 if regressoes and args.falhar_em_regressao else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""Relatório do tempo de importação da aplicação, via `python -X importtime`.
+
+Uso, a partir de src/:
+
+    python -m benchmarks.importacao
+    python -m benchmarks.importacao --saida importacao.json --limite-ms 800
+
+Roda `import app; app.create_app()` num processo novo, soma o tempo por pacote
+de topo e falha (código 1) se um módulo pesado for carregado na inicialização
+ou se o total passar de `--limite-ms`.
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+# só devem ser importados pelas rotas que os usam
+MODULOS_ADIADOS = ("pandas", "numpy", "pdfplumber", "pypdfium2", "reportlab")
+
+CODIGO = "import app; app.create_app()"
+
+
+def medir_importacao(codigo=CODIGO, ambiente=None):
+    """Executa `codigo` com -X importtime e retorna [(modulo, proprio_us, acumulado_us)]"""
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, **(ambiente or {}))
+    env.setdefault("DATABASE_URL", "sqlite://")
+    env.setdefault("SECRET_KEY", "importacao")
+    processo = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", codigo],
+        cwd=raiz, env=env, capture_output=True, text=True, check=True
+    )
+    modulos = []
+    for linha in processo.stderr.splitlines():
+        if not linha.startswith("import time:") or "self [us]" in linha:
+            continue
+        proprio, acumulado, nome = (parte.strip() for parte in linha[len("import time:"):].split("|"))
+        modulos.append((nome.strip(), int(proprio), int(acumulado)))
+    return modulos
+
+
+def relatorio(modulos, top=15):
+    por_pacote = {}
+    for nome, proprio, _ in modulos:
+        pacote = nome.split(".")[0]
+        por_pacote[pacote] = por_pacote.get(pacote, 0) + proprio
+    total_us = sum(proprio for _, proprio, _ in modulos)
+    carregados = {nome.split(".")[0] for nome, _, _ in modulos}
+    return {
+        "total_ms": round(total_us / 1000, 1),
+        "modulos": len(modulos),
+        "pacotes": [
+            {"pacote": pacote, "ms": round(us / 1000, 1)}
+            for pacote, us in sorted(por_pacote.items(), key=lambda item: -item[1])[:top]
+        ],
+        "adiados_carregados": sorted(m for m in MODULOS_ADIADOS if m in carregados),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--saida", default=None, help="Arquivo JSON do relatório (padrão: stdout)")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--limite-ms", type=float, default=None, help="Falha se o total passar deste tempo")
+    args = parser.parse_args(argv)
+
+    resultado = relatorio(medir_importacao(), args.top)
+    for item in resultado["pacotes"]:
+        print(f"{item['pacote']:<30} {item['ms']:>8.1f} ms", file=sys.stderr)
+    print(f"{'total':<30} {resultado['total_ms']:>8.1f} ms", file=sys.stderr)
+
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            f.write(texto + "\n")
+    else:
+        print(texto)
+
+    falhou = bool(resultado["adiados_carregados"])
+    if falhou:
+        print(f"módulos carregados na inicialização: {', '.join(resultado['adiados_carregados'])}", file=sys.stderr)
+    if args.limite_ms is not None and resultado["total_ms"] > args.limite_ms:
+        print(f"importação acima de {args.limite_ms} ms", file=sys.stderr)
+        falhou = True
+    return 1 if falhou else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
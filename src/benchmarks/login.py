@@ -0,0 +1,132 @@
+"""Vazão de login sob concorrência, com leituras do dashboard em paralelo.
+
+Uso, a partir de src/:
+
+    python -m benchmarks.login --concorrencia 32 --requisicoes 20
+    python -m benchmarks.login --metodo pbkdf2:sha256:600000 --workers 4 --fila 8
+
+Simula uma rajada de logins (a situação depois de um deploy) contra a aplicação
+em processo, enquanto outra thread lê /categorias, e reporta logins por
+segundo, latências, respostas 429/503 e a latência das leituras.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+import statistics
+from collections import Counter
+
+
+def _argumentos(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--metodo", default=None, help="Método de hash (padrão: SENHA_METODO ou scrypt)")
+    parser.add_argument("--workers", type=int, default=None, help="Threads do pool de hash (padrão: SENHA_WORKERS)")
+    parser.add_argument("--fila", type=int, default=None, help="Tarefas aguardando no pool (padrão: SENHA_FILA_MAX)")
+    parser.add_argument("--concorrencia", type=int, default=16, help="Clientes fazendo login ao mesmo tempo")
+    parser.add_argument("--requisicoes", type=int, default=10, help="Logins por cliente")
+    parser.add_argument("--usuarios", type=int, default=50)
+    parser.add_argument("--saida", default=None, help="Arquivo JSON de resultado (padrão: stdout)")
+    return parser.parse_args(argv)
+
+
+def _percentis(tempos):
+    if not tempos:
+        return {}
+    ordenados = sorted(tempos)
+    def p(q):
+        return round(ordenados[min(len(ordenados) - 1, int(q * len(ordenados)))] * 1000, 2)
+    return {"p50_ms": p(0.5), "p95_ms": p(0.95), "p99_ms": p(0.99), "media_ms": round(statistics.fmean(tempos) * 1000, 2)}
+
+
+def main(argv=None):
+    args = _argumentos(argv)
+    # precisa acontecer antes de importar `models`, que cria o engine na importação
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='invoice-login-'), 'login.db')}"
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    if args.metodo:
+        os.environ["SENHA_METODO"] = args.metodo
+    if args.workers:
+        os.environ["SENHA_WORKERS"] = str(args.workers)
+    if args.fila is not None:
+        os.environ["SENHA_FILA_MAX"] = str(args.fila)
+
+    from werkzeug.security import generate_password_hash
+    from app import create_app
+    from models import engine, session, migrar, Usuario
+    from services import senhas_service
+
+    migrar(engine)
+    password_hash = generate_password_hash("123456", senhas_service.SENHA_METODO)
+    session.add_all(Usuario(username=f"login{i}", password_hash=password_hash) for i in range(args.usuarios))
+    session.commit()
+    session.remove()
+
+    app = create_app()
+    with app.test_client() as client:
+        token = client.post("/login", json={"username": "login0", "password": "123456"}).get_json()["token"]
+
+    tempos_login, status = [], Counter()
+    tempos_leitura = []
+    lock = threading.Lock()
+    fim = threading.Event()
+
+    def cliente(indice):
+        with app.test_client() as client:
+            for r in range(args.requisicoes):
+                username = f"login{(indice * args.requisicoes + r) % args.usuarios}"
+                inicio = time.perf_counter()
+                resposta = client.post("/login", json={"username": username, "password": "123456"})
+                duracao = time.perf_counter() - inicio
+                with lock:
+                    tempos_login.append(duracao)
+                    status[resposta.status_code] += 1
+
+    def leitor():
+        with app.test_client() as client:
+            while not fim.is_set():
+                inicio = time.perf_counter()
+                client.get("/categorias", headers={"Authorization": f"Bearer {token}"})
+                tempos_leitura.append(time.perf_counter() - inicio)
+                time.sleep(0.01)
+
+    thread_leitor = threading.Thread(target=leitor)
+    thread_leitor.start()
+    threads = [threading.Thread(target=cliente, args=(i,)) for i in range(args.concorrencia)]
+    inicio = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    duracao = time.perf_counter() - inicio
+    fim.set()
+    thread_leitor.join()
+
+    resultado = {
+        "meta": {
+            "metodo": senhas_service.metodo_normalizado(),
+            "workers": senhas_service.pool_hash.workers,
+            "fila_max": senhas_service.SENHA_FILA_MAX,
+            "concorrencia": args.concorrencia,
+            "requisicoes": args.concorrencia * args.requisicoes,
+        },
+        "duracao_s": round(duracao, 3),
+        "logins_por_s": round(status[200] / duracao, 2),
+        "status": {str(codigo): quantidade for codigo, quantidade in sorted(status.items())},
+        "latencia_login": _percentis(tempos_login),
+        "latencia_leitura": _percentis(tempos_leitura),
+        "pool": senhas_service.pool_hash.estatisticas(),
+    }
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            f.write(texto + "\n")
+    else:
+        print(texto)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
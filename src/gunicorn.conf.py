@@ -0,0 +1,12 @@
+import os
+
+wsgi_app = "app:create_app()"
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1").lower() in ("1", "true")
+
+
+def post_fork(server, worker):
+    # conexões abertas no master não podem ser compartilhadas entre processos
+    from models import engine
+    engine.dispose(close=False)
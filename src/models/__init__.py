@@ -1,7 +1,14 @@
-from .base import Base, engine, session
+from .base import Base, engine, session, estatisticas_pool, engine_async, descartar_engine_async
 from .transacao import Transacao
 from .usuario import Usuario
+from .resumo_mensal import ResumoMensal, reconstruir_resumos
+from .upload_job import UploadJob
+from .versao_dados import VersaoDados
+from .modelo_categorias import ModeloCategorias
+from .migracoes import SchemaVersao, migrar, explicar, explicar_sql, indices_usados
 
-Base.metadata.create_all(bind=engine)
-
-__all__ = ["Base", "engine", "session", "Transacao", "Usuario"]
+__all__ = [
+    "Base", "engine", "session", "estatisticas_pool", "engine_async", "descartar_engine_async",
+    "Transacao", "Usuario", "ResumoMensal", "UploadJob", "VersaoDados", "ModeloCategorias",
+    "SchemaVersao", "reconstruir_resumos", "migrar", "explicar", "explicar_sql", "indices_usados"
+]
@@ -1,13 +1,123 @@
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine
 import os
+import threading
+import time
+from sqlalchemy.orm import declarative_base, sessionmaker, scoped_session
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
 from dotenv import load_dotenv
 
 load_dotenv()
 
+
+class PoolInstrumentado(QueuePool):
+    """QueuePool que mede quantas conexões foram pedidas e quanto se esperou por elas"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lock_estatisticas = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.espera_total = 0.0
+        self.espera_max = 0.0
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            with self._lock_estatisticas:
+                self.timeouts += 1
+            raise
+        finally:
+            espera = time.perf_counter() - inicio
+            with self._lock_estatisticas:
+                self.checkouts += 1
+                self.espera_total += espera
+                self.espera_max = max(self.espera_max, espera)
+
+    def recreate(self):
+        novo = super().recreate()
+        novo.checkouts, novo.timeouts = self.checkouts, self.timeouts
+        novo.espera_total, novo.espera_max = self.espera_total, self.espera_max
+        return novo
+
+
+def _opcoes_pool(url):
+    url = make_url(url)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return {}
+    return {
+        "poolclass": PoolInstrumentado,
+        "pool_size": int(os.environ.get("DB_POOL_SIZE", 5)),
+        "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", 10)),
+        "pool_timeout": float(os.environ.get("DB_POOL_TIMEOUT", 30)),
+        "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE", -1)),
+        "pool_pre_ping": os.environ.get("DB_POOL_PRE_PING", "0").lower() in ("1", "true"),
+    }
+
+
 Base = declarative_base()
-engine = create_engine(os.environ.get("DATABASE_URL"))
+engine = create_engine(os.environ.get("DATABASE_URL"), **_opcoes_pool(os.environ.get("DATABASE_URL")))
 
 Session = sessionmaker(bind=engine)
-session = Session()
+session = scoped_session(Session)
+
+
+# drivers assíncronos equivalentes aos do DATABASE_URL, usados pelo modo ASGI
+DRIVERS_ASYNC = {"sqlite": "aiosqlite", "postgresql": "asyncpg", "mysql": "aiomysql"}
+_engine_async = None
+
+
+def url_async(url):
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in DRIVERS_ASYNC:
+        raise ValueError(f"Sem driver assíncrono para {backend}")
+    return url.set(drivername=f"{backend}+{DRIVERS_ASYNC[backend]}")
+
+
+def engine_async():
+    """Engine assíncrono sobre o mesmo banco, criado no primeiro uso.
+
+    Usa DATABASE_URL_ASYNC quando definido; senão troca o driver do DATABASE_URL.
+    """
+    global _engine_async
+    if _engine_async is None:
+        from sqlalchemy.ext.asyncio import create_async_engine
+        url = os.environ.get("DATABASE_URL_ASYNC") or url_async(os.environ.get("DATABASE_URL"))
+        opcoes = _opcoes_pool(url)
+        if opcoes:
+            opcoes["poolclass"] = AsyncAdaptedQueuePool
+        _engine_async = create_async_engine(url, **opcoes)
+    return _engine_async
+
+
+async def descartar_engine_async():
+    global _engine_async
+    if _engine_async is not None:
+        await _engine_async.dispose()
+        _engine_async = None
+
+
+def estatisticas_pool():
+    pool = engine.pool
+    estatisticas = {"classe": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        estatisticas.update({
+            "tamanho": pool.size(),
+            "em_uso": pool.checkedout(),
+            "ociosas": pool.checkedin(),
+            "overflow": pool.overflow(),
+        })
+    if isinstance(pool, PoolInstrumentado):
+        with pool._lock_estatisticas:
+            estatisticas.update({
+                "checkouts": pool.checkouts,
+                "timeouts": pool.timeouts,
+                "espera_total_s": round(pool.espera_total, 6),
+                "espera_max_s": round(pool.espera_max, 6),
+                "espera_media_s": round(pool.espera_total / pool.checkouts, 6) if pool.checkouts else 0.0,
+            })
+    return estatisticas
@@ -0,0 +1,186 @@
+import warnings
+from datetime import datetime, timezone
+from sqlalchemy.exc import OperationalError, SAWarning
+from sqlalchemy import Column, Integer, String, DateTime, func, inspect, select
+from sqlalchemy.schema import CreateTable
+from .base import Base
+from .transacao import Transacao
+from .usuario import Usuario
+from .resumo_mensal import ResumoMensal, reconstruir_resumos
+from .upload_job import UploadJob
+from .versao_dados import VersaoDados
+from .modelo_categorias import ModeloCategorias
+
+
+class SchemaVersao(Base):
+    __tablename__ = 'schema_versao'
+
+    versao = Column(Integer, primary_key=True)
+    descricao = Column(String, nullable=False)
+    aplicada_em = Column(DateTime, nullable=False)
+
+
+MIGRACOES = []
+DIALETOS_COM_INDICE_DE_EXPRESSAO = {"sqlite", "postgresql"}
+INDICES_DE_EXPRESSAO = {"ix_transacoes_user_categoria_lower", "ix_transacoes_descricao_busca"}
+
+ACENTOS = "áàâãäéèêëíìîïóòôõöúùûüçñ"
+SEM_ACENTOS = "aaaaaeeeeiiiiooooouuuucn"
+
+
+def migracao(versao, descricao):
+    """Registra uma migração; devem ser idempotentes para atualizar bancos antigos no lugar"""
+    def registrar(funcao):
+        MIGRACOES.append((versao, descricao, funcao))
+        MIGRACOES.sort(key=lambda m: m[0])
+        return funcao
+    return registrar
+
+
+@migracao(1, "Tabelas iniciais")
+def _tabelas_iniciais(conn):
+    # só o esquema original; cada migração seguinte cria as tabelas e índices que introduz
+    for tabela in (Usuario.__table__, Transacao.__table__):
+        conn.execute(CreateTable(tabela, if_not_exists=True))
+    SchemaVersao.__table__.create(conn, checkfirst=True)
+
+
+@migracao(2, "Índices de transacoes por usuário")
+def _indices_transacoes(conn):
+    for indice in Transacao.__table__.indexes:
+        indice.create(conn, checkfirst=True)
+    if conn.dialect.name in DIALETOS_COM_INDICE_DE_EXPRESSAO:
+        conn.exec_driver_sql(
+            "CREATE INDEX IF NOT EXISTS ix_transacoes_user_categoria_lower "
+            "ON transacoes (user_id, lower(categoria))"
+        )
+
+
+@migracao(3, "Backfill dos resumos mensais")
+def _backfill_resumos(conn):
+    ResumoMensal.__table__.create(conn, checkfirst=True)
+    reconstruir_resumos(conn)
+
+
+@migracao(4, "Índice de busca textual em transacoes.descricao")
+def _indice_busca(conn):
+    if conn.dialect.name == "postgresql":
+        conn.exec_driver_sql(
+            "CREATE INDEX IF NOT EXISTS ix_transacoes_descricao_busca ON transacoes USING gin "
+            f"(to_tsvector('simple', translate(lower(descricao), '{ACENTOS}', '{SEM_ACENTOS}')))"
+        )
+        return
+    if conn.dialect.name != "sqlite":
+        return
+    try:
+        conn.exec_driver_sql(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS transacoes_fts USING fts5("
+            "descricao, user_id UNINDEXED, content='transacoes', content_rowid='id', "
+            "tokenize='unicode61 remove_diacritics 2')"
+        )
+    except OperationalError:
+        # SQLite compilado sem FTS5: a busca usa o índice em memória
+        return
+    conn.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS transacoes_fts_ai AFTER INSERT ON transacoes BEGIN "
+        "INSERT INTO transacoes_fts(rowid, descricao, user_id) VALUES (new.id, new.descricao, new.user_id); END"
+    )
+    conn.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS transacoes_fts_ad AFTER DELETE ON transacoes BEGIN "
+        "INSERT INTO transacoes_fts(transacoes_fts, rowid, descricao, user_id) "
+        "VALUES ('delete', old.id, old.descricao, old.user_id); END"
+    )
+    conn.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS transacoes_fts_au AFTER UPDATE ON transacoes BEGIN "
+        "INSERT INTO transacoes_fts(transacoes_fts, rowid, descricao, user_id) "
+        "VALUES ('delete', old.id, old.descricao, old.user_id); "
+        "INSERT INTO transacoes_fts(rowid, descricao, user_id) VALUES (new.id, new.descricao, new.user_id); END"
+    )
+    conn.exec_driver_sql("INSERT INTO transacoes_fts(transacoes_fts) VALUES ('rebuild')")
+
+
+@migracao(5, "Tabela de jobs de upload")
+def _tabela_upload_jobs(conn):
+    UploadJob.__table__.create(conn, checkfirst=True)
+
+
+@migracao(6, "Versão dos dados por usuário")
+def _tabela_versoes_dados(conn):
+    VersaoDados.__table__.create(conn, checkfirst=True)
+
+
+@migracao(7, "Modelos de categorização por usuário")
+def _tabela_modelos_categorias(conn):
+    ModeloCategorias.__table__.create(conn, checkfirst=True)
+
+
+@migracao(8, "Usuário indexado na busca textual do SQLite")
+def _busca_por_usuario(conn):
+    # com user_id UNINDEXED o MATCH percorre as transações de todos os usuários antes do filtro;
+    # indexado, a busca casa `user_id : "<id>"` junto com os termos. Os gatilhos da migração 4 continuam valendo.
+    if conn.dialect.name != "sqlite" or not inspect(conn).has_table("transacoes_fts"):
+        return
+    conn.exec_driver_sql("DROP TABLE transacoes_fts")
+    conn.exec_driver_sql(
+        "CREATE VIRTUAL TABLE transacoes_fts USING fts5("
+        "descricao, user_id, content='transacoes', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2')"
+    )
+    conn.exec_driver_sql("INSERT INTO transacoes_fts(transacoes_fts) VALUES ('rebuild')")
+
+
+def versao_atual(conn):
+    if not inspect(conn).has_table(SchemaVersao.__tablename__):
+        return 0
+    return conn.execute(select(func.max(SchemaVersao.versao))).scalar() or 0
+
+
+def migrar(engine, ate=None):
+    """Aplica as migrações pendentes, cada uma em sua própria transação"""
+    aplicadas = []
+    for versao, descricao, funcao in MIGRACOES:
+        if ate is not None and versao > ate:
+            break
+        with engine.begin() as conn:
+            if versao <= versao_atual(conn):
+                continue
+            funcao(conn)
+            SchemaVersao.__table__.create(conn, checkfirst=True)
+            conn.execute(SchemaVersao.__table__.insert().values(
+                versao=versao, descricao=descricao, aplicada_em=datetime.now(timezone.utc)
+            ))
+        aplicadas.append(versao)
+    return aplicadas
+
+
+def explicar(conn, consulta):
+    """Plano de execução da consulta (EXPLAIN QUERY PLAN no SQLite, EXPLAIN no resto)"""
+    statement = getattr(consulta, "statement", consulta)
+    compilado = statement.compile(dialect=conn.dialect, compile_kwargs={"render_postcompile": True})
+    parametros = compilado.construct_params()
+    if compilado.positional:
+        parametros = tuple(parametros[nome] for nome in compilado.positiontup)
+    return explicar_sql(conn, str(compilado), parametros)
+
+
+def explicar_sql(conn, sql, parametros=None):
+    """Plano de execução de um SQL já compilado para o dialeto da conexão"""
+    prefixo = "EXPLAIN QUERY PLAN" if conn.dialect.name == "sqlite" else "EXPLAIN"
+    linhas = conn.exec_driver_sql(f"{prefixo} {sql}", parametros or ()).fetchall()
+    return [str(linha[-1]) for linha in linhas]
+
+
+def indices_usados(conn, plano):
+    """Nomes dos índices do banco citados em um plano retornado por `explicar`"""
+    texto = "\n".join(plano)
+    inspetor = inspect(conn)
+    with warnings.catch_warnings():
+        # índices de expressão não são refletidos; o SQLAlchemy só emite um aviso
+        warnings.simplefilter("ignore", SAWarning)
+        nomes = {
+            indice['name']
+            for tabela in inspetor.get_table_names()
+            for indice in inspetor.get_indexes(tabela)
+        }
+    nomes.update(INDICES_DE_EXPRESSAO)
+    return {nome for nome in nomes if nome in texto}
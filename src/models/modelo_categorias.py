@@ -0,0 +1,12 @@
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, JSON, LargeBinary
+from .base import Base
+
+
+class ModeloCategorias(Base):
+    __tablename__ = 'modelos_categorias'
+
+    user_id = Column(Integer, ForeignKey('usuarios.id'), primary_key=True)
+    dimensoes = Column(Integer, nullable=False)
+    categorias = Column(JSON, nullable=False)
+    contagens = Column(LargeBinary, nullable=False)
+    atualizado_em = Column(DateTime, nullable=False)
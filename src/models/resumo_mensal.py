@@ -0,0 +1,46 @@
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, delete, extract, func, insert, select
+from .base import Base
+from .transacao import Transacao
+
+
+class ResumoMensal(Base):
+    __tablename__ = 'resumos_mensais'
+
+    user_id = Column(Integer, ForeignKey('usuarios.id'), primary_key=True)
+    ano = Column(Integer, primary_key=True)
+    mes = Column(Integer, primary_key=True)
+    categoria = Column(String, primary_key=True)
+    soma = Column(Float, nullable=False, default=0)
+    quantidade = Column(Integer, nullable=False, default=0)
+    minimo = Column(Float)
+    maximo = Column(Float)
+
+
+def consulta_agregada(*filtros):
+    ano = extract('year', Transacao.data)
+    mes = extract('month', Transacao.data)
+    categoria = func.coalesce(Transacao.categoria, '')
+    return (
+        select(
+            Transacao.user_id,
+            ano.label('ano'),
+            mes.label('mes'),
+            categoria.label('categoria'),
+            func.sum(Transacao.valor).label('soma'),
+            func.count(Transacao.valor).label('quantidade'),
+            func.min(Transacao.valor).label('minimo'),
+            func.max(Transacao.valor).label('maximo'),
+        )
+        .where(Transacao.valor.isnot(None), Transacao.data.isnot(None), *filtros)
+        .group_by(Transacao.user_id, ano, mes, categoria)
+    )
+
+
+def reconstruir_resumos(conn, user_id=None):
+    filtros = [Transacao.user_id == user_id] if user_id is not None else []
+    remover = delete(ResumoMensal)
+    if user_id is not None:
+        remover = remover.where(ResumoMensal.user_id == user_id)
+    conn.execute(remover)
+    colunas = ['user_id', 'ano', 'mes', 'categoria', 'soma', 'quantidade', 'minimo', 'maximo']
+    conn.execute(insert(ResumoMensal).from_select(colunas, consulta_agregada(*filtros)))
@@ -1,10 +1,13 @@
-from sqlalchemy import Column, Integer, String, Float, Date, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Date, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from .base import Base
 from .usuario import Usuario
 
 class Transacao(Base):
     __tablename__ = 'transacoes'
+    __table_args__ = (
+        Index('ix_transacoes_user_data', 'user_id', 'data', 'id'),
+    )
 
     id = Column(Integer, primary_key=True)
     data = Column(Date)
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON
+from .base import Base
+
+
+class UploadJob(Base):
+    __tablename__ = 'upload_jobs'
+
+    id = Column(String, primary_key=True)
+    user_id = Column(Integer, ForeignKey('usuarios.id'), index=True)
+    tipo = Column(String, nullable=False)
+    status = Column(String, nullable=False)
+    linhas_processadas = Column(Integer, nullable=False, default=0)
+    erros = Column(JSON)
+    resultado = Column(JSON)
+    criado_em = Column(DateTime, nullable=False)
+    atualizado_em = Column(DateTime, nullable=False)
@@ -0,0 +1,9 @@
+from sqlalchemy import Column, Integer, ForeignKey
+from .base import Base
+
+
+class VersaoDados(Base):
+    __tablename__ = 'versoes_dados'
+
+    user_id = Column(Integer, ForeignKey('usuarios.id'), primary_key=True)
+    versao = Column(Integer, nullable=False, default=0)
@@ -3,15 +3,21 @@ from services.auth_service import criar_usuario, login
 
 auth_bp = Blueprint('auth', __name__)
 
+
+def _responder(response, status):
+    headers = {"Retry-After": str(response["retry_after"])} if "retry_after" in response else {}
+    return jsonify(response), status, headers
+
+
 @auth_bp.route('/usuarios', methods=['POST'])
 def route_criar_usuario():
     data = request.json
     response, status = criar_usuario(data)
-    return jsonify(response), status
+    return _responder(response, status)
 
 
 @auth_bp.route('/login', methods=['POST'])
 def route_login():
     data = request.json
     response, status = login(data)
-    return jsonify(response), status
+    return _responder(response, status)
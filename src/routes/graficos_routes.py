@@ -1,8 +1,8 @@
 import os
 from flask import Blueprint, request, jsonify
 from dotenv import load_dotenv
-from services.graficos_service import gastos_por_categoria_service, gastos_gerais_service, insights_service
-from utils.decorator import token_required
+from services.graficos_service import gastos_por_categoria_service, gastos_gerais_service, insights_service, serie_temporal_service
+from utils.decorator import token_required, etag_por_versao
 
 load_dotenv()
 SECRET_KEY = os.environ.get("SECRET_KEY")
@@ -11,6 +11,7 @@ charts_bp = Blueprint('charts', __name__)
 
 @charts_bp.route('/charts/categoria', methods=['GET'])
 @token_required
+@etag_por_versao
 def route_gastos_por_categoria(current_user):
     categoria = request.args.get('categoria')
     data_inicio = request.args.get('data_inicio')
@@ -25,6 +26,7 @@ def route_gastos_por_categoria(current_user):
 
 @charts_bp.route('/charts/geral', methods=['GET'])
 @token_required
+@etag_por_versao
 def route_gastos_gerais(current_user):
     categoria = request.args.get('categoria')
     data_inicio = request.args.get('data_inicio')
@@ -39,6 +41,7 @@ def route_gastos_gerais(current_user):
 
 @charts_bp.route('/charts/insights', methods=['GET'])
 @token_required
+@etag_por_versao
 def route_insights(current_user):
     data_inicio = request.args.get('data_inicio')
     data_fim = request.args.get('data_fim')
@@ -48,3 +51,22 @@ def route_insights(current_user):
         return jsonify(resposta)
     except ValueError:
         return jsonify({"error": "Formato de data inválido"}), 400
+
+
+@charts_bp.route('/charts/serie', methods=['GET'])
+@token_required
+@etag_por_versao
+def route_serie_temporal(current_user):
+    try:
+        resposta = serie_temporal_service(
+            current_user,
+            request.args.get('granularidade', 'mes'),
+            request.args.get('data_inicio'),
+            request.args.get('data_fim'),
+            request.args.get('categoria'),
+            request.args.get('por_categoria') in ('1', 'true'),
+            request.args.get('max_pontos'),
+        )
+        return jsonify(resposta)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
@@ -1,13 +1,15 @@
 import os
 import random
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, Response, current_app, request, jsonify, send_file, stream_with_context, url_for
 from dotenv import load_dotenv
 from services.transacoes_service import (
-    processar_csv, processar_pdf, listar_transacoes, listar_categorias,
-    criar_transacao, editar_transacao, deletar_transacao,
+    processar_csv, processar_pdf, linhas_transacoes, em_colunas, iterar_transacoes, listar_categorias,
+    criar_transacao, editar_transacao, deletar_transacao, aplicar_lote,
     gerar_fatura_pdf, gerar_fatura_csv
 )
-from utils.decorator import token_required
+from services.jobs_service import enfileirar_upload, obter_job
+from services.exportacao_service import consulta_exportacao, exportar_csv, exportar_pdf
+from utils.decorator import token_required, etag_por_versao
 
 load_dotenv()
 SECRET_KEY = os.environ.get("SECRET_KEY")
@@ -15,32 +17,53 @@ SECRET_KEY = os.environ.get("SECRET_KEY")
 transacoes_bp = Blueprint('transacoes', __name__)
 
 
-@transacoes_bp.route('/upload', methods=['POST'])
-@token_required
-def route_upload_csv(current_user):
+def _upload(current_user, processar, tipo):
     file = request.files.get('file')
     try:
-        resp = processar_csv(current_user, file)
-        return jsonify(resp)
+        if request.args.get('sincrono') in ('1', 'true'):
+            return jsonify(processar(current_user, file))
+        job = enfileirar_upload(current_user, file, tipo)
+        response = jsonify(job)
+        response.status_code = 202
+        response.headers['Location'] = url_for('transacoes.route_status_upload', job_id=job['id'])
+        return response
     except ValueError as e:
         return jsonify({"error": str(e)}), 400
 
 
+@transacoes_bp.route('/upload', methods=['POST'])
+@token_required
+def route_upload_csv(current_user):
+    return _upload(current_user, processar_csv, "csv")
+
+
 @transacoes_bp.route('/upload/pdf', methods=['POST'])
 @token_required
 def route_upload_pdf(current_user):
-    file = request.files.get('file')
-    try:
-        resp = processar_pdf(current_user, file)
-        return jsonify(resp)
-    except ValueError as e:
-        return jsonify({"error": str(e)}), 400
+    return _upload(current_user, processar_pdf, "pdf")
 
 
-@transacoes_bp.route('/transacoes', methods=['GET'])
+@transacoes_bp.route('/upload/jobs/<job_id>', methods=['GET'])
 @token_required
-def route_listar_transacoes(current_user):
-    filtros = {
+def route_status_upload(current_user, job_id):
+    job = obter_job(current_user, job_id)
+    if not job:
+        return jsonify({"error": "Job não encontrado"}), 404
+    return jsonify(job)
+
+
+def _serializar_transacao(t):
+    return {
+        "id": t.id,
+        "data": t.data.strftime('%Y-%m-%d'),
+        "descricao": t.descricao,
+        "valor": t.valor,
+        "categoria": t.categoria
+    }
+
+
+def _filtros_da_requisicao():
+    return {
         "categoria": request.args.get('categoria'),
         "data_inicio": request.args.get('data_inicio'),
         "data_fim": request.args.get('data_fim'),
@@ -48,21 +71,42 @@ def route_listar_transacoes(current_user):
         "valor_max": request.args.get('valor_max'),
         "busca": request.args.get('busca')
     }
+
+
+def _stream_json(transacoes):
+    yield "["
+    for i, t in enumerate(transacoes):
+        yield ("," if i else "") + current_app.json.dumps(_serializar_transacao(t))
+    yield "]"
+
+
+@transacoes_bp.route('/transacoes', methods=['GET'])
+@token_required
+@etag_por_versao
+def route_listar_transacoes(current_user):
+    filtros = _filtros_da_requisicao()
+    limit = request.args.get('limit')
+    cursor = request.args.get('cursor')
     try:
-        transacoes = listar_transacoes(current_user, filtros)
-        return jsonify([{
-            "id": t.id,
-            "data": t.data.strftime('%Y-%m-%d'),
-            "descricao": t.descricao,
-            "valor": t.valor,
-            "categoria": t.categoria
-        } for t in transacoes])
+        if request.args.get('stream') in ('1', 'true'):
+            transacoes = iterar_transacoes(current_user, filtros)
+            return Response(stream_with_context(_stream_json(transacoes)), mimetype="application/json")
+
+        colunar = request.args.get('formato') == 'colunas'
+        paginado = bool(limit or cursor)
+        linhas, proximo_cursor = linhas_transacoes(current_user, filtros, (limit or 50) if paginado else None, cursor)
+        transacoes = em_colunas(linhas) if colunar else [linha._asdict() for linha in linhas]
+
+        if paginado:
+            return jsonify({"transacoes": transacoes, "proximo_cursor": proximo_cursor})
+        return jsonify(transacoes)
     except ValueError as e:
         return jsonify({"error": str(e)}), 400
 
 
 @transacoes_bp.route('/categorias', methods=['GET'])
 @token_required
+@etag_por_versao
 def route_listar_categorias(current_user):
     categorias = listar_categorias(current_user)
     return jsonify({"categorias": categorias})
@@ -76,13 +120,7 @@ def route_criar_transacao(current_user):
         transacao = criar_transacao(current_user, data)
         return jsonify({
             "message": "Transação criada com sucesso!",
-            "transacao": {
-                "id": transacao.id,
-                "data": transacao.data.strftime('%Y-%m-%d'),
-                "descricao": transacao.descricao,
-                "valor": transacao.valor,
-                "categoria": transacao.categoria
-            }
+            "transacao": _serializar_transacao(transacao)
         }), 201
     except ValueError as e:
         return jsonify({"error": str(e)}), 400
@@ -92,7 +130,10 @@ def route_criar_transacao(current_user):
 @token_required
 def route_editar_transacao(current_user, id):
     data = request.json or {}
-    transacao = editar_transacao(current_user, id, data)
+    try:
+        transacao = editar_transacao(current_user, id, data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     if not transacao:
         return jsonify({"error": "Transação não encontrada"}), 404
     return jsonify({"message": "Transação atualizada"})
@@ -107,6 +148,42 @@ def route_deletar_transacao(current_user, id):
     return jsonify({"message": "Transação deletada"})
 
 
+@transacoes_bp.route('/transacoes/lote', methods=['POST'])
+@token_required
+def route_lote_transacoes(current_user):
+    data = request.json or {}
+    atomico = bool(data.get('atomico'))
+    try:
+        resultado = aplicar_lote(current_user, data.get('operacoes'), atomico)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(resultado), 400 if atomico and resultado["falhas"] else 200
+
+
+def _exportar(current_user, gerar, mimetype, extensao):
+    try:
+        consulta = consulta_exportacao(current_user, _filtros_da_requisicao())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return Response(
+        stream_with_context(gerar(consulta)),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename=transacoes.{extensao}"}
+    )
+
+
+@transacoes_bp.route("/exportar/csv", methods=["GET"])
+@token_required
+def route_exportar_csv(current_user):
+    return _exportar(current_user, exportar_csv, "text/csv", "csv")
+
+
+@transacoes_bp.route("/exportar/pdf", methods=["GET"])
+@token_required
+def route_exportar_pdf(current_user):
+    return _exportar(current_user, exportar_pdf, "application/pdf", "pdf")
+
+
 @transacoes_bp.route("/fatura/pdf", methods=["GET"])
 @token_required
 def route_gerar_fatura_pdf(current_user):
@@ -0,0 +1,164 @@
+"""Backend NumPy dos gráficos (GRAFICOS_BACKEND=numpy).
+
+As transações do usuário são carregadas uma vez em arrays ordenados por data
+e guardadas em `colunas_usuarios` até a próxima escrita; cada gráfico vira um
+recorte por `searchsorted` nas datas e agregações com `bincount`. As respostas
+são as mesmas dos serviços em SQL.
+"""
+from collections import namedtuple
+from datetime import datetime
+import numpy as np
+from sqlalchemy import String, cast, select
+from models import session, Transacao
+from services.cache_service import colunas_usuarios
+from services.versao_service import versao_dados, versao_dados_async
+
+GrupoCategoria = namedtuple("GrupoCategoria", ["categoria", "valor_total"])
+GrupoMes = namedtuple("GrupoMes", ["mes", "valor_total"])
+
+
+class ColunasUsuario:
+    """Transações de um usuário em colunas, ordenadas por (data, id); datas nulas ficam no fim"""
+
+    def __init__(self, linhas):
+        ids, datas, valores, categorias, descricoes = zip(*linhas) if linhas else ((),) * 5
+        datas = np.array(datas, dtype="datetime64[D]")
+        ordem = np.argsort(datas, kind="stable")
+
+        self.ids = np.array(ids, dtype=np.int64)[ordem]
+        self.datas = datas[ordem]
+        self.valores = np.array(valores, dtype=np.float64)[ordem]
+        self.descricoes = np.array(descricoes, dtype=object)[ordem]
+
+        self.nomes_categorias = list(dict.fromkeys(categorias))
+        indices = {nome: i for i, nome in enumerate(self.nomes_categorias)}
+        self.categorias = np.array([indices[c] for c in categorias], dtype=np.int32)[ordem]
+
+        self.validas = ~np.isnan(self.valores)
+        self.com_data = ~np.isnat(self.datas)
+        meses = self.datas.astype("datetime64[M]")
+        self.meses = np.where(self.com_data, meses.astype(np.int64) % 12 + 1, 0)
+        self.dias = np.where(self.com_data, (self.datas - meses).astype(np.int64) + 1, 0)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def recorte(self, data_inicio=None, data_fim=None):
+        """Fatia das linhas no período, como os filtros `data >= inicio` e `data <= fim`"""
+        inicio, fim = 0, len(self.datas)
+        if data_inicio:
+            dt_inicio = np.datetime64(datetime.strptime(data_inicio, '%Y-%m-%d').date(), "D")
+            inicio = int(np.searchsorted(self.datas, dt_inicio, side="left"))
+        if data_fim:
+            dt_fim = np.datetime64(datetime.strptime(data_fim, '%Y-%m-%d').date(), "D")
+            fim = int(np.searchsorted(self.datas, dt_fim, side="right"))
+        return slice(inicio, max(inicio, fim))
+
+    def selecao(self, categoria=None, data_inicio=None, data_fim=None):
+        """Índices das linhas com valor no período e, se pedida, na categoria (sem diferenciar maiúsculas)"""
+        fatia = self.recorte(data_inicio, data_fim)
+        mascara = self.validas[fatia]
+        if categoria:
+            codigos = [i for i, nome in enumerate(self.nomes_categorias) if nome is not None and nome.lower() == categoria.lower()]
+            mascara = mascara & np.isin(self.categorias[fatia], codigos)
+        return np.flatnonzero(mascara) + fatia.start
+
+    def somas_por_categoria(self, indices):
+        total = len(self.nomes_categorias)
+        somas = np.bincount(self.categorias[indices], weights=self.valores[indices], minlength=total)
+        quantidades = np.bincount(self.categorias[indices], minlength=total)
+        return somas, quantidades
+
+
+def _consulta_colunas(user_id):
+    # data como texto ISO: o NumPy converte direto para datetime64, sem criar objetos date
+    return select(
+        Transacao.id, cast(Transacao.data, String), Transacao.valor, Transacao.categoria, Transacao.descricao
+    ).where(Transacao.user_id == user_id).order_by(Transacao.data, Transacao.id)
+
+
+def colunas_usuario(user_id):
+    versao = versao_dados(user_id)
+    colunas = colunas_usuarios.obter(user_id, versao)
+    if colunas is None:
+        colunas = ColunasUsuario(session.execute(_consulta_colunas(user_id)).all())
+        colunas_usuarios.guardar(user_id, versao, colunas)
+    return colunas
+
+
+async def colunas_usuario_async(conexao, user_id):
+    versao = await versao_dados_async(conexao, user_id)
+    colunas = colunas_usuarios.obter(user_id, versao)
+    if colunas is None:
+        colunas = ColunasUsuario((await conexao.execute(_consulta_colunas(user_id))).all())
+        colunas_usuarios.guardar(user_id, versao, colunas)
+    return colunas
+
+
+def gastos_por_categoria(colunas, categoria=None, data_inicio=None, data_fim=None):
+    """Grupos (categoria, valor_total) em ordem decrescente de valor, como a consulta SQL"""
+    somas, quantidades = colunas.somas_por_categoria(colunas.selecao(categoria, data_inicio, data_fim))
+    presentes = np.flatnonzero(quantidades)
+    ordem = presentes[np.argsort(-somas[presentes], kind="stable")]
+    return [GrupoCategoria(colunas.nomes_categorias[i], float(somas[i])) for i in ordem]
+
+
+def gastos_por_mes(colunas, categoria=None, data_inicio=None, data_fim=None):
+    """Grupos (mes, valor_total) por mês do ano, somando todos os anos do período"""
+    indices = colunas.selecao(categoria, data_inicio, data_fim)
+    indices = indices[colunas.com_data[indices]]
+    somas = np.bincount(colunas.meses[indices], weights=colunas.valores[indices], minlength=13)
+    quantidades = np.bincount(colunas.meses[indices], minlength=13)
+    return [GrupoMes(int(mes), float(somas[mes])) for mes in np.flatnonzero(quantidades)]
+
+
+def _gasto_extremo(colunas, indices, maior):
+    if not len(indices):
+        return None
+    valores = colunas.valores[indices]
+    alvo = valores.max() if maior else valores.min()
+    candidatos = indices[valores == alvo]
+    escolhido = candidatos[np.argmin(colunas.ids[candidatos])]
+    return {"descricao": colunas.descricoes[escolhido], "valor": float(colunas.valores[escolhido])}
+
+
+def insights(colunas, data_inicio=None, data_fim=None):
+    """As métricas de `motor_insights`, com os mesmos desempates"""
+    indices = colunas.selecao(None, data_inicio, data_fim)
+    if not len(indices):
+        return {
+            "maior_categoria": None,
+            "maior_categoria_valor": 0,
+            "media_semanal": 0,
+            "maior_gasto": None,
+            "menor_gasto": None,
+            "dia_maior_gasto_media": None,
+        }
+
+    somas, quantidades = colunas.somas_por_categoria(indices)
+    presentes = np.flatnonzero(quantidades)
+    maior_soma = somas[presentes].max()
+    # empate: menor nome, com a categoria vazia primeiro, como o ORDER BY da consulta
+    maior_categoria = min(
+        (colunas.nomes_categorias[i] for i in presentes if somas[i] == maior_soma),
+        key=lambda nome: (nome is not None, nome or "")
+    )
+
+    com_data = indices[colunas.com_data[indices]]
+    somas_dia = np.bincount(colunas.dias[com_data], weights=colunas.valores[com_data], minlength=32)
+    quantidades_dia = np.bincount(colunas.dias[com_data], minlength=32)
+    dia = None
+    if len(com_data):
+        medias = np.full(len(somas_dia), -np.inf)
+        np.divide(somas_dia, quantidades_dia, out=medias, where=quantidades_dia > 0)
+        dia = int(np.argmax(medias))
+
+    media = float(colunas.valores[indices].mean())
+    return {
+        "maior_categoria": maior_categoria,
+        "maior_categoria_valor": float(maior_soma),
+        "media_semanal": media if media else 0,
+        "maior_gasto": _gasto_extremo(colunas, indices, True),
+        "menor_gasto": _gasto_extremo(colunas, indices, False),
+        "dia_maior_gasto_media": dia,
+    }
@@ -1,26 +1,62 @@
 import jwt
 import os
 from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
 from models import session, Usuario
+from services.senhas_service import gerar_hash, verificar_senha, HashSobrecarregado, HashIndisponivel
 
 SECRET_KEY = os.environ.get("SECRET_KEY")
 
+RESPOSTA_SOBRECARREGADO = {"error": "Servidor ocupado, tente novamente em instantes", "retry_after": 1}, 429
+RESPOSTA_INDISPONIVEL = {"error": "Servidor indisponível, tente novamente em instantes", "retry_after": 5}, 503
+
+
 def criar_usuario(data):
     if session.query(Usuario).filter_by(username=data['username']).first():
         return {"error": "Usuário já existe"}, 400
-    
-    user = Usuario(username=data['username'])
-    user.set_password(data['password'])
+    session.close()
+
+    try:
+        password_hash = gerar_hash(data['password'])
+    except HashSobrecarregado:
+        return RESPOSTA_SOBRECARREGADO
+    except HashIndisponivel:
+        return RESPOSTA_INDISPONIVEL
+
+    user = Usuario(username=data['username'], password_hash=password_hash)
     session.add(user)
-    session.commit()
+    try:
+        session.commit()
+    except IntegrityError:
+        # outro cadastro com o mesmo nome terminou enquanto o hash era calculado
+        session.rollback()
+        return {"error": "Usuário já existe"}, 400
     return {"message": "Usuário criado com sucesso"}, 201
 
 
 def login(data):
-    user = session.query(Usuario).filter_by(username=data['username']).first()
-    if not user or not user.check_password(data['password']):
+    user = session.execute(
+        select(Usuario.id, Usuario.password_hash).filter_by(username=data['username'])
+    ).first()
+    # devolve a conexão ao pool enquanto o KDF roda
+    session.close()
+    if not user:
         return {"error": "Usuario ou senha incorretos"}, 401
-    
+
+    try:
+        ok, novo_hash = verificar_senha(user.password_hash, data['password'])
+    except HashSobrecarregado:
+        return RESPOSTA_SOBRECARREGADO
+    except HashIndisponivel:
+        return RESPOSTA_INDISPONIVEL
+    if not ok:
+        return {"error": "Usuario ou senha incorretos"}, 401
+
+    if novo_hash:
+        session.execute(update(Usuario).where(Usuario.id == user.id).values(password_hash=novo_hash))
+        session.commit()
+
     token = jwt.encode({
         "user_id": user.id,
         "exp": datetime.now(timezone.utc) + timedelta(days=30)
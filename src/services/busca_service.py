@@ -0,0 +1,125 @@
+import os
+import re
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+from sqlalchemy import inspect, literal_column, select, text, column, func
+from models import session, engine, Transacao
+from models.migracoes import ACENTOS, SEM_ACENTOS
+from services.versao_service import versao_dados
+from utils.validators import normalizar_texto
+
+BUSCA_BACKEND = os.environ.get("BUSCA_BACKEND")
+INDICE_BUSCA_MAX_USUARIOS = int(os.environ.get("INDICE_BUSCA_MAX_USUARIOS", 256))
+
+_TOKEN = re.compile(r"\w+")
+_backend_detectado = None
+
+
+def tokens(texto):
+    return _TOKEN.findall(normalizar_texto(texto or ""))
+
+
+def backend_busca():
+    global _backend_detectado
+    if BUSCA_BACKEND:
+        return BUSCA_BACKEND
+    if _backend_detectado is None:
+        dialeto = engine.dialect.name
+        if dialeto == "sqlite" and inspect(engine).has_table("transacoes_fts"):
+            _backend_detectado = "fts5"
+        elif dialeto == "postgresql":
+            _backend_detectado = "tsvector"
+        else:
+            _backend_detectado = "memoria"
+    return _backend_detectado
+
+
+def vetor_busca_postgres(coluna):
+    """Expressão do índice GIN de busca; precisa ser idêntica à usada na migração"""
+    return func.to_tsvector(
+        literal_column("'simple'"),
+        func.translate(func.lower(coluna), literal_column(f"'{ACENTOS}'"), literal_column(f"'{SEM_ACENTOS}'"))
+    )
+
+
+class IndiceTokens:
+    """Índice invertido em memória das descrições de um usuário, com busca por prefixo"""
+
+    def __init__(self, linhas):
+        self.postings = {}
+        for id_, descricao in linhas:
+            for token in tokens(descricao):
+                self.postings.setdefault(token, set()).add(id_)
+        self.vocabulario = sorted(self.postings)
+
+    def _ids_com_prefixo(self, prefixo):
+        ids = set()
+        i = bisect_left(self.vocabulario, prefixo)
+        while i < len(self.vocabulario) and self.vocabulario[i].startswith(prefixo):
+            ids |= self.postings[self.vocabulario[i]]
+            i += 1
+        return ids
+
+    def buscar(self, termos):
+        resultado = None
+        for termo in termos:
+            ids = self._ids_com_prefixo(termo)
+            resultado = ids if resultado is None else resultado & ids
+            if not resultado:
+                return set()
+        return resultado or set()
+
+
+_indices = OrderedDict()
+_lock = threading.Lock()
+
+
+def _indice_usuario(user_id):
+    # a versão dos dados descarta índices montados antes de escritas feitas por outros processos
+    versao = versao_dados(user_id)
+    with _lock:
+        item = _indices.get(user_id)
+        if item is not None and item[0] == versao:
+            _indices.move_to_end(user_id)
+            return item[1]
+
+    linhas = session.execute(
+        select(Transacao.id, Transacao.descricao).where(Transacao.user_id == user_id)
+    ).all()
+    indice = IndiceTokens(linhas)
+    with _lock:
+        _indices[user_id] = (versao, indice)
+        _indices.move_to_end(user_id)
+        while len(_indices) > INDICE_BUSCA_MAX_USUARIOS:
+            _indices.popitem(last=False)
+    return indice
+
+
+def invalidar_busca(user_id):
+    with _lock:
+        _indices.pop(user_id, None)
+
+
+def filtro_busca(user_id, busca):
+    """Filtro de busca por prefixo, sem acentos, de todos os termos em `busca`"""
+    termos = tokens(busca)
+    if not termos:
+        return Transacao.descricao.ilike(f"%{busca}%")
+
+    backend = backend_busca()
+    if backend == "fts5":
+        # o usuário faz parte do MATCH: a busca percorre só as transações dele
+        consulta = f'user_id : "{int(user_id)}" AND descricao : (' + " ".join(f'"{t}"*' for t in termos) + ")"
+        ids = text(
+            "SELECT rowid FROM transacoes_fts WHERE transacoes_fts MATCH :busca_fts"
+        ).bindparams(busca_fts=consulta).columns(column("rowid"))
+        return Transacao.id.in_(ids)
+
+    if backend == "tsvector":
+        consulta = " & ".join(f"{t}:*" for t in termos)
+        return vetor_busca_postgres(Transacao.descricao).op("@@")(
+            func.to_tsquery(literal_column("'simple'"), consulta)
+        )
+
+    return Transacao.id.in_(_indice_usuario(user_id).buscar(termos))
@@ -0,0 +1,349 @@
+import os
+import json
+import time
+import inspect
+import threading
+from datetime import datetime
+from functools import wraps
+from collections import OrderedDict
+from services.versao_service import versao_dados, versao_dados_async
+
+CACHE_GRAFICOS_BACKEND = os.environ.get("CACHE_GRAFICOS_BACKEND", "memoria")
+CACHE_GRAFICOS_TTL = float(os.environ.get("CACHE_GRAFICOS_TTL", 300))
+CACHE_GRAFICOS_MAX_BYTES = int(os.environ.get("CACHE_GRAFICOS_MAX_BYTES", 64 * 1024 * 1024))
+CACHE_GRAFICOS_URL = os.environ.get("CACHE_GRAFICOS_URL")
+ANALISE_MAX_USUARIOS = int(os.environ.get("ANALISE_MAX_USUARIOS", 64))
+CATEGORIZADOR_MAX_USUARIOS = int(os.environ.get("CATEGORIZADOR_MAX_USUARIOS", 256))
+
+
+class BackendMemoria:
+    """LRU com TTL no processo, limitado pelo tamanho dos valores serializados"""
+
+    def __init__(self, ttl=CACHE_GRAFICOS_TTL, max_bytes=CACHE_GRAFICOS_MAX_BYTES):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._itens = OrderedDict()
+        self._chaves_por_usuario = {}
+        self._lock = threading.Lock()
+
+    def obter(self, chave):
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                return None
+            valor, expira_em, _ = item
+            if expira_em <= time.time():
+                self._remover(chave)
+                return None
+            self._itens.move_to_end(chave)
+            return valor
+
+    def guardar(self, chave, valor, user_id):
+        if len(valor) > self.max_bytes:
+            return
+        with self._lock:
+            if chave in self._itens:
+                self._remover(chave)
+            self._itens[chave] = (valor, time.time() + self.ttl, user_id)
+            self._chaves_por_usuario.setdefault(user_id, set()).add(chave)
+            self.bytes += len(valor)
+            while self.bytes > self.max_bytes:
+                self._remover(next(iter(self._itens)))
+
+    def invalidar_usuario(self, user_id):
+        with self._lock:
+            for chave in list(self._chaves_por_usuario.get(user_id, ())):
+                self._remover(chave)
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+            self._chaves_por_usuario.clear()
+            self.bytes = 0
+
+    def tamanho(self):
+        return {"itens": len(self._itens), "bytes": self.bytes}
+
+    def _remover(self, chave):
+        valor, _, user_id = self._itens.pop(chave)
+        self.bytes -= len(valor)
+        chaves = self._chaves_por_usuario.get(user_id)
+        if chaves is not None:
+            chaves.discard(chave)
+            if not chaves:
+                del self._chaves_por_usuario[user_id]
+
+
+class BackendCompartilhado:
+    """Cache em um armazenamento compartilhado entre workers.
+
+    `cliente` precisa de `get(chave)`, `set(chave, valor, ex=segundos)` e
+    `delete(*chaves)`, o subconjunto usado do cliente do Redis. Como a versão dos
+    dados faz parte da chave, escritas em qualquer worker tornam as entradas
+    antigas inalcançáveis; elas só esperam o TTL para sair do armazenamento.
+    """
+
+    def __init__(self, cliente, ttl=CACHE_GRAFICOS_TTL, prefixo="graficos"):
+        self.cliente = cliente
+        self.ttl = ttl
+        self.prefixo = prefixo
+
+    def obter(self, chave):
+        valor = self.cliente.get(f"{self.prefixo}:{chave}")
+        if isinstance(valor, bytes):
+            valor = valor.decode("utf-8")
+        return valor
+
+    def guardar(self, chave, valor, user_id):
+        self.cliente.set(f"{self.prefixo}:{chave}", valor, ex=max(int(self.ttl), 1))
+
+    def invalidar_usuario(self, user_id):
+        pass
+
+    def limpar(self):
+        pass
+
+    def tamanho(self):
+        return {}
+
+
+class ArmazemLocal:
+    """Substituto local do Redis com a mesma interface usada por `BackendCompartilhado`"""
+
+    def __init__(self):
+        self._itens = {}
+        self._lock = threading.Lock()
+
+    def get(self, chave):
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                return None
+            valor, expira_em = item
+            if expira_em is not None and expira_em <= time.time():
+                del self._itens[chave]
+                return None
+            return valor
+
+    def set(self, chave, valor, ex=None):
+        with self._lock:
+            self._itens[chave] = (valor.encode("utf-8"), time.time() + ex if ex else None)
+
+    def delete(self, *chaves):
+        with self._lock:
+            for chave in chaves:
+                self._itens.pop(chave, None)
+
+
+def criar_backend(nome=CACHE_GRAFICOS_BACKEND):
+    if nome == "desligado":
+        return None
+    if nome == "compartilhado":
+        if not CACHE_GRAFICOS_URL:
+            return BackendCompartilhado(ArmazemLocal())
+        import redis
+        return BackendCompartilhado(redis.Redis.from_url(CACHE_GRAFICOS_URL))
+    return BackendMemoria()
+
+
+class CacheGraficos:
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _contar(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def estatisticas(self):
+        total = self.hits + self.misses
+        estatisticas = {
+            "backend": type(self.backend).__name__ if self.backend else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "taxa_acerto": round(self.hits / total, 4) if total else 0.0,
+        }
+        if self.backend:
+            estatisticas.update(self.backend.tamanho())
+        return estatisticas
+
+    def invalidar_usuario(self, user_id):
+        if self.backend:
+            self.backend.invalidar_usuario(user_id)
+
+    def limpar(self):
+        with self._lock:
+            self.hits = self.misses = 0
+        if self.backend:
+            self.backend.limpar()
+
+
+cache_graficos = CacheGraficos(criar_backend())
+
+
+class CacheColunas:
+    """LRU por usuário dos dados carregados pelo backend NumPy, cada um válido para uma versão dos dados"""
+
+    def __init__(self, max_usuarios=ANALISE_MAX_USUARIOS):
+        self.max_usuarios = max_usuarios
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, user_id, versao):
+        with self._lock:
+            item = self._itens.get(user_id)
+            if item is None or item[0] != versao:
+                return None
+            self._itens.move_to_end(user_id)
+            return item[1]
+
+    def guardar(self, user_id, versao, colunas):
+        with self._lock:
+            self._itens[user_id] = (versao, colunas)
+            self._itens.move_to_end(user_id)
+            while len(self._itens) > self.max_usuarios:
+                self._itens.popitem(last=False)
+
+    def invalidar_usuario(self, user_id):
+        with self._lock:
+            self._itens.pop(user_id, None)
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+
+    def tamanho(self):
+        with self._lock:
+            return {"usuarios": len(self._itens), "linhas": sum(len(c) for _, c in self._itens.values())}
+
+
+colunas_usuarios = CacheColunas()
+
+
+class CacheModelos(CacheColunas):
+    """LRU por usuário dos modelos de categorização, cada um válido para uma versão dos dados"""
+
+    def tamanho(self):
+        with self._lock:
+            return {"usuarios": len(self._itens), "bytes": sum(m.nbytes for _, m in self._itens.values())}
+
+
+modelos_categorias = CacheModelos(CATEGORIZADOR_MAX_USUARIOS)
+
+
+def _normalizar_texto(valor):
+    valor = (valor or "").strip().lower()
+    return valor or None
+
+
+def _normalizar_data(valor):
+    if not valor:
+        return None
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date().isoformat()
+    except ValueError:
+        raise ValueError("Formato de data inválido")
+
+
+NORMALIZADORES = {
+    "categoria": _normalizar_texto,
+    "data_inicio": _normalizar_data,
+    "data_fim": _normalizar_data,
+}
+
+
+# argumentos dos serviços que não fazem parte dos filtros
+NAO_FILTROS = ("conexao", "current_user")
+
+
+def _normalizar(assinatura, args, kwargs):
+    """Argumentos da chamada, com os filtros normalizados; o serviço recebe os mesmos valores da chave"""
+    argumentos = assinatura.bind(*args, **kwargs)
+    argumentos.apply_defaults()
+    for parametro, normalizador in NORMALIZADORES.items():
+        if parametro in argumentos.arguments:
+            argumentos.arguments[parametro] = normalizador(argumentos.arguments[parametro])
+    return argumentos
+
+
+def _chave(nome, user_id, versao, argumentos):
+    filtros = {
+        parametro: valor
+        for parametro, valor in argumentos.arguments.items()
+        if parametro not in NAO_FILTROS
+    }
+    return f"{nome}:{user_id}:{versao}:{json.dumps(filtros, sort_keys=True)}"
+
+
+def _obter(chave):
+    valor = cache_graficos.backend.obter(chave)
+    cache_graficos._contar(valor is not None)
+    return json.loads(valor) if valor is not None else None
+
+
+def em_cache(nome):
+    """Guarda o resultado de um serviço de gráficos por usuário, versão dos dados e filtros.
+
+    Os filtros são normalizados antes de formar a chave e de chamar o serviço,
+    então `Mercado` e `mercado `, ou argumentos posicionais e nomeados, caem na
+    mesma entrada e na mesma consulta.
+    """
+    def decorar(funcao):
+        assinatura = inspect.signature(funcao)
+
+        @wraps(funcao)
+        def decorated(current_user, *args, **kwargs):
+            argumentos = _normalizar(assinatura, (current_user, *args), kwargs)
+            if cache_graficos.backend is None:
+                return funcao(*argumentos.args, **argumentos.kwargs)
+
+            chave = _chave(nome, current_user.id, versao_dados(current_user.id), argumentos)
+            resultado = _obter(chave)
+            if resultado is not None:
+                return resultado
+
+            resultado = funcao(*argumentos.args, **argumentos.kwargs)
+            cache_graficos.backend.guardar(chave, json.dumps(resultado), current_user.id)
+            return resultado
+
+        return decorated
+    return decorar
+
+
+def em_cache_async(nome):
+    """`em_cache` para as versões assíncronas dos serviços, que recebem a conexão primeiro.
+
+    Com o mesmo `nome`, as entradas são compartilhadas com o serviço síncrono.
+    """
+    def decorar(funcao):
+        assinatura = inspect.signature(funcao)
+
+        @wraps(funcao)
+        async def decorated(conexao, current_user, *args, **kwargs):
+            argumentos = _normalizar(assinatura, (conexao, current_user, *args), kwargs)
+            if cache_graficos.backend is None:
+                return await funcao(*argumentos.args, **argumentos.kwargs)
+
+            versao = await versao_dados_async(conexao, current_user.id)
+            chave = _chave(nome, current_user.id, versao, argumentos)
+            resultado = _obter(chave)
+            if resultado is not None:
+                return resultado
+
+            resultado = await funcao(*argumentos.args, **argumentos.kwargs)
+            cache_graficos.backend.guardar(chave, json.dumps(resultado), current_user.id)
+            return resultado
+
+        return decorated
+    return decorar
+
+
+def invalidar_graficos(user_id):
+    cache_graficos.invalidar_usuario(user_id)
+    colunas_usuarios.invalidar_usuario(user_id)
@@ -0,0 +1,246 @@
+"""Categorização aprendida por usuário, a partir das categorias que ele informa.
+
+Um naive Bayes multinomial sobre as palavras da descrição: cada palavra cai num
+de `CATEGORIZADOR_DIMENSOES` baldes por hash e o modelo é só uma matriz de
+contagens (categoria x balde) mais o número de transações por categoria. Treinar
+é somar contagens, então o modelo é atualizado a cada correção ou upload com
+categoria, sem reprocessar o histórico. As descrições sem palavras conhecidas
+ou sem uma categoria provável o bastante seguem as regras de `utils.categorias`.
+
+O modelo fica na tabela `modelos_categorias` e em `modelos_categorias` (LRU por
+usuário), válido para uma versão dos dados.
+"""
+import io
+import os
+import re
+import zlib
+from functools import lru_cache
+from datetime import datetime, timezone
+import numpy as np
+from sqlalchemy import insert, select, update
+from models import session, ModeloCategorias
+from services.cache_service import modelos_categorias
+from services.versao_service import versao_dados
+from utils.categorias import categorizar_lote
+from utils.validators import normalizar_texto, padronizar_categoria
+
+CATEGORIZADOR_DIMENSOES = int(os.environ.get("CATEGORIZADOR_DIMENSOES", 4096))
+CATEGORIZADOR_ALFA = float(os.environ.get("CATEGORIZADOR_ALFA", 0.1))
+CATEGORIZADOR_CONFIANCA = float(os.environ.get("CATEGORIZADOR_CONFIANCA", 0.6))
+CATEGORIZADOR_COBERTURA = float(os.environ.get("CATEGORIZADOR_COBERTURA", 0.5))
+
+_PALAVRA = re.compile(r"[a-z0-9]*[a-z][a-z0-9]*")
+
+
+@lru_cache(maxsize=65536)
+def _balde(palavra, dimensoes):
+    # crc32 e não hash(): o balde precisa ser o mesmo em todos os processos
+    return zlib.crc32(palavra.encode("utf-8")) % dimensoes
+
+
+@lru_cache(maxsize=16384)
+def _baldes(descricao, dimensoes):
+    """Baldes das palavras da descrição, com repetição; números soltos e letras isoladas não contam"""
+    return tuple(_balde(p, dimensoes) for p in _PALAVRA.findall(normalizar_texto(descricao or "")) if len(p) > 1)
+
+
+def _pares(descricoes, dimensoes):
+    """(linha, balde) de cada palavra das descrições e o número de palavras de cada uma"""
+    por_descricao = [_baldes(d, dimensoes) for d in descricoes]
+    palavras = np.fromiter((len(b) for b in por_descricao), dtype=np.int64, count=len(por_descricao))
+    linhas = np.repeat(np.arange(len(por_descricao)), palavras)
+    baldes = np.fromiter((b for bs in por_descricao for b in bs), dtype=np.int64, count=int(palavras.sum()))
+    return linhas, baldes, palavras
+
+
+class Classificador:
+    """Contagens de um naive Bayes multinomial: `contagens[c, b]` palavras no balde b em transações da categoria c"""
+
+    def __init__(self, categorias=(), contagens=None, documentos=None, dimensoes=CATEGORIZADOR_DIMENSOES):
+        self.dimensoes = dimensoes
+        self.categorias = list(categorias)
+        self.contagens = np.zeros((len(self.categorias), dimensoes), np.uint32) if contagens is None else contagens
+        self.documentos = np.zeros(len(self.categorias), np.uint32) if documentos is None else documentos
+        self._parametros = None
+
+    def __len__(self):
+        return int(self.documentos.sum())
+
+    @property
+    def nbytes(self):
+        return self.contagens.nbytes + self.documentos.nbytes
+
+    def copia(self):
+        return Classificador(self.categorias, self.contagens.copy(), self.documentos.copy(), self.dimensoes)
+
+    def _codigos(self, categorias):
+        indices = {nome: i for i, nome in enumerate(self.categorias)}
+        novas = [c for c in dict.fromkeys(categorias) if c not in indices]
+        if novas:
+            for nome in novas:
+                indices[nome] = len(indices)
+            self.categorias.extend(novas)
+            self.contagens = np.vstack([self.contagens, np.zeros((len(novas), self.dimensoes), np.uint32)])
+            self.documentos = np.concatenate([self.documentos, np.zeros(len(novas), np.uint32)])
+        return np.fromiter((indices[c] for c in categorias), dtype=np.int64, count=len(categorias))
+
+    def treinar(self, descricoes, categorias):
+        if not descricoes:
+            return
+        padronizadas = {c: padronizar_categoria(c) for c in set(categorias)}
+        codigos = self._codigos([padronizadas[c] for c in categorias])
+        linhas, baldes, _ = _pares(descricoes, self.dimensoes)
+        total = len(self.categorias)
+        self.contagens += np.bincount(
+            codigos[linhas] * self.dimensoes + baldes, minlength=total * self.dimensoes
+        ).reshape(total, self.dimensoes).astype(np.uint32)
+        self.documentos += np.bincount(codigos, minlength=total).astype(np.uint32)
+        self._parametros = None
+
+    def somar(self, outro):
+        """Acrescenta as contagens de outro classificador, com as mesmas dimensões"""
+        codigos = self._codigos(outro.categorias)
+        self.contagens[codigos] += outro.contagens
+        self.documentos[codigos] += outro.documentos
+        self._parametros = None
+
+    def _log_probabilidades(self):
+        if self._parametros is None:
+            contagens = self.contagens.astype(np.float64)
+            priori = np.log(self.documentos / self.documentos.sum())
+            verossimilhanca = np.log(contagens + CATEGORIZADOR_ALFA) - np.log(
+                contagens.sum(axis=1, keepdims=True) + CATEGORIZADOR_ALFA * self.dimensoes
+            )
+            self._parametros = priori, verossimilhanca, self.contagens.any(axis=0)
+        return self._parametros
+
+    def prever(self, descricoes):
+        """Categoria mais provável de cada descrição, ou None quando o modelo não tem confiança"""
+        if not len(self) or not descricoes:
+            return [None] * len(descricoes)
+        priori, verossimilhanca, conhecidos = self._log_probabilidades()
+        linhas, baldes, palavras = _pares(descricoes, self.dimensoes)
+        # palavras nunca vistas não distinguem categorias; a cobertura mede quantas o modelo conhece
+        mascara = conhecidos[baldes]
+        linhas, baldes = linhas[mascara], baldes[mascara]
+        total = len(descricoes)
+        cobertura = np.bincount(linhas, minlength=total) / np.maximum(palavras, 1)
+
+        pontos = np.empty((total, len(self.categorias)))
+        for c in range(len(self.categorias)):
+            pontos[:, c] = priori[c] + np.bincount(linhas, weights=verossimilhanca[c, baldes], minlength=total)
+        pontos -= pontos.max(axis=1, keepdims=True)
+        probabilidades = np.exp(pontos)
+        probabilidades /= probabilidades.sum(axis=1, keepdims=True)
+        melhores = probabilidades.argmax(axis=1)
+        confianca = probabilidades[np.arange(total), melhores]
+
+        aceitas = (cobertura >= CATEGORIZADOR_COBERTURA) & (cobertura > 0) & (confianca >= CATEGORIZADOR_CONFIANCA)
+        return [self.categorias[m] if ok else None for m, ok in zip(melhores.tolist(), aceitas.tolist())]
+
+    def em_bytes(self):
+        """Contagens não nulas, comprimidas; a matriz é quase toda zeros"""
+        indices = np.flatnonzero(self.contagens)
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer, indices=indices.astype(np.int64), valores=self.contagens.ravel()[indices], documentos=self.documentos
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def de_bytes(cls, categorias, dados, dimensoes):
+        arquivo = np.load(io.BytesIO(dados), allow_pickle=False)
+        contagens = np.zeros(len(categorias) * dimensoes, np.uint32)
+        contagens[arquivo["indices"]] = arquivo["valores"]
+        return cls(categorias, contagens.reshape(len(categorias), dimensoes), arquivo["documentos"], dimensoes)
+
+
+def _consulta_modelo(user_id):
+    return select(ModeloCategorias.categorias, ModeloCategorias.contagens, ModeloCategorias.dimensoes).where(
+        ModeloCategorias.user_id == user_id
+    )
+
+
+def carregar_modelo(user_id):
+    linha = session.execute(_consulta_modelo(user_id)).first()
+    if linha is None or linha.dimensoes != CATEGORIZADOR_DIMENSOES:
+        # sem modelo, ou gravado com outro número de baldes: recomeça do zero
+        return Classificador()
+    return Classificador.de_bytes(linha.categorias, linha.contagens, linha.dimensoes)
+
+
+def _gravar_modelo(user_id, classificador):
+    valores = dict(
+        dimensoes=classificador.dimensoes,
+        categorias=classificador.categorias,
+        contagens=classificador.em_bytes(),
+        atualizado_em=datetime.now(timezone.utc),
+    )
+    resultado = session.execute(update(ModeloCategorias).where(ModeloCategorias.user_id == user_id).values(valores))
+    if resultado.rowcount == 0:
+        session.execute(insert(ModeloCategorias).values(user_id=user_id, **valores))
+
+
+class Categorizador:
+    """Categorização e treino do modelo de um usuário durante uma escrita.
+
+    O treino vale de imediato para as próximas categorizações da mesma escrita,
+    mas só é gravado por `salvar`, na transação corrente, depois de
+    `registrar_alteracao`; `publicar` leva o modelo ao cache depois do commit.
+    """
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.versao = None
+        self.modelo = None
+        self.treino = None
+        self.publicado = None
+
+    def _modelo(self):
+        if self.modelo is None:
+            self.versao = versao_dados(self.user_id)
+            self.modelo = modelos_categorias.obter(self.user_id, self.versao)
+            if self.modelo is None:
+                self.modelo = carregar_modelo(self.user_id)
+                modelos_categorias.guardar(self.user_id, self.versao, self.modelo)
+        return self.modelo
+
+    def categorizar(self, descricoes):
+        """Categorias das descrições, num lote: o modelo do usuário e, sem confiança, as palavras-chave"""
+        descricoes = list(descricoes)
+        unicas = list(dict.fromkeys(descricoes))
+        previstas = dict(zip(unicas, self._modelo().prever(unicas)))
+        pendentes = [d for d in unicas if previstas[d] is None]
+        previstas.update(zip(pendentes, categorizar_lote(pendentes)))
+        return [previstas[d] for d in descricoes]
+
+    def treinar(self, descricoes, categorias):
+        if not descricoes:
+            return
+        if self.treino is None:
+            # copia: o modelo em cache não muda antes do commit
+            self.modelo = self._modelo().copia()
+            self.treino = Classificador()
+        lote = Classificador()
+        lote.treinar(descricoes, categorias)
+        self.modelo.somar(lote)
+        self.treino.somar(lote)
+
+    def salvar(self):
+        if self.modelo is None:
+            return
+        versao = versao_dados(self.user_id)
+        atualizado = versao == self.versao + 1
+        if self.treino is not None:
+            if not atualizado:
+                # outro processo gravou desde a leitura: soma o treino desta escrita ao modelo atual
+                self.modelo = carregar_modelo(self.user_id)
+                self.modelo.somar(self.treino)
+                atualizado = True
+            _gravar_modelo(self.user_id, self.modelo)
+        if atualizado:
+            self.publicado = (versao, self.modelo)
+
+    def publicar(self):
+        if self.publicado is not None:
+            modelos_categorias.guardar(self.user_id, *self.publicado)
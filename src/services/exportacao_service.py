@@ -0,0 +1,55 @@
+import io
+import csv
+from sqlalchemy import String, cast, select
+from models import engine, Transacao
+from services.transacoes_service import filtros_transacoes
+from utils.pdf_stream import gerar_pdf
+
+EXPORTACAO_LOTE = 1000
+
+
+def consulta_exportacao(current_user, filtros={}):
+    """Transações filtradas como em `listar_transacoes`, em ordem cronológica.
+
+    Os filtros são validados aqui, antes de a resposta começar a ser enviada.
+    """
+    return select(
+        cast(Transacao.data, String).label("data"),
+        Transacao.descricao,
+        Transacao.valor,
+        Transacao.categoria,
+    ).where(*filtros_transacoes(current_user, filtros)).order_by(Transacao.data, Transacao.id)
+
+
+def _lotes(consulta, tamanho=EXPORTACAO_LOTE):
+    # conexão própria: a sessão da requisição já foi removida quando o corpo é gerado
+    with engine.connect() as conn:
+        resultado = conn.execution_options(stream_results=True, yield_per=tamanho).execute(consulta)
+        for lote in resultado.partitions():
+            yield lote
+
+
+def exportar_csv(consulta):
+    """Gera o CSV em pedaços, no mesmo formato aceito pelo upload"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["data", "descricao", "valor", "categoria"])
+    for lote in _lotes(consulta):
+        writer.writerows(lote)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _linha_pdf(transacao):
+    valor = transacao.valor if transacao.valor is not None else '-'
+    descricao = transacao.descricao.replace("|", "/")
+    return f"{transacao.data} | {descricao} | {valor} | {transacao.categoria or '-'}"
+
+
+def exportar_pdf(consulta, titulo="Extrato de transações"):
+    """Gera o PDF página a página; as linhas seguem o formato lido pelo upload de PDF"""
+    linhas = (_linha_pdf(t) for lote in _lotes(consulta) for t in lote)
+    return gerar_pdf(linhas, titulo)
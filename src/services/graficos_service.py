@@ -1,32 +1,146 @@
-from sqlalchemy import func, extract, and_
-from datetime import datetime
-from models import session, Transacao
+import os
+import math
+from calendar import monthrange
+from sqlalchemy import String, cast, func, extract, select
+from datetime import date, datetime, timedelta
+from models import session, Transacao, ResumoMensal
+from services.motor_insights import calcular_insights
+from services.cache_service import em_cache
 
-def gastos_por_categoria_service(current_user, categoria=None, data_inicio=None, data_fim=None):
-    filtros = [Transacao.user_id == current_user.id]
+USAR_RESUMO_MENSAL = os.environ.get("USAR_RESUMO_MENSAL", "1") != "0"
+# "sql" agrega no banco a cada requisição; "numpy" agrega em memória (services/analise_numpy.py)
+GRAFICOS_BACKEND = os.environ.get("GRAFICOS_BACKEND", "sql")
+GRANULARIDADES = ("dia", "semana", "mes", "ano")
+SERIE_MAX_PERIODOS = int(os.environ.get("SERIE_MAX_PERIODOS", 20000))
+
+
+def _periodo_mensal(data_inicio=None, data_fim=None):
+    """Retorna o intervalo (ano*100 + mes) quando os filtros cobrem meses inteiros, senão None"""
+    if not USAR_RESUMO_MENSAL:
+        return None
+
+    inicio = fim = None
+    if data_inicio:
+        dt_inicio = datetime.strptime(data_inicio, '%Y-%m-%d').date()
+        if dt_inicio.day != 1:
+            return None
+        inicio = dt_inicio.year * 100 + dt_inicio.month
+
+    if data_fim:
+        dt_fim = datetime.strptime(data_fim, '%Y-%m-%d').date()
+        if dt_fim.day != monthrange(dt_fim.year, dt_fim.month)[1]:
+            return None
+        fim = dt_fim.year * 100 + dt_fim.month
+
+    return inicio, fim
+
+
+def _filtros_resumo(current_user, categoria, periodo):
+    filtros = [ResumoMensal.user_id == current_user.id]
 
     if categoria:
-        filtros.append(func.lower(Transacao.categoria) == categoria.lower())
+        filtros.append(func.lower(ResumoMensal.categoria) == categoria.lower())
+
+    inicio, fim = periodo
+    ano_mes = ResumoMensal.ano * 100 + ResumoMensal.mes
+    if inicio:
+        filtros.append(ano_mes >= inicio)
+    if fim:
+        filtros.append(ano_mes <= fim)
+
+    return filtros
+
+
+def _consulta_categoria_resumo(current_user, categoria, periodo):
+    return (
+        select(
+            func.nullif(ResumoMensal.categoria, '').label('categoria'),
+            func.sum(ResumoMensal.soma).label('valor_total')
+        )
+        .where(*_filtros_resumo(current_user, categoria, periodo))
+        .group_by(ResumoMensal.categoria)
+        .order_by(func.sum(ResumoMensal.soma).desc())
+    )
+
+
+def _consulta_mes_resumo(current_user, categoria, periodo):
+    return (
+        select(
+            ResumoMensal.mes.label('mes'),
+            func.sum(ResumoMensal.soma).label('valor_total')
+        )
+        .where(*_filtros_resumo(current_user, categoria, periodo))
+        .group_by(ResumoMensal.mes)
+        .order_by(ResumoMensal.mes)
+    )
+
+
+def filtros_periodo(current_user, data_inicio, data_fim):
+    filtros = [Transacao.user_id == current_user.id]
 
     if data_inicio:
-        dt_inicio = datetime.strptime(data_inicio, '%Y-%m-%d')
+        dt_inicio = datetime.strptime(data_inicio, '%Y-%m-%d').date()
         filtros.append(Transacao.data >= dt_inicio)
 
     if data_fim:
-        dt_fim = datetime.strptime(data_fim, '%Y-%m-%d')
+        dt_fim = datetime.strptime(data_fim, '%Y-%m-%d').date()
         filtros.append(Transacao.data <= dt_fim)
 
-    resultado = (
-        session.query(
+    return filtros
+
+
+def _filtros_graficos(current_user, categoria, data_inicio, data_fim):
+    filtros = filtros_periodo(current_user, data_inicio, data_fim)
+    if categoria:
+        filtros.append(func.lower(Transacao.categoria) == categoria.lower())
+    return filtros
+
+
+def consulta_gastos_por_categoria(current_user, categoria=None, data_inicio=None, data_fim=None):
+    """Consulta do gráfico por categoria; usa o resumo mensal quando os filtros cobrem meses inteiros"""
+    periodo = _periodo_mensal(data_inicio, data_fim)
+    if periodo:
+        return _consulta_categoria_resumo(current_user, categoria, periodo)
+
+    return (
+        select(
             Transacao.categoria,
             func.sum(Transacao.valor).label('valor_total')
         )
-        .filter(and_(*filtros))
+        .where(*_filtros_graficos(current_user, categoria, data_inicio, data_fim))
         .group_by(Transacao.categoria)
         .order_by(func.sum(Transacao.valor).desc())
-        .all()
     )
 
+
+def consulta_gastos_gerais(current_user, categoria=None, data_inicio=None, data_fim=None):
+    periodo = _periodo_mensal(data_inicio, data_fim)
+    if periodo:
+        return _consulta_mes_resumo(current_user, categoria, periodo)
+
+    return (
+        select(
+            extract('month', Transacao.data).label('mes'),
+            func.sum(Transacao.valor).label('valor_total')
+        )
+        .where(*_filtros_graficos(current_user, categoria, data_inicio, data_fim))
+        .group_by('mes')
+        .order_by('mes')
+    )
+
+
+@em_cache("categoria")
+def gastos_por_categoria_service(current_user, categoria=None, data_inicio=None, data_fim=None):
+    if GRAFICOS_BACKEND == "numpy":
+        from services import analise_numpy
+        colunas = analise_numpy.colunas_usuario(current_user.id)
+        return _formatar_gastos_por_categoria(analise_numpy.gastos_por_categoria(colunas, categoria, data_inicio, data_fim))
+
+    consulta = consulta_gastos_por_categoria(current_user, categoria, data_inicio, data_fim)
+    return _formatar_gastos_por_categoria(session.execute(consulta).all())
+
+
+def _formatar_gastos_por_categoria(resultado):
     total = sum([r.valor_total for r in resultado])
     return [
         {
@@ -38,31 +152,18 @@ def gastos_por_categoria_service(current_user, categoria=None, data_inicio=None,
     ]
 
 
+@em_cache("geral")
 def gastos_gerais_service(current_user, categoria=None, data_inicio=None, data_fim=None):
-    filtros = [Transacao.user_id == current_user.id]
+    if GRAFICOS_BACKEND == "numpy":
+        from services import analise_numpy
+        colunas = analise_numpy.colunas_usuario(current_user.id)
+        return _formatar_gastos_gerais(analise_numpy.gastos_por_mes(colunas, categoria, data_inicio, data_fim))
 
-    if categoria:
-        filtros.append(func.lower(Transacao.categoria) == categoria.lower())
+    consulta = consulta_gastos_gerais(current_user, categoria, data_inicio, data_fim)
+    return _formatar_gastos_gerais(session.execute(consulta).all())
 
-    if data_inicio:
-        dt_inicio = datetime.strptime(data_inicio, '%Y-%m-%d')
-        filtros.append(Transacao.data >= dt_inicio)
-
-    if data_fim:
-        dt_fim = datetime.strptime(data_fim, '%Y-%m-%d')
-        filtros.append(Transacao.data <= dt_fim)
-
-    meses = (
-        session.query(
-            extract('month', Transacao.data).label('mes'),
-            func.sum(Transacao.valor).label('valor_total')
-        )
-        .filter(and_(*filtros))
-        .group_by('mes')
-        .order_by('mes')
-        .all()
-    )
 
+def _formatar_gastos_gerais(meses):
     mes_nome = {
         1: "Jan", 2: "Fev", 3: "Mar", 4: "Abr",
         5: "Mai", 6: "Jun", 7: "Jul", 8: "Ago",
@@ -77,64 +178,164 @@ def gastos_gerais_service(current_user, categoria=None, data_inicio=None, data_f
     }
 
 
+@em_cache("insights")
 def insights_service(current_user, data_inicio=None, data_fim=None):
-    filtros = [Transacao.user_id == current_user.id]
+    if GRAFICOS_BACKEND == "numpy":
+        from services import analise_numpy
+        return analise_numpy.insights(analise_numpy.colunas_usuario(current_user.id), data_inicio, data_fim)
+    return calcular_insights(filtros_periodo(current_user, data_inicio, data_fim))
 
-    if data_inicio:
-        dt_inicio = datetime.strptime(data_inicio, '%Y-%m-%d')
-        filtros.append(Transacao.data >= dt_inicio)
 
-    if data_fim:
-        dt_fim = datetime.strptime(data_fim, '%Y-%m-%d')
-        filtros.append(Transacao.data <= dt_fim)
+def _data_serie(valor):
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date() if valor else None
+    except ValueError:
+        raise ValueError("Formato de data inválido")
 
-    maior_categoria = (
-        session.query(
-            Transacao.categoria,
-            func.sum(Transacao.valor).label('valor_total')
-        )
-        .filter(and_(*filtros))
-        .group_by(Transacao.categoria)
-        .order_by(func.sum(Transacao.valor).desc())
-        .first()
-    )
 
-    media_semanal = (
-        session.query(func.avg(Transacao.valor).label('media'))
-        .filter(and_(*filtros))
-        .scalar()
-    )
+def _inicio_periodo(data, granularidade):
+    if granularidade == "semana":
+        return data - timedelta(days=data.weekday())
+    if granularidade == "mes":
+        return data.replace(day=1)
+    if granularidade == "ano":
+        return data.replace(month=1, day=1)
+    return data
 
-    maior_gasto = (
-        session.query(Transacao)
-        .filter(and_(*filtros))
-        .order_by(Transacao.valor.desc())
-        .first()
-    )
 
-    menor_gasto = (
-        session.query(Transacao)
-        .filter(and_(*filtros))
-        .order_by(Transacao.valor.asc())
-        .first()
-    )
+def _proximo_periodo(data, granularidade):
+    if granularidade == "dia":
+        return data + timedelta(days=1)
+    if granularidade == "semana":
+        return data + timedelta(days=7)
+    if granularidade == "mes":
+        return date(data.year + data.month // 12, data.month % 12 + 1, 1)
+    return date(data.year + 1, 1, 1)
 
-    dia_mes_media = (
-        session.query(
-            extract('day', Transacao.data).label('dia_mes'),
-            func.avg(Transacao.valor).label('media_valor')
-        )
-        .filter(and_(*filtros))
-        .group_by('dia_mes')
-        .order_by(func.avg(Transacao.valor).desc())
-        .first()
-    )
 
-    return {
-        "maior_categoria": maior_categoria.categoria if maior_categoria else None,
-        "maior_categoria_valor": float(maior_categoria.valor_total) if maior_categoria else 0,
-        "media_semanal": float(media_semanal) if media_semanal else 0,
-        "maior_gasto": {"descricao": maior_gasto.descricao, "valor": float(maior_gasto.valor) if maior_gasto else 0} if maior_gasto else None,
-        "menor_gasto": {"descricao": menor_gasto.descricao, "valor": float(menor_gasto.valor) if menor_gasto else 0} if menor_gasto else None,
-        "dia_maior_gasto_media": int(dia_mes_media.dia_mes) if dia_mes_media else None
+def _expressao_periodo(granularidade, dialeto):
+    """Início do período de cada transação, como texto ISO, calculado no banco"""
+    coluna = Transacao.data
+    if granularidade != "dia" and dialeto == "sqlite":
+        return {
+            "semana": func.date(coluna, 'weekday 0', '-6 days'),
+            "mes": func.strftime('%Y-%m-01', coluna),
+            "ano": func.strftime('%Y-01-01', coluna),
+        }[granularidade]
+    if granularidade != "dia" and dialeto == "postgresql":
+        unidade = {"semana": "week", "mes": "month", "ano": "year"}[granularidade]
+        return func.to_char(func.date_trunc(unidade, coluna), 'YYYY-MM-DD')
+    # nos demais bancos agrupa por dia; `montar_serie` junta os dias do mesmo período
+    return cast(coluna, String)
+
+
+def _categorias_serie(categoria):
+    return [c.strip().lower() for c in (categoria or "").split(",") if c.strip()]
+
+
+def consulta_serie(current_user, granularidade="mes", data_inicio=None, data_fim=None,
+                   categoria=None, por_categoria=False, dialeto="sqlite"):
+    """Soma por período (e por categoria), em uma consulta.
+
+    Meses e anos de períodos com meses inteiros saem do resumo mensal.
+    """
+    if granularidade not in GRANULARIDADES:
+        raise ValueError(f"Granularidade inválida, use {', '.join(GRANULARIDADES)}")
+    _data_serie(data_inicio)
+    _data_serie(data_fim)
+    categorias = _categorias_serie(categoria)
+
+    periodo = _periodo_mensal(data_inicio, data_fim) if granularidade in ("mes", "ano") else None
+    if periodo:
+        filtros = _filtros_resumo(current_user, None, periodo)
+        if categorias:
+            filtros.append(func.lower(ResumoMensal.categoria).in_(categorias))
+        chave = ResumoMensal.ano * 100 + (ResumoMensal.mes if granularidade == "mes" else 1)
+        colunas = [chave.label("periodo")]
+        if por_categoria:
+            colunas.append(func.nullif(ResumoMensal.categoria, '').label("categoria"))
+        return select(*colunas, func.sum(ResumoMensal.soma).label("valor_total")).where(*filtros).group_by(*colunas)
+
+    filtros = filtros_periodo(current_user, data_inicio, data_fim)
+    filtros.append(Transacao.valor.isnot(None))
+    if categorias:
+        filtros.append(func.lower(Transacao.categoria).in_(categorias))
+    colunas = [_expressao_periodo(granularidade, dialeto).label("periodo")]
+    if por_categoria:
+        colunas.append(Transacao.categoria)
+    return select(*colunas, func.sum(Transacao.valor).label("valor_total")).where(*filtros).group_by(*colunas)
+
+
+def _data_periodo(periodo):
+    if isinstance(periodo, int):
+        return date(periodo // 100, periodo % 100, 1)
+    return date.fromisoformat(str(periodo)[:10])
+
+
+def _max_pontos(valor):
+    if valor is None:
+        return None
+    try:
+        valor = int(valor)
+    except (TypeError, ValueError):
+        valor = 0
+    if valor < 1:
+        raise ValueError("max_pontos deve ser um inteiro positivo")
+    return valor
+
+
+def _reduzir(valores, passo):
+    return [round(sum(valores[i:i + passo]), 2) for i in range(0, len(valores), passo)]
+
+
+def montar_serie(linhas, granularidade="mes", data_inicio=None, data_fim=None, por_categoria=False, max_pontos=None):
+    """Série com todos os períodos entre o início e o fim, zerando os sem gastos.
+
+    Com `max_pontos`, períodos consecutivos são somados em grupos de `agrupamento`
+    até caberem no limite; os totais do intervalo não mudam.
+    """
+    max_pontos = _max_pontos(max_pontos)
+    somas, por_serie = {}, {}
+    for linha in linhas:
+        inicio = _inicio_periodo(_data_periodo(linha.periodo), granularidade)
+        valor = float(linha.valor_total or 0)
+        somas[inicio] = somas.get(inicio, 0.0) + valor
+        if por_categoria:
+            serie = por_serie.setdefault(linha.categoria, {})
+            serie[inicio] = serie.get(inicio, 0.0) + valor
+
+    inicio = _data_serie(data_inicio) or (min(somas) if somas else None)
+    fim = _data_serie(data_fim) or (max(somas) if somas else None)
+    periodos = []
+    if inicio and fim:
+        atual, fim = _inicio_periodo(inicio, granularidade), _inicio_periodo(fim, granularidade)
+        while atual <= fim:
+            periodos.append(atual)
+            if len(periodos) > SERIE_MAX_PERIODOS:
+                raise ValueError("Período longo demais para a granularidade")
+            atual = _proximo_periodo(atual, granularidade)
+
+    passo = math.ceil(len(periodos) / max_pontos) if max_pontos and len(periodos) > max_pontos else 1
+    resposta = {
+        "granularidade": granularidade,
+        "agrupamento": passo,
+        "periodos": [p.isoformat() for p in periodos[::passo]],
+        "valores": _reduzir([somas.get(p, 0.0) for p in periodos], passo),
     }
+    if por_categoria:
+        series = [
+            {"categoria": categoria, "valores": _reduzir([serie.get(p, 0.0) for p in periodos], passo)}
+            for categoria, serie in por_serie.items()
+        ]
+        resposta["series"] = sorted(series, key=lambda s: (-sum(s["valores"]), s["categoria"] or ""))
+    return resposta
+
+
+@em_cache("serie")
+def serie_temporal_service(current_user, granularidade="mes", data_inicio=None, data_fim=None,
+                           categoria=None, por_categoria=False, max_pontos=None):
+    max_pontos = _max_pontos(max_pontos)
+    consulta = consulta_serie(
+        current_user, granularidade, data_inicio, data_fim, categoria, por_categoria, session.get_bind().dialect.name
+    )
+    return montar_serie(session.execute(consulta).all(), granularidade, data_inicio, data_fim, por_categoria, max_pontos)
@@ -0,0 +1,217 @@
+import os
+import uuid
+import logging
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import update
+from sqlalchemy.exc import OperationalError
+from models import session, engine, UploadJob
+from services.transacoes_service import processar_csv, processar_pdf
+
+UPLOAD_DIR = os.environ.get("UPLOAD_DIR", os.path.join(tempfile.gettempdir(), "invoice-analyzer-uploads"))
+UPLOAD_WORKERS = int(os.environ.get("UPLOAD_WORKERS", 2))
+# jobs não finalizados sem atualização há mais que isso são de um processo que parou
+UPLOAD_JOB_TIMEOUT = float(os.environ.get("UPLOAD_JOB_TIMEOUT", 3600))
+# intervalo mínimo, em segundos, entre gravações do progresso de um job no banco
+UPLOAD_PROGRESSO_INTERVALO = float(os.environ.get("UPLOAD_PROGRESSO_INTERVALO", 5))
+
+PROCESSADORES = {"csv": processar_csv, "pdf": processar_pdf}
+STATUS_FINAIS = {"concluido", "erro"}
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+# Progresso dos jobs na fila ou rodando neste processo, por id: (user_id, job serializado).
+# O banco recebe as transições de status e, a cada UPLOAD_PROGRESSO_INTERVALO, o progresso,
+# que serve de heartbeat para os outros processos.
+_ativos = {}
+_ativos_lock = threading.Lock()
+_progresso_gravado_em = {}
+
+
+def _agora():
+    return datetime.now(timezone.utc)
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # primeiro upload deste processo: encerra os jobs deixados por processos que pararam
+            expirar_jobs()
+            _executor = ThreadPoolExecutor(max_workers=UPLOAD_WORKERS, thread_name_prefix="upload")
+        return _executor
+
+
+def _caminho_arquivo(job_id, tipo):
+    return os.path.join(UPLOAD_DIR, f"{job_id}.{tipo}")
+
+
+def _remover_arquivo(caminho):
+    try:
+        os.remove(caminho)
+    except OSError:
+        pass
+
+
+def expirar_jobs(job_id=None):
+    """Marca como erro os jobs pendentes ou processando sem atualização há mais de UPLOAD_JOB_TIMEOUT.
+
+    São jobs de um processo que reiniciou ou foi encerrado: nunca terminariam, e
+    o cliente ficaria consultando o status para sempre. Um job rodando em
+    qualquer processo atualiza `atualizado_em` com o progresso, e os jobs deste
+    processo nunca expiram. Retorna os ids expirados.
+    """
+    limite = _agora() - timedelta(seconds=UPLOAD_JOB_TIMEOUT)
+    consulta = session.query(UploadJob).filter(
+        UploadJob.status.in_(("pendente", "processando")), UploadJob.atualizado_em < limite
+    )
+    if job_id is not None:
+        consulta = consulta.filter(UploadJob.id == job_id)
+    with _ativos_lock:
+        expirados = [job for job in consulta if job.id not in _ativos]
+    for job in expirados:
+        job.status = "erro"
+        job.erros = ["Processamento interrompido; envie o arquivo novamente"]
+        job.atualizado_em = _agora()
+    try:
+        session.commit()
+    except OperationalError:
+        # SQLite com outra escrita em andamento: fica para a próxima consulta
+        session.rollback()
+        return []
+    for job in expirados:
+        _remover_arquivo(_caminho_arquivo(job.id, job.tipo))
+    return [job.id for job in expirados]
+
+
+def _serializar_job(job):
+    return {
+        "id": job.id,
+        "tipo": job.tipo,
+        "status": job.status,
+        "linhas_processadas": job.linhas_processadas,
+        "erros": job.erros or [],
+        "resultado": job.resultado,
+        "criado_em": job.criado_em.isoformat(),
+        "atualizado_em": job.atualizado_em.isoformat(),
+    }
+
+
+def _atualizar_job(job_id, **campos):
+    job = session.get(UploadJob, job_id)
+    for campo, valor in campos.items():
+        setattr(job, campo, valor)
+    job.atualizado_em = _agora()
+    session.commit()
+    return job
+
+
+def _escrita_do_upload_em_andamento():
+    # no SQLite o upload segura o lock de escrita do primeiro INSERT até o commit,
+    # e outra conexão só esperaria por ele
+    if session.get_bind().dialect.name != "sqlite":
+        return False
+    return session.connection().connection.driver_connection.in_transaction
+
+
+def _gravar_progresso(job_id, linhas, agora):
+    """Grava o progresso numa conexão própria: a sessão da thread está na transação do upload"""
+    try:
+        with engine.begin() as conn:
+            conn.execute(
+                update(UploadJob).where(UploadJob.id == job_id).values(linhas_processadas=linhas, atualizado_em=agora)
+            )
+    except OperationalError:
+        logger.warning("Progresso do job %s não gravado", job_id, exc_info=True)
+
+
+def _registrar_progresso(job_id, linhas):
+    agora = _agora()
+    with _ativos_lock:
+        if job_id not in _ativos:
+            return
+        _, job = _ativos[job_id]
+        job["linhas_processadas"] = linhas
+        job["atualizado_em"] = agora.isoformat()
+        gravar = time.monotonic() - _progresso_gravado_em.get(job_id, float("-inf")) >= UPLOAD_PROGRESSO_INTERVALO
+        if gravar:
+            _progresso_gravado_em[job_id] = time.monotonic()
+    if gravar and not _escrita_do_upload_em_andamento():
+        _gravar_progresso(job_id, linhas, agora)
+
+
+def _executar(job_id, current_user, tipo, caminho):
+    try:
+        job = _atualizar_job(job_id, status="processando")
+        with _ativos_lock:
+            _ativos[job_id] = (job.user_id, _serializar_job(job))
+
+        with open(caminho, "rb") as arquivo:
+            try:
+                resultado = PROCESSADORES[tipo](
+                    current_user, arquivo, progresso=lambda linhas: _registrar_progresso(job_id, linhas)
+                )
+            except ValueError as e:
+                erros = e.args[0] if e.args and isinstance(e.args[0], list) else [str(e)]
+                _atualizar_job(job_id, status="erro", erros=erros)
+                return
+            except Exception:
+                logger.exception("Falha no job de upload %s", job_id)
+                session.rollback()
+                _atualizar_job(job_id, status="erro", erros=["Erro interno ao processar o arquivo"])
+                return
+
+        _atualizar_job(
+            job_id, status="concluido", resultado=resultado,
+            linhas_processadas=resultado.get("transacoes_processadas", 0)
+        )
+    finally:
+        with _ativos_lock:
+            _ativos.pop(job_id, None)
+            _progresso_gravado_em.pop(job_id, None)
+        session.remove()
+        _remover_arquivo(caminho)
+
+
+def enfileirar_upload(current_user, file, tipo):
+    if tipo not in PROCESSADORES:
+        raise ValueError(f"Tipo de upload inválido: {tipo}")
+    if file is None:
+        raise ValueError("Arquivo ausente")
+
+    job_id = uuid.uuid4().hex
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    caminho = _caminho_arquivo(job_id, tipo)
+    file.save(caminho)
+
+    agora = _agora()
+    job = UploadJob(
+        id=job_id, user_id=current_user.id, tipo=tipo, status="pendente",
+        linhas_processadas=0, criado_em=agora, atualizado_em=agora
+    )
+    session.add(job)
+    session.commit()
+    resposta = _serializar_job(job)
+
+    executor = _get_executor()
+    with _ativos_lock:
+        _ativos[job_id] = (current_user.id, dict(resposta))
+    executor.submit(_executar, job_id, current_user, tipo, caminho)
+    return resposta
+
+
+def obter_job(current_user, job_id):
+    with _ativos_lock:
+        if job_id in _ativos:
+            user_id, job = _ativos[job_id]
+            return dict(job) if user_id == current_user.id else None
+
+    job = session.query(UploadJob).filter_by(id=job_id, user_id=current_user.id).first()
+    if job is not None and job.status not in STATUS_FINAIS:
+        expirar_jobs(job_id)
+    return _serializar_job(job) if job else None
@@ -0,0 +1,73 @@
+"""Versões assíncronas dos serviços de leitura, usadas pelo modo ASGI.
+
+As consultas são as mesmas dos serviços síncronos; só a execução muda, sobre
+uma `AsyncConnection` do `engine_async()`.
+"""
+import asyncio
+from models import session
+from services import graficos_service
+from services.busca_service import backend_busca
+from services.cache_service import em_cache_async
+from services.graficos_service import (
+    consulta_gastos_por_categoria, consulta_gastos_gerais, consulta_serie, montar_serie, filtros_periodo,
+    _formatar_gastos_por_categoria, _formatar_gastos_gerais, _max_pontos
+)
+from services.motor_insights import calcular_insights_async
+from services.transacoes_service import consulta_linhas_transacoes, pagina_linhas
+
+
+@em_cache_async("categoria")
+async def gastos_por_categoria_async(conexao, current_user, categoria=None, data_inicio=None, data_fim=None):
+    if graficos_service.GRAFICOS_BACKEND == "numpy":
+        from services import analise_numpy
+        colunas = await analise_numpy.colunas_usuario_async(conexao, current_user.id)
+        return _formatar_gastos_por_categoria(analise_numpy.gastos_por_categoria(colunas, categoria, data_inicio, data_fim))
+
+    consulta = consulta_gastos_por_categoria(current_user, categoria, data_inicio, data_fim)
+    return _formatar_gastos_por_categoria((await conexao.execute(consulta)).all())
+
+
+@em_cache_async("geral")
+async def gastos_gerais_async(conexao, current_user, categoria=None, data_inicio=None, data_fim=None):
+    if graficos_service.GRAFICOS_BACKEND == "numpy":
+        from services import analise_numpy
+        colunas = await analise_numpy.colunas_usuario_async(conexao, current_user.id)
+        return _formatar_gastos_gerais(analise_numpy.gastos_por_mes(colunas, categoria, data_inicio, data_fim))
+
+    consulta = consulta_gastos_gerais(current_user, categoria, data_inicio, data_fim)
+    return _formatar_gastos_gerais((await conexao.execute(consulta)).all())
+
+
+@em_cache_async("insights")
+async def insights_async(conexao, current_user, data_inicio=None, data_fim=None):
+    if graficos_service.GRAFICOS_BACKEND == "numpy":
+        from services import analise_numpy
+        return analise_numpy.insights(await analise_numpy.colunas_usuario_async(conexao, current_user.id), data_inicio, data_fim)
+    return await calcular_insights_async(conexao, filtros_periodo(current_user, data_inicio, data_fim))
+
+
+@em_cache_async("serie")
+async def serie_temporal_async(conexao, current_user, granularidade="mes", data_inicio=None, data_fim=None,
+                               categoria=None, por_categoria=False, max_pontos=None):
+    max_pontos = _max_pontos(max_pontos)
+    consulta = consulta_serie(
+        current_user, granularidade, data_inicio, data_fim, categoria, por_categoria, conexao.dialect.name
+    )
+    linhas = (await conexao.execute(consulta)).all()
+    return montar_serie(linhas, granularidade, data_inicio, data_fim, por_categoria, max_pontos)
+
+
+def _consulta_com_indice(current_user, filtros, limit, cursor):
+    # o índice de busca em memória é montado com a sessão síncrona; roda numa thread e a devolve ao pool
+    try:
+        return consulta_linhas_transacoes(current_user, filtros, limit, cursor)
+    finally:
+        session.remove()
+
+
+async def linhas_transacoes_async(conexao, current_user, filtros={}, limit=None, cursor=None):
+    if filtros.get("busca") and backend_busca() == "memoria":
+        consulta, limit = await asyncio.to_thread(_consulta_com_indice, current_user, filtros, limit, cursor)
+    else:
+        consulta, limit = consulta_linhas_transacoes(current_user, filtros, limit, cursor)
+    return pagina_linhas((await conexao.execute(consulta)).all(), limit)
@@ -0,0 +1,240 @@
+import os
+from sqlalchemy import select, func, extract
+from models import session, Transacao
+
+INSIGHTS_MODO = os.environ.get("INSIGHTS_MODO", "auto")
+DIALETOS_COM_CTE = {"sqlite", "postgresql", "mysql", "mariadb", "mssql", "oracle"}
+
+METRICAS = {}
+
+
+def registrar_metrica(metrica):
+    """Registra uma métrica de insights; todas são calculadas na mesma passada"""
+    METRICAS[metrica.nome] = metrica()
+    return metrica
+
+
+class Metrica:
+    """Uma métrica de insights.
+
+    Implementa `colunas_sql`/`resultado_sql` para rodar dentro da consulta única
+    com CTE, e `inicial`/`acumular`/`resultado` para o redutor em Python.
+    Métricas sem versão SQL forçam o modo Python.
+    """
+    nome = None
+
+    def colunas_sql(self, base):
+        return None
+
+    def resultado_sql(self, linha):
+        raise NotImplementedError
+
+    def inicial(self):
+        raise NotImplementedError
+
+    def acumular(self, estado, transacao):
+        raise NotImplementedError
+
+    def resultado(self, estado):
+        raise NotImplementedError
+
+
+@registrar_metrica
+class MaiorCategoria(Metrica):
+    nome = "maior_categoria"
+
+    def colunas_sql(self, base):
+        soma = func.sum(base.c.valor)
+        consulta = select(base.c.categoria, soma).group_by(base.c.categoria).order_by(soma.desc(), base.c.categoria).limit(1)
+        return [
+            consulta.with_only_columns(base.c.categoria).scalar_subquery().label("maior_categoria"),
+            consulta.with_only_columns(soma).scalar_subquery().label("maior_categoria_valor"),
+        ]
+
+    def resultado_sql(self, linha):
+        return {
+            "maior_categoria": linha.maior_categoria,
+            "maior_categoria_valor": float(linha.maior_categoria_valor) if linha.maior_categoria_valor is not None else 0,
+        }
+
+    def inicial(self):
+        return {}
+
+    def acumular(self, estado, transacao):
+        estado[transacao.categoria] = estado.get(transacao.categoria, 0) + transacao.valor
+        return estado
+
+    def resultado(self, estado):
+        if not estado:
+            return {"maior_categoria": None, "maior_categoria_valor": 0}
+        categoria, valor = min(estado.items(), key=lambda item: (-item[1], item[0] or ""))
+        return {"maior_categoria": categoria, "maior_categoria_valor": float(valor)}
+
+
+@registrar_metrica
+class Media(Metrica):
+    nome = "media_semanal"
+
+    def colunas_sql(self, base):
+        return [select(func.avg(base.c.valor)).scalar_subquery().label("media_semanal")]
+
+    def resultado_sql(self, linha):
+        return {"media_semanal": float(linha.media_semanal) if linha.media_semanal else 0}
+
+    def inicial(self):
+        return [0.0, 0]
+
+    def acumular(self, estado, transacao):
+        estado[0] += transacao.valor
+        estado[1] += 1
+        return estado
+
+    def resultado(self, estado):
+        soma, quantidade = estado
+        return {"media_semanal": soma / quantidade if quantidade else 0}
+
+
+class _GastoExtremo(Metrica):
+    maior = True
+
+    def colunas_sql(self, base):
+        ordem = base.c.valor.desc() if self.maior else base.c.valor.asc()
+        consulta = select(base.c.descricao, base.c.valor).order_by(ordem, base.c.id).limit(1)
+        return [
+            consulta.with_only_columns(base.c.descricao).scalar_subquery().label(f"{self.nome}_descricao"),
+            consulta.with_only_columns(base.c.valor).scalar_subquery().label(f"{self.nome}_valor"),
+        ]
+
+    def resultado_sql(self, linha):
+        valor = getattr(linha, f"{self.nome}_valor")
+        if valor is None:
+            return {self.nome: None}
+        return {self.nome: {"descricao": getattr(linha, f"{self.nome}_descricao"), "valor": float(valor)}}
+
+    def inicial(self):
+        return None
+
+    def acumular(self, estado, transacao):
+        if estado is None:
+            return transacao
+        if self.maior:
+            melhor = transacao.valor > estado.valor or (transacao.valor == estado.valor and transacao.id < estado.id)
+        else:
+            melhor = transacao.valor < estado.valor or (transacao.valor == estado.valor and transacao.id < estado.id)
+        return transacao if melhor else estado
+
+    def resultado(self, estado):
+        if estado is None:
+            return {self.nome: None}
+        return {self.nome: {"descricao": estado.descricao, "valor": float(estado.valor)}}
+
+
+@registrar_metrica
+class MaiorGasto(_GastoExtremo):
+    nome = "maior_gasto"
+    maior = True
+
+
+@registrar_metrica
+class MenorGasto(_GastoExtremo):
+    nome = "menor_gasto"
+    maior = False
+
+
+@registrar_metrica
+class DiaMaiorGastoMedia(Metrica):
+    nome = "dia_maior_gasto_media"
+
+    def colunas_sql(self, base):
+        dia = extract('day', base.c.data)
+        media = func.avg(base.c.valor)
+        consulta = select(dia).group_by(dia).order_by(media.desc(), dia).limit(1)
+        return [consulta.scalar_subquery().label("dia_maior_gasto_media")]
+
+    def resultado_sql(self, linha):
+        dia = linha.dia_maior_gasto_media
+        return {"dia_maior_gasto_media": int(dia) if dia is not None else None}
+
+    def inicial(self):
+        return {}
+
+    def acumular(self, estado, transacao):
+        if transacao.data is not None:
+            soma, quantidade = estado.get(transacao.data.day, (0.0, 0))
+            estado[transacao.data.day] = (soma + transacao.valor, quantidade + 1)
+        return estado
+
+    def resultado(self, estado):
+        if not estado:
+            return {"dia_maior_gasto_media": None}
+        dia, _ = min(estado.items(), key=lambda item: (-item[1][0] / item[1][1], item[0]))
+        return {"dia_maior_gasto_media": dia}
+
+
+def _consulta_base(filtros):
+    return select(
+        Transacao.id, Transacao.data, Transacao.descricao, Transacao.valor, Transacao.categoria
+    ).where(Transacao.valor.isnot(None), *filtros)
+
+
+def _usar_sql(metricas, dialeto):
+    if INSIGHTS_MODO == "python":
+        return False
+    return (INSIGHTS_MODO == "sql" or dialeto in DIALETOS_COM_CTE) and all(
+        type(m).colunas_sql is not Metrica.colunas_sql for m in metricas
+    )
+
+
+def _consulta_sql(metricas, filtros):
+    base = _consulta_base(filtros).cte("base")
+    return select(*[coluna for m in metricas for coluna in m.colunas_sql(base)])
+
+
+def _resultado_sql(metricas, linha):
+    resultado = {}
+    for m in metricas:
+        resultado.update(m.resultado_sql(linha))
+    return resultado
+
+
+def _reduzir(metricas, transacoes):
+    estados = [m.inicial() for m in metricas]
+    for transacao in transacoes:
+        for i, m in enumerate(metricas):
+            estados[i] = m.acumular(estados[i], transacao)
+    return estados
+
+
+def _resultado_python(metricas, estados):
+    resultado = {}
+    for m, estado in zip(metricas, estados):
+        resultado.update(m.resultado(estado))
+    return resultado
+
+
+def _metricas(nomes):
+    return [METRICAS[n] for n in nomes] if nomes else list(METRICAS.values())
+
+
+def calcular_insights(filtros, nomes=None):
+    metricas = _metricas(nomes)
+    if _usar_sql(metricas, session.get_bind().dialect.name):
+        return _resultado_sql(metricas, session.execute(_consulta_sql(metricas, filtros)).one())
+
+    consulta = _consulta_base(filtros).execution_options(yield_per=1000)
+    return _resultado_python(metricas, _reduzir(metricas, session.execute(consulta)))
+
+
+async def calcular_insights_async(conexao, filtros, nomes=None):
+    """Mesmo cálculo de `calcular_insights` sobre uma `AsyncConnection`"""
+    metricas = _metricas(nomes)
+    if _usar_sql(metricas, conexao.dialect.name):
+        linha = (await conexao.execute(_consulta_sql(metricas, filtros))).one()
+        return _resultado_sql(metricas, linha)
+
+    estados = [m.inicial() for m in metricas]
+    resultado = await conexao.stream(_consulta_base(filtros).execution_options(yield_per=1000))
+    async for transacao in resultado:
+        for i, m in enumerate(metricas):
+            estados[i] = m.acumular(estados[i], transacao)
+    return _resultado_python(metricas, estados)
@@ -0,0 +1,115 @@
+from calendar import monthrange
+from datetime import date
+from sqlalchemy import and_, case, delete, insert, literal, or_, update
+from models import session, ResumoMensal, Transacao, reconstruir_resumos
+from models.resumo_mensal import consulta_agregada
+
+
+CHAVE_RESUMO = ("user_id", "ano", "mes", "categoria")
+VALORES_RESUMO = ("soma", "quantidade", "minimo", "maximo")
+
+
+def _chave(data, categoria):
+    return (data.year, data.month, categoria or '')
+
+
+def _insert_com_conflito(dialeto):
+    if dialeto == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as insert_postgresql
+        return insert_postgresql
+    if dialeto == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as insert_sqlite
+        return insert_sqlite
+    return None
+
+
+def _incrementos(novos):
+    """SET que soma a um resumo existente os valores de `novos` (colunas de EXCLUDED ou literais)"""
+    tabela = ResumoMensal.__table__
+    return {
+        "soma": tabela.c.soma + novos["soma"],
+        "quantidade": tabela.c.quantidade + novos["quantidade"],
+        "minimo": case((or_(tabela.c.minimo.is_(None), novos["minimo"] < tabela.c.minimo), novos["minimo"]), else_=tabela.c.minimo),
+        "maximo": case((or_(tabela.c.maximo.is_(None), novos["maximo"] > tabela.c.maximo), novos["maximo"]), else_=tabela.c.maximo),
+    }
+
+
+def acumular_resumo(user_id, linhas):
+    deltas = {}
+    for linha in linhas:
+        valor, data = linha['valor'], linha['data']
+        if valor is None or data is None:
+            continue
+        chave = _chave(data, linha['categoria'])
+        delta = deltas.get(chave)
+        if delta is None:
+            deltas[chave] = [valor, 1, valor, valor]
+        else:
+            delta[0] += valor
+            delta[1] += 1
+            delta[2] = min(delta[2], valor)
+            delta[3] = max(delta[3], valor)
+
+    if not deltas:
+        return
+
+    linhas = [
+        {"user_id": user_id, "ano": ano, "mes": mes, "categoria": categoria,
+         "soma": soma, "quantidade": quantidade, "minimo": minimo, "maximo": maximo}
+        for (ano, mes, categoria), (soma, quantidade, minimo, maximo) in deltas.items()
+    ]
+    # incrementos no banco, sem ler e regravar as linhas: importações simultâneas do mesmo usuário não se perdem
+    inserir = _insert_com_conflito(session.get_bind().dialect.name)
+    if inserir is not None:
+        comando = inserir(ResumoMensal.__table__)
+        session.execute(comando.on_conflict_do_update(
+            index_elements=CHAVE_RESUMO, set_=_incrementos(comando.excluded)
+        ), linhas)
+        return
+
+    tabela = ResumoMensal.__table__
+    for linha in linhas:
+        resultado = session.execute(
+            update(tabela)
+            .where(*(tabela.c[coluna] == linha[coluna] for coluna in CHAVE_RESUMO))
+            .values(_incrementos({coluna: literal(valor) for coluna, valor in linha.items()}))
+        )
+        if resultado.rowcount == 0:
+            session.execute(insert(tabela).values(linha))
+
+
+def recalcular_resumo(user_id, meses):
+    meses = {(ano, mes) for ano, mes in meses if ano is not None}
+    if not meses:
+        return
+
+    tabela = ResumoMensal.__table__
+    periodos = [
+        and_(Transacao.data >= date(ano, mes, 1), Transacao.data <= date(ano, mes, monthrange(ano, mes)[1]))
+        for ano, mes in meses
+    ]
+    # os comandos abaixo são do Core: as alterações pendentes das transações precisam estar no banco
+    session.flush()
+    # recalculado no banco, na transação corrente, sem ler e regravar as linhas
+    session.execute(delete(tabela).where(
+        tabela.c.user_id == user_id, or_(*(and_(tabela.c.ano == ano, tabela.c.mes == mes) for ano, mes in meses))
+    ))
+    consulta = consulta_agregada(Transacao.user_id == user_id, or_(*periodos))
+    inserir = _insert_com_conflito(session.get_bind().dialect.name)
+    if inserir is None:
+        session.execute(insert(tabela).from_select(CHAVE_RESUMO + VALORES_RESUMO, consulta))
+        return
+    # linha criada por um upload simultâneo depois do DELETE: vale o agregado recalculado
+    comando = inserir(tabela).from_select(CHAVE_RESUMO + VALORES_RESUMO, consulta)
+    session.execute(comando.on_conflict_do_update(
+        index_elements=CHAVE_RESUMO, set_={coluna: comando.excluded[coluna] for coluna in VALORES_RESUMO}
+    ))
+
+
+def mes_da_transacao(transacao):
+    return (transacao.data.year, transacao.data.month) if transacao.data else (None, None)
+
+
+def reconstruir(user_id=None):
+    reconstruir_resumos(session.connection(), user_id)
+    session.commit()
@@ -0,0 +1,106 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturoTimeout
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# método e custo no formato do werkzeug: "scrypt", "scrypt:32768:8:1", "pbkdf2:sha256:600000"...
+SENHA_METODO = os.environ.get("SENHA_METODO", "scrypt")
+SENHA_WORKERS = int(os.environ.get("SENHA_WORKERS", os.cpu_count() or 2))
+SENHA_FILA_MAX = int(os.environ.get("SENHA_FILA_MAX", 2 * SENHA_WORKERS))
+SENHA_TIMEOUT = float(os.environ.get("SENHA_TIMEOUT", 10))
+
+
+class HashSobrecarregado(Exception):
+    """Pool de hashing cheio; a requisição deve ser recusada com 429"""
+
+
+class HashIndisponivel(Exception):
+    """O hash não terminou dentro do prazo; a requisição deve ser recusada com 503"""
+
+
+class PoolHash:
+    """Executor dedicado ao KDF de senhas, com limite de tarefas em execução e na fila.
+
+    scrypt e pbkdf2 do hashlib liberam o GIL, então as threads usam núcleos de
+    verdade sem ocupar os workers que servem o resto da API.
+    """
+
+    def __init__(self, workers=SENHA_WORKERS, fila_max=SENHA_FILA_MAX, timeout=SENHA_TIMEOUT):
+        self.workers = workers
+        self.timeout = timeout
+        self._vagas = threading.BoundedSemaphore(workers + fila_max)
+        self._executor = None
+        self._lock = threading.Lock()
+        self.executadas = 0
+        self.recusadas = 0
+        self.expiradas = 0
+
+    def _obter_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="hash-senha")
+            return self._executor
+
+    def executar(self, funcao, *args):
+        if not self._vagas.acquire(blocking=False):
+            with self._lock:
+                self.recusadas += 1
+            raise HashSobrecarregado()
+        try:
+            futuro = self._obter_executor().submit(funcao, *args)
+        except Exception:
+            self._vagas.release()
+            raise
+        futuro.add_done_callback(lambda _: self._vagas.release())
+        try:
+            resultado = futuro.result(timeout=self.timeout)
+        except FuturoTimeout:
+            with self._lock:
+                self.expiradas += 1
+            raise HashIndisponivel()
+        with self._lock:
+            self.executadas += 1
+        return resultado
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "executadas": self.executadas,
+                "recusadas": self.recusadas,
+                "expiradas": self.expiradas,
+            }
+
+
+pool_hash = PoolHash()
+_metodos_normalizados = {}
+
+
+def metodo_normalizado(metodo=None):
+    """Método com todos os parâmetros explícitos, como aparece no início do hash gerado"""
+    metodo = metodo or SENHA_METODO
+    if metodo not in _metodos_normalizados:
+        _metodos_normalizados[metodo] = generate_password_hash("", metodo).split("$", 1)[0]
+    return _metodos_normalizados[metodo]
+
+
+def precisa_rehash(password_hash, metodo=None):
+    return password_hash.split("$", 1)[0] != metodo_normalizado(metodo)
+
+
+def gerar_hash(senha, metodo=None):
+    metodo = metodo or SENHA_METODO
+    return pool_hash.executar(generate_password_hash, senha, metodo)
+
+
+def _verificar(password_hash, senha, metodo):
+    if not check_password_hash(password_hash, senha):
+        return False, None
+    if precisa_rehash(password_hash, metodo):
+        return True, generate_password_hash(senha, metodo)
+    return True, None
+
+
+def verificar_senha(password_hash, senha, metodo=None):
+    """Confere a senha no pool; retorna (ok, novo_hash), com novo_hash quando o método configurado mudou"""
+    return pool_hash.executar(_verificar, password_hash, senha, metodo or SENHA_METODO)
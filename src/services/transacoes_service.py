@@ -1,101 +1,313 @@
 import io
+import os
 import csv
+import base64
+import hashlib
+import threading
+from collections import Counter, OrderedDict
 from datetime import datetime
-import pandas as pd
-from sqlalchemy import and_, func
-from models import session, Transacao
-from utils.categorias import categorizar
+from sqlalchemy import String, and_, or_, cast, delete, func, insert, select, update
+from sqlalchemy.orm import Session
+from models import session, engine, Transacao
+from services.busca_service import filtro_busca, invalidar_busca
+from services.resumo_service import acumular_resumo, recalcular_resumo, mes_da_transacao
+from services.versao_service import registrar_alteracao
+from services.cache_service import invalidar_graficos
+from utils.categorias import categorizar_lote
+from utils.extracao_pdf import linhas_pdf
 from utils.faturas import gerar_transacoes_fake
-from utils.validators import padronizar_categoria, validar_transacao
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
+from utils.validators import padronizar_categoria, validar_texto, validar_transacao
+
+CSV_CHUNKSIZE = int(os.environ.get("CSV_CHUNKSIZE", 20000))
+INSERT_CHUNKSIZE = int(os.environ.get("INSERT_CHUNKSIZE", 1000))
+DEDUPLICAR_UPLOADS = os.environ.get("DEDUPLICAR_UPLOADS", "1") != "0"
+CACHE_PARSE_MAX_LINHAS = int(os.environ.get("CACHE_PARSE_MAX_LINHAS", 200000))
+LOTE_MAX_OPERACOES = int(os.environ.get("LOTE_MAX_OPERACOES", 1000))
+CATEGORIZADOR_APRENDIDO = os.environ.get("CATEGORIZADOR_APRENDIDO", "1") != "0"
+
+
+class CacheParse:
+    """LRU de arquivos já parseados, por hash do conteúdo, limitado pelo total de linhas"""
+
+    def __init__(self, max_linhas=CACHE_PARSE_MAX_LINHAS):
+        self.max_linhas = max_linhas
+        self.total_linhas = 0
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave):
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is not None:
+                self._itens.move_to_end(chave)
+                return item[0]
+            return None
+
+    def guardar(self, chave, lotes, linhas):
+        if linhas > self.max_linhas:
+            return
+        with self._lock:
+            if chave in self._itens:
+                self.total_linhas -= self._itens.pop(chave)[1]
+            self._itens[chave] = (lotes, linhas)
+            self.total_linhas += linhas
+            while self.total_linhas > self.max_linhas:
+                _, (_, removidas) = self._itens.popitem(last=False)
+                self.total_linhas -= removidas
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+            self.total_linhas = 0
+
+
+cache_parse = CacheParse()
+
+
+def hash_arquivo(file):
+    sha = hashlib.sha256()
+    while bloco := file.read(1 << 20):
+        sha.update(bloco.encode("utf-8") if isinstance(bloco, str) else bloco)
+    file.seek(0)
+    return sha.hexdigest()
+
+
+def _impressao(data, descricao, valor):
+    return (data, descricao, round(valor, 2) if valor is not None else None)
+
+
+class Deduplicador:
+    """Descarta linhas que já existem para o usuário, comparando (data, descricao, valor).
+
+    Carrega as impressões existentes por data, uma consulta por lote, e conta
+    repetições: se o banco tem duas compras iguais no mesmo dia e o arquivo três,
+    só a terceira é inserida.
+    """
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.datas_carregadas = set()
+        self.existentes = Counter()
+
+    def _carregar(self, datas):
+        novas = datas - self.datas_carregadas
+        if not novas:
+            return
+        linhas = session.execute(
+            select(Transacao.data, Transacao.descricao, Transacao.valor).where(
+                Transacao.user_id == self.user_id,
+                Transacao.data >= min(novas),
+                Transacao.data <= max(novas)
+            )
+        )
+        for data, descricao, valor in linhas:
+            if data in novas:
+                self.existentes[_impressao(data, descricao, valor)] += 1
+        self.datas_carregadas |= novas
+
+    def filtrar(self, linhas):
+        self._carregar({l["data"] for l in linhas})
+        novas = []
+        for linha in linhas:
+            impressao = _impressao(linha["data"], linha["descricao"], linha["valor"])
+            if self.existentes[impressao] > 0:
+                self.existentes[impressao] -= 1
+            else:
+                novas.append(linha)
+        return novas
 
-def processar_csv(current_user, file):
-    df = pd.read_csv(file)
-    required_columns = ['data', 'descricao', 'valor']
-    missing_cols = [col for col in required_columns if col not in df.columns]
-    if missing_cols:
-        raise ValueError(f"Colunas obrigatórias faltando: {', '.join(missing_cols)}")
 
-    erros = []
-    for i, row in df.iterrows():
-        try:
-            data = datetime.strptime(str(row['data']), '%Y-%m-%d')
-            descricao = str(row['descricao'])
-            valor = float(row['valor'])
-            categoria = None
-            if 'categoria' in row and pd.notna(row['categoria']):
-                categoria = padronizar_categoria(str(row['categoria']))
-            else:
-                categoria = padronizar_categoria(categorizar(descricao))
-
-            transacao = Transacao(
-                data=data,
-                descricao=descricao,
-                valor=valor,
-                categoria=categoria,
-                user_id=current_user.id
-            )
-            session.add(transacao)
-        except Exception as e:
-            erros.append(f"Linha {i+1}: {str(e)}")
+def _apos_alteracao(user_id):
+    """Descarta os dados derivados mantidos neste processo depois de um commit"""
+    invalidar_busca(user_id)
+    invalidar_graficos(user_id)
+
 
+def _novo_categorizador(user_id):
+    if not CATEGORIZADOR_APRENDIDO:
+        return None
+    from services.categorizador_service import Categorizador
+    return Categorizador(user_id)
+
+
+def _completar_categorias(categorizador, linhas):
+    """Treina o modelo do usuário com as linhas que têm categoria e categoriza as demais num lote"""
+    pendentes = [i for i, linha in enumerate(linhas) if not linha["categoria"]]
+    if categorizador and len(pendentes) < len(linhas):
+        conhecidas = [linha for linha in linhas if linha["categoria"]]
+        categorizador.treinar([l["descricao"] for l in conhecidas], [l["categoria"] for l in conhecidas])
+    if not pendentes:
+        return linhas
+
+    descricoes = [linhas[i]["descricao"] for i in pendentes]
+    categorias = categorizador.categorizar(descricoes) if categorizador else categorizar_lote(descricoes)
+    linhas = list(linhas)
+    for i, categoria in zip(pendentes, categorias):
+        linhas[i] = dict(linhas[i], categoria=categoria)
+    return linhas
+
+
+def _inserir_transacoes(current_user, linhas, chunksize=INSERT_CHUNKSIZE):
+    linhas = [dict(linha, user_id=current_user.id) for linha in linhas]
+    for inicio in range(0, len(linhas), chunksize):
+        session.execute(insert(Transacao.__table__), linhas[inicio:inicio + chunksize])
+    acumular_resumo(current_user.id, linhas)
+
+
+def _erro_linha_csv(data, valor):
+    try:
+        datetime.strptime(str(data), '%Y-%m-%d')
+        float(valor)
+    except Exception as e:
+        return str(e)
+    return "Linha inválida"
+
+
+def _converter_chunk_csv(df):
+    import pandas as pd
+    datas = pd.to_datetime(df['data'], format='%Y-%m-%d', errors='coerce')
+    valores = pd.to_numeric(df['valor'], errors='coerce')
+    invalidas = datas.isna() | (valores.isna() & df['valor'].notna())
+
+    erros = [
+        f"Linha {i+1}: {_erro_linha_csv(df.at[i, 'data'], df.at[i, 'valor'])}"
+        for i in df.index[invalidas]
+    ]
     if erros:
-        raise ValueError(erros)
+        return [], erros
+
+    descricoes = df['descricao'].astype(str)
+    # sem categoria fica None: a categorização depende do usuário e é feita na importação
+    categorias = [None] * len(df)
+    if 'categoria' in df.columns:
+        presentes = df['categoria'].notna()
+        textos = df['categoria'].astype(str)
+        padronizadas = {c: padronizar_categoria(c) for c in textos[presentes].unique()}
+        categorias = [padronizadas[c] if p else None for c, p in zip(textos, presentes)]
+
+    valores = valores.astype(object).where(valores.notna(), None)
+    linhas = [
+        {"data": data, "descricao": descricao, "valor": valor, "categoria": categoria}
+        for data, descricao, valor, categoria in zip(
+            datas.dt.date, descricoes, valores, categorias
+        )
+    ]
+    return linhas, []
 
-    session.commit()
-    return {"message": "CSV processado com sucesso!"}
-
-
-def processar_pdf(current_user, file):
-    import pdfplumber
-    transacoes = []
-
-    with pdfplumber.open(file) as pdf:
-        for page in pdf.pages:
-            text = page.extract_text()
-            if not text:
-                continue
-            for linha in text.split("\n"):
-                if "Fatura de Cartão" in linha or linha.strip() == "":
-                    continue
-                parts = [p.strip() for p in linha.split("|")]
-                if len(parts) < 3:
-                    continue
-                data, descricao, valor_str = parts[0], parts[1], parts[2].strip() if parts[2].strip() != '-' else "0.0"
-                categoria = parts[3] if len(parts) > 3 and parts[3] != '-' else None
-                transacoes.append({"data": data, "descricao": descricao, "valor": valor_str, "categoria": categoria})
 
-    erros = []
-    transacoes_validas = []
+def _lotes_csv(file, chunksize=CSV_CHUNKSIZE):
+    import pandas as pd
+    for i, df in enumerate(pd.read_csv(file, dtype=str, chunksize=chunksize)):
+        if i == 0:
+            required_columns = ['data', 'descricao', 'valor']
+            missing_cols = [col for col in required_columns if col not in df.columns]
+            if missing_cols:
+                raise ValueError(f"Colunas obrigatórias faltando: {', '.join(missing_cols)}")
+
+        linhas, erros = _converter_chunk_csv(df)
+        yield linhas, erros, len(df)
 
-    for i, t in enumerate(transacoes):
+
+def _lotes_pdf(file, backend=None, workers=None):
+    lote = []
+    erros = []
+    lidas = 0
+    for i, t in enumerate(linhas_pdf(file, backend, workers)):
+        lidas = i + 1
         try:
             data, descricao, valor, categoria = validar_transacao(t['data'], t['descricao'], t['valor'], t.get('categoria'))
-            transacoes_validas.append({"data": data, "descricao": descricao, "valor": valor, "categoria": categoria})
         except Exception as e:
             erros.append(f"Linha {i+1}: {str(e)}")
+            continue
+        if not t.get('categoria'):
+            categoria = None
+        lote.append({"data": data.date(), "descricao": descricao, "valor": valor, "categoria": categoria})
+        if len(lote) + len(erros) >= INSERT_CHUNKSIZE:
+            yield ([] if erros else lote), erros, len(lote) + len(erros)
+            lote, erros = [], []
+    if lote or erros or not lidas:
+        yield ([] if erros else lote), erros, len(lote) + len(erros)
+
+
+def _importar(current_user, tipo, file, lotes, progresso=None, deduplicar=None):
+    """Grava os lotes (linhas, erros, lidas) de um arquivo numa transação única.
+
+    Arquivos com o mesmo conteúdo reaproveitam o parse anterior, e linhas que já
+    existem para o usuário são ignoradas quando `deduplicar` está ligado. As
+    linhas novas com categoria treinam o modelo do usuário, que categoriza as
+    demais.
+    """
+    deduplicar = DEDUPLICAR_UPLOADS if deduplicar is None else deduplicar
+    chave = (tipo, hash_arquivo(file))
+    em_cache = cache_parse.obter(chave)
+    para_cache = [] if em_cache is None else None
+    deduplicador = Deduplicador(current_user.id) if deduplicar else None
+    categorizador = _novo_categorizador(current_user.id)
+
+    erros = []
+    lidas = inseridas = ignoradas = 0
+    try:
+        for linhas, erros_lote, lidas_lote in (em_cache if em_cache is not None else lotes(file)):
+            erros.extend(erros_lote)
+            lidas += lidas_lote
+            if para_cache is not None:
+                if lidas > cache_parse.max_linhas:
+                    # o arquivo não caberia no cache: não segura os lotes até o fim da importação
+                    para_cache = None
+                else:
+                    para_cache.append((linhas, erros_lote, lidas_lote))
+            if not erros and linhas:
+                novas = deduplicador.filtrar(linhas) if deduplicador else linhas
+                _inserir_transacoes(current_user, _completar_categorias(categorizador, novas))
+                inseridas += len(novas)
+                ignoradas += len(linhas) - len(novas)
+            if progresso:
+                progresso(lidas)
+    except Exception:
+        session.rollback()
+        raise
+
+    if para_cache is not None:
+        cache_parse.guardar(chave, para_cache, lidas)
 
     if erros:
+        session.rollback()
         raise ValueError(erros)
 
-    for transacao_data in transacoes_validas:
-        transacao = Transacao(
-            data=transacao_data['data'],
-            descricao=transacao_data['descricao'],
-            valor=transacao_data['valor'],
-            categoria=transacao_data['categoria'],
-            user_id=current_user.id
-        )
-        session.add(transacao)
-
+    if inseridas:
+        registrar_alteracao(current_user.id)
+        if categorizador:
+            categorizador.salvar()
     session.commit()
-    return {"message": "PDF processado com sucesso!", "transacoes_processadas": len(transacoes_validas)}
+    _apos_alteracao(current_user.id)
+    if categorizador:
+        categorizador.publicar()
+    return {
+        "transacoes_processadas": inseridas + ignoradas,
+        "inseridas": inseridas,
+        "ignoradas": ignoradas,
+    }
 
 
-def listar_transacoes(current_user, filtros={}):
-    query = session.query(Transacao).filter_by(user_id=current_user.id)
-    filtro_list = []
+def processar_csv(current_user, file, chunksize=CSV_CHUNKSIZE, progresso=None, deduplicar=None):
+    resultado = _importar(
+        current_user, "csv", file, lambda f: _lotes_csv(f, chunksize), progresso, deduplicar
+    )
+    return {"message": "CSV processado com sucesso!", **resultado}
+
+
+def processar_pdf(current_user, file, backend=None, workers=None, progresso=None, deduplicar=None):
+    resultado = _importar(
+        current_user, "pdf", file, lambda f: _lotes_pdf(f, backend, workers), progresso, deduplicar
+    )
+    return {"message": "PDF processado com sucesso!", **resultado}
+
+
+LIMITE_PAGINA_MAXIMO = int(os.environ.get("LIMITE_PAGINA_MAXIMO", 500))
+
+
+def filtros_transacoes(current_user, filtros={}):
+    filtro_list = [Transacao.user_id == current_user.id]
 
     if categoria := filtros.get("categoria"):
         categorias = [c.strip().lower() for c in categoria.split(",") if c.strip()]
@@ -103,11 +315,11 @@ def listar_transacoes(current_user, filtros={}):
             filtro_list.append(func.lower(Transacao.categoria).in_(categorias))
 
     if data_inicio := filtros.get("data_inicio"):
-        dt_inicio = datetime.strptime(data_inicio, '%Y-%m-%d')
+        dt_inicio = datetime.strptime(data_inicio, '%Y-%m-%d').date()
         filtro_list.append(Transacao.data >= dt_inicio)
 
     if data_fim := filtros.get("data_fim"):
-        dt_fim = datetime.strptime(data_fim, '%Y-%m-%d')
+        dt_fim = datetime.strptime(data_fim, '%Y-%m-%d').date()
         filtro_list.append(Transacao.data <= dt_fim)
 
     if valor_min := filtros.get("valor_min"):
@@ -117,12 +329,128 @@ def listar_transacoes(current_user, filtros={}):
         filtro_list.append(Transacao.valor <= float(valor_max))
 
     if busca := filtros.get("busca"):
-        filtro_list.append(Transacao.descricao.ilike(f"%{busca}%"))
+        filtro_list.append(filtro_busca(current_user.id, busca))
+
+    return filtro_list
+
+
+def listar_transacoes(current_user, filtros={}):
+    return session.query(Transacao).filter(and_(*filtros_transacoes(current_user, filtros))).all()
+
+
+def codificar_cursor(transacao):
+    return _codificar_chave(transacao.data.strftime('%Y-%m-%d'), transacao.id)
+
+
+def _codificar_chave(data, id_):
+    return base64.urlsafe_b64encode(f"{data}|{id_}".encode()).decode()
+
+
+def decodificar_cursor(cursor):
+    try:
+        data, id_ = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.strptime(data, '%Y-%m-%d').date(), int(id_)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Cursor inválido")
+
+
+def _filtro_cursor(cursor):
+    data, id_ = decodificar_cursor(cursor)
+    return or_(Transacao.data < data, and_(Transacao.data == data, Transacao.id < id_))
+
+
+def paginar_transacoes(current_user, filtros={}, limit=50, cursor=None):
+    """Página de transações em ordem (data, id) decrescente, por keyset.
+
+    Retorna as transações e o cursor da próxima página (None na última).
+    """
+    limit = max(1, min(int(limit), LIMITE_PAGINA_MAXIMO))
+    filtro_list = filtros_transacoes(current_user, filtros)
+    if cursor:
+        filtro_list.append(_filtro_cursor(cursor))
+
+    transacoes = (
+        session.query(Transacao)
+        .filter(and_(*filtro_list))
+        .order_by(Transacao.data.desc(), Transacao.id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+    proximo_cursor = codificar_cursor(transacoes[limit - 1]) if len(transacoes) > limit else None
+    return transacoes[:limit], proximo_cursor
+
+
+def iterar_transacoes(current_user, filtros={}, yield_per=1000):
+    """Iterador que carrega as transações em lotes de `yield_per`.
+
+    Os filtros são validados já na chamada; a consulta só roda ao iterar.
+    """
+    consulta = (
+        select(Transacao)
+        .where(*filtros_transacoes(current_user, filtros))
+        .order_by(Transacao.data.desc(), Transacao.id.desc())
+        .execution_options(yield_per=yield_per)
+    )
+    return _em_sessao_propria(consulta)
+
 
-    if filtro_list:
-        query = query.filter(and_(*filtro_list))
+def _em_sessao_propria(consulta):
+    # sessão própria: a da requisição já foi removida quando o corpo do stream é gerado,
+    # e fechar o gerador (fim da resposta ou cliente desconectado) devolve a conexão ao pool
+    with Session(engine) as sessao:
+        yield from sessao.scalars(consulta)
 
-    return query.all()
+
+COLUNAS_LISTAGEM = ("id", "data", "descricao", "valor", "categoria")
+
+
+def consulta_linhas_transacoes(current_user, filtros={}, limit=None, cursor=None):
+    """Consulta de `linhas_transacoes` e o limite já normalizado (None sem paginação)"""
+    filtro_list = filtros_transacoes(current_user, filtros)
+    if cursor:
+        filtro_list.append(_filtro_cursor(cursor))
+    consulta = select(
+        Transacao.id,
+        cast(Transacao.data, String).label("data"),
+        Transacao.descricao,
+        Transacao.valor,
+        Transacao.categoria,
+    ).where(*filtro_list)
+
+    if limit is None:
+        return consulta, None
+
+    limit = max(1, min(int(limit), LIMITE_PAGINA_MAXIMO))
+    return consulta.order_by(Transacao.data.desc(), Transacao.id.desc()).limit(limit + 1), limit
+
+
+def pagina_linhas(linhas, limit):
+    """Corta a linha extra pedida pela consulta paginada e monta o cursor da próxima página"""
+    if limit is None:
+        return linhas, None
+    proximo_cursor = None
+    if len(linhas) > limit:
+        ultima = linhas[limit - 1]
+        proximo_cursor = _codificar_chave(ultima.data, ultima.id)
+    return linhas[:limit], proximo_cursor
+
+
+def linhas_transacoes(current_user, filtros={}, limit=None, cursor=None):
+    """Transações como tuplas do Core, sem hidratar objetos do ORM.
+
+    A data já vem do banco como texto ISO, o mesmo formato da resposta, então
+    não há conversão por linha. Com `limit`, pagina por keyset como
+    `paginar_transacoes` e retorna também o cursor da próxima página.
+    """
+    consulta, limit = consulta_linhas_transacoes(current_user, filtros, limit, cursor)
+    return pagina_linhas(session.execute(consulta).all(), limit)
+
+
+def em_colunas(linhas):
+    """Transpõe as linhas para {"id": [...], "data": [...], ...}"""
+    if not linhas:
+        return {nome: [] for nome in COLUNAS_LISTAGEM}
+    return {nome: list(coluna) for nome, coluna in zip(COLUNAS_LISTAGEM, zip(*linhas))}
 
 
 def listar_categorias(current_user):
@@ -132,24 +460,51 @@ def listar_categorias(current_user):
 
 def criar_transacao(current_user, data):
     data_val, descricao, valor, categoria = validar_transacao(data['data'], data['descricao'], data['valor'], data.get('categoria'))
-    categoria = padronizar_categoria(categoria)
+    categorizador = _novo_categorizador(current_user.id)
+    [linha] = _completar_categorias(categorizador, [
+        {"descricao": descricao, "categoria": padronizar_categoria(categoria) if data.get('categoria') else None}
+    ])
+    categoria = linha["categoria"]
     nova_transacao = Transacao(data=data_val, descricao=descricao, valor=valor, categoria=categoria, user_id=current_user.id)
     session.add(nova_transacao)
+    acumular_resumo(current_user.id, [{"data": data_val, "valor": valor, "categoria": categoria}])
+    registrar_alteracao(current_user.id)
+    if categorizador:
+        categorizador.salvar()
     session.commit()
+    _apos_alteracao(current_user.id)
+    if categorizador:
+        categorizador.publicar()
     return nova_transacao
 
 
 def editar_transacao(current_user, transacao_id, data):
+    validar_texto(data.get('categoria'), "Categoria")
     transacao = session.query(Transacao).filter_by(id=transacao_id, user_id=current_user.id).first()
     if not transacao:
         return None
+    mes_anterior = mes_da_transacao(transacao)
+    categoria_anterior = padronizar_categoria(transacao.categoria or "")
     if 'data' in data:
-        transacao.data = datetime.strptime(data['data'], '%Y-%m-%d')
+        transacao.data = datetime.strptime(data['data'], '%Y-%m-%d').date()
     if 'valor' in data:
         transacao.valor = float(data['valor'])
     transacao.descricao = data.get('descricao', transacao.descricao)
     transacao.categoria = data.get('categoria', transacao.categoria)
+    # uma categoria trocada pelo usuário é uma correção: ensina o modelo dele
+    categorizador = None
+    if transacao.categoria and padronizar_categoria(transacao.categoria) != categoria_anterior:
+        categorizador = _novo_categorizador(current_user.id)
+        if categorizador:
+            categorizador.treinar([transacao.descricao], [transacao.categoria])
+    recalcular_resumo(current_user.id, {mes_anterior, mes_da_transacao(transacao)})
+    registrar_alteracao(current_user.id)
+    if categorizador:
+        categorizador.salvar()
     session.commit()
+    _apos_alteracao(current_user.id)
+    if categorizador:
+        categorizador.publicar()
     return transacao
 
 
@@ -158,12 +513,159 @@ def deletar_transacao(current_user, transacao_id):
     if not transacao:
         return None
     session.delete(transacao)
+    recalcular_resumo(current_user.id, {mes_da_transacao(transacao)})
+    registrar_alteracao(current_user.id)
     session.commit()
+    _apos_alteracao(current_user.id)
     return transacao
 
 
-def gerar_fatura_pdf(qtd_itens=10):
-    transacoes = gerar_transacoes_fake(qtd=qtd_itens)
+def _em_blocos(ids, tamanho=INSERT_CHUNKSIZE):
+    ids = list(ids)
+    for inicio in range(0, len(ids), tamanho):
+        yield ids[inicio:inicio + tamanho]
+
+
+def _campos_edicao(item):
+    """Campos de uma edição do lote, convertidos como em `editar_transacao`"""
+    campos = {}
+    if 'data' in item:
+        campos['data'] = datetime.strptime(item['data'], '%Y-%m-%d').date()
+    if 'valor' in item:
+        campos['valor'] = float(item['valor'])
+    for campo, nome in (('descricao', "Descrição"), ('categoria', "Categoria")):
+        if campo in item:
+            valor = validar_texto(item[campo], nome)
+            campos[campo] = valor.strip() if valor is not None else None
+    return campos
+
+
+def _mes(data):
+    return (data.year, data.month) if data else (None, None)
+
+
+def aplicar_lote(current_user, operacoes, atomico=False):
+    """Aplica criações, edições e exclusões numa única transação.
+
+    Cada item de `operacoes` tem `op` ("criar", "editar" ou "deletar"); edições e
+    exclusões levam `id`. As operações valem na ordem do lote, mas são gravadas
+    em conjunto: um UPDATE ... WHERE id IN (...) por valor de campo, um DELETE e
+    um INSERT. Itens inválidos ou de transações de outro usuário falham sozinhos,
+    a menos que `atomico` seja verdadeiro, caso em que nada é gravado.
+    """
+    if not isinstance(operacoes, list) or not operacoes:
+        raise ValueError("Informe a lista de operações")
+    if len(operacoes) > LOTE_MAX_OPERACOES:
+        raise ValueError(f"Máximo de {LOTE_MAX_OPERACOES} operações por lote")
+
+    resultados = [None] * len(operacoes)
+    novas = []
+    alteracoes = []
+    for i, item in enumerate(operacoes):
+        op = item.get('op') if isinstance(item, dict) else None
+        try:
+            if op == 'criar':
+                data_val, descricao, valor, categoria = validar_transacao(
+                    item['data'], item['descricao'], item['valor'], item.get('categoria')
+                )
+                novas.append((i, {
+                    "data": data_val.date(), "descricao": descricao, "valor": valor, "user_id": current_user.id,
+                    "categoria": padronizar_categoria(categoria) if item.get('categoria') else None
+                }))
+            elif op in ('editar', 'deletar'):
+                alteracoes.append((i, op, int(item['id']), _campos_edicao(item) if op == 'editar' else None))
+            else:
+                resultados[i] = {"indice": i, "op": op, "status": 400, "error": "Operação inválida"}
+        except KeyError as e:
+            resultados[i] = {"indice": i, "op": op, "status": 400, "error": f"Campo obrigatório: {e.args[0]}"}
+        except Exception as e:
+            resultados[i] = {"indice": i, "op": op, "status": 400, "error": str(e)}
+
+    # estado simulado das transações referenciadas, para aplicar as operações em ordem
+    datas, atuais = {}, {}
+    for bloco in _em_blocos({id_ for _, _, id_, _ in alteracoes}):
+        for id_, data, descricao, categoria in session.execute(
+            select(Transacao.id, Transacao.data, Transacao.descricao, Transacao.categoria)
+            .where(Transacao.user_id == current_user.id, Transacao.id.in_(bloco))
+        ):
+            datas[id_] = data
+            atuais[id_] = (descricao, categoria)
+
+    edicoes, exclusoes, meses = {}, [], set()
+    for i, op, id_, campos in alteracoes:
+        if id_ not in datas:
+            resultados[i] = {"indice": i, "op": op, "status": 404, "id": id_, "error": "Transação não encontrada"}
+            continue
+        meses.add(_mes(datas[id_]))
+        if op == 'deletar':
+            del datas[id_]
+            edicoes.pop(id_, None)
+            exclusoes.append(id_)
+        else:
+            edicoes.setdefault(id_, {}).update(campos)
+            if 'data' in campos:
+                datas[id_] = campos['data']
+                meses.add(_mes(campos['data']))
+        resultados[i] = {"indice": i, "op": op, "status": 200, "id": id_}
+
+    for i, _ in novas:
+        resultados[i] = {"indice": i, "op": "criar", "status": 201}
+    falhas = sum(1 for r in resultados if r["status"] >= 400)
+    if atomico and falhas:
+        for i, r in enumerate(resultados):
+            if r["status"] < 400:
+                resultados[i] = dict(r, status=409, error="Lote não aplicado")
+        return {"resultados": resultados, "aplicadas": 0, "falhas": falhas}
+
+    # categorias trocadas pelo usuário ensinam o modelo dele, antes de categorizar as criações sem categoria
+    categorizador = _novo_categorizador(current_user.id)
+    corrigidas = [
+        (campos.get('descricao', atuais[id_][0]), campos['categoria'])
+        for id_, campos in edicoes.items()
+        if campos.get('categoria') and padronizar_categoria(campos['categoria']) != padronizar_categoria(atuais[id_][1] or "")
+    ]
+    if categorizador and corrigidas:
+        categorizador.treinar([d for d, _ in corrigidas], [c for _, c in corrigidas])
+
+    tabela = Transacao.__table__
+    da_conta = tabela.c.user_id == current_user.id
+    por_mudanca = {}
+    for id_, campos in edicoes.items():
+        for campo, valor in campos.items():
+            por_mudanca.setdefault((campo, valor), []).append(id_)
+    for (campo, valor), ids in por_mudanca.items():
+        for bloco in _em_blocos(ids):
+            session.execute(update(tabela).where(da_conta, tabela.c.id.in_(bloco)).values({campo: valor}))
+    for bloco in _em_blocos(exclusoes):
+        session.execute(delete(tabela).where(da_conta, tabela.c.id.in_(bloco)))
+
+    if novas:
+        linhas = _completar_categorias(categorizador, [linha for _, linha in novas])
+        ids = session.execute(
+            insert(tabela).returning(tabela.c.id, sort_by_parameter_order=True), linhas
+        ).scalars().all()
+        for (i, _), id_ in zip(novas, ids):
+            resultados[i]["id"] = id_
+        # meses que serão recalculados já incluem as linhas novas
+        acumular_resumo(current_user.id, [l for l in linhas if _mes(l["data"]) not in meses])
+    recalcular_resumo(current_user.id, meses)
+
+    aplicadas = len(resultados) - falhas
+    if aplicadas:
+        registrar_alteracao(current_user.id)
+        if categorizador:
+            categorizador.salvar()
+        session.commit()
+        _apos_alteracao(current_user.id)
+        if categorizador:
+            categorizador.publicar()
+    return {"resultados": resultados, "aplicadas": aplicadas, "falhas": falhas}
+
+
+def gerar_fatura_pdf(qtd_itens=10, seed=None):
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+    transacoes = gerar_transacoes_fake(qtd=qtd_itens, seed=seed)
     buffer = io.BytesIO()
     p = canvas.Canvas(buffer, pagesize=letter)
     width, height = letter
@@ -187,11 +689,13 @@ def gerar_fatura_pdf(qtd_itens=10):
     return buffer
 
 
-def gerar_fatura_csv(qtd_itens=10):
-    transacoes = gerar_transacoes_fake(qtd=qtd_itens)
-    buffer = io.StringIO()
-    writer = csv.DictWriter(buffer, fieldnames=["data", "descricao", "valor", "categoria"])
+def gerar_fatura_csv(qtd_itens=10, seed=None):
+    transacoes = gerar_transacoes_fake(qtd=qtd_itens, seed=seed)
+    buffer = io.BytesIO()
+    texto = io.TextIOWrapper(buffer, encoding="utf-8", newline="")
+    writer = csv.DictWriter(texto, fieldnames=["data", "descricao", "valor", "categoria"])
     writer.writeheader()
     writer.writerows(transacoes)
+    texto.detach()
     buffer.seek(0)
-    return io.BytesIO(buffer.getvalue().encode("utf-8"))
+    return buffer
@@ -0,0 +1,24 @@
+from sqlalchemy import select, update, insert
+from models import session, VersaoDados
+
+
+def _consulta_versao(user_id):
+    return select(VersaoDados.versao).where(VersaoDados.user_id == user_id)
+
+
+def versao_dados(user_id):
+    """Versão atual dos dados do usuário; muda a cada escrita em suas transações"""
+    return session.execute(_consulta_versao(user_id)).scalar() or 0
+
+
+async def versao_dados_async(conexao, user_id):
+    return (await conexao.execute(_consulta_versao(user_id))).scalar() or 0
+
+
+def registrar_alteracao(user_id):
+    """Incrementa a versão dos dados do usuário na transação corrente, antes do commit"""
+    resultado = session.execute(
+        update(VersaoDados).where(VersaoDados.user_id == user_id).values(versao=VersaoDados.versao + 1)
+    )
+    if resultado.rowcount == 0:
+        session.execute(insert(VersaoDados).values(user_id=user_id, versao=1))
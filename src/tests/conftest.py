@@ -0,0 +1,60 @@
+import sys
+import os
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+_db_dir = tempfile.mkdtemp(prefix="invoice-analyzer-tests-")
+os.environ["DATABASE_URL"] = os.environ.get(
+    "TEST_DATABASE_URL", f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+)
+os.environ.setdefault("SECRET_KEY", "chave-de-teste")
+os.environ.setdefault("STATUS_TOKEN", "token-de-status")
+
+import uuid
+import pytest
+
+
+@pytest.fixture(scope="session", autouse=True)
+def schema():
+    from models import engine, migrar
+    migrar(engine)
+
+
+@pytest.fixture(scope="session")
+def app():
+    from app import create_app
+    app = create_app()
+    app.config['TESTING'] = True
+    return app
+
+
+@pytest.fixture
+def usuario():
+    """Cria um usuário novo, isolando os dados de cada teste"""
+    from models import session, Usuario
+    from utils.decorator import Principal
+    user = Usuario(username=f"teste-{uuid.uuid4().hex[:8]}")
+    user.set_password("123456")
+    session.add(user)
+    session.commit()
+    return Principal(user.id, user.username)
+
+
+@pytest.fixture
+def client(app):
+    """Cria um client de teste com a aplicação completa"""
+    with app.test_client() as client:
+        yield client
+
+
+@pytest.fixture
+def auth_headers(usuario):
+    from services.auth_service import login
+    resposta, _ = login({"username": usuario.username, "password": "123456"})
+    return {"Authorization": f"Bearer {resposta['token']}"}
+
+
+@pytest.fixture
+def status_headers():
+    return {"Authorization": f"Bearer {os.environ['STATUS_TOKEN']}"}
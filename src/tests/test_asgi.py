@@ -0,0 +1,100 @@
+import io
+import json
+import asyncio
+import pytest
+from asgi import create_asgi_app
+from benchmarks.concorrencia import chamar_asgi
+from models import descartar_engine_async
+from services import motor_insights
+from services.cache_service import cache_graficos
+from services.transacoes_service import processar_csv
+
+
+@pytest.fixture
+def asgi(app):
+    return create_asgi_app(app)
+
+
+@pytest.fixture
+def dados(usuario, auth_headers):
+    processar_csv(usuario, io.StringIO(
+        "data,descricao,valor,categoria\n"
+        "2024-01-05,Netflix,39.90,\n"
+        "2024-01-20,ifood,52.10,\n"
+        "2024-02-03,Uber,18.00,\n"
+        "2024-02-28,Padaria,7.50,\n"
+        "2024-03-15,Posto Shell,250.00,Carro\n"
+    ))
+    return auth_headers
+
+
+def requisitar(asgi, *pedidos):
+    async def executar():
+        try:
+            return [await chamar_asgi(asgi, caminho, headers) for caminho, headers in pedidos]
+        finally:
+            await descartar_engine_async()
+    return asyncio.run(executar())
+
+
+@pytest.mark.parametrize("caminho", [
+    "/charts/categoria",
+    "/charts/categoria?categoria=Streaming&data_inicio=2024-01-01",
+    "/charts/geral?data_inicio=2024-01-01&data_fim=2024-02-29",
+    "/charts/insights",
+    "/charts/serie?granularidade=semana&por_categoria=1&max_pontos=3",
+    "/transacoes",
+    "/transacoes?limit=2&formato=colunas",
+    "/transacoes?busca=netf",
+])
+def test_leituras_iguais_a_aplicacao_flask(asgi, client, dados, caminho):
+    esperado = client.get(caminho, headers=dados)
+    [(status, headers, corpo)] = requisitar(asgi, (caminho, dados))
+
+    assert status == 200
+    assert json.loads(corpo) == esperado.get_json()
+    assert headers["etag"] == esperado.headers["ETag"]
+
+
+def test_insights_em_python_igual_ao_sql(asgi, dados, monkeypatch):
+    monkeypatch.setattr(cache_graficos, "backend", None)
+    [(_, _, sql)] = requisitar(asgi, ("/charts/insights", dados))
+    monkeypatch.setattr(motor_insights, "INSIGHTS_MODO", "python")
+    [(_, _, python)] = requisitar(asgi, ("/charts/insights", dados))
+
+    assert json.loads(python) == json.loads(sql)
+
+
+def test_etag_e_erros(asgi, dados):
+    [(_, headers, _)] = requisitar(asgi, ("/charts/geral", dados))
+    respostas = requisitar(
+        asgi,
+        ("/charts/geral", dict(dados, **{"If-None-Match": headers["etag"]})),
+        ("/charts/geral?data_inicio=05/01/2024", dados),
+        ("/transacoes?cursor=invalido", dados),
+        ("/charts/geral", {}),
+        ("/charts/geral", {"Authorization": "Bearer x"}),
+    )
+
+    assert [status for status, _, _ in respostas] == [304, 400, 400, 401, 401]
+    assert json.loads(respostas[3][2]) == {"error": "Token ausente"}
+
+
+def test_demais_rotas_seguem_para_a_aplicacao_flask(asgi, dados):
+    [(status, _, corpo), (status_stream, _, stream)] = requisitar(
+        asgi, ("/categorias", dados), ("/transacoes?stream=1", dados)
+    )
+
+    assert status == 200
+    assert json.loads(corpo)["categorias"]
+    assert status_stream == 200
+    assert len(json.loads(stream)) == 5
+
+
+def test_backend_numpy_no_modo_asgi(asgi, client, dados, monkeypatch):
+    monkeypatch.setattr(cache_graficos, "backend", None)
+    esperado = [client.get(caminho, headers=dados).get_json() for caminho in ("/charts/categoria", "/charts/insights")]
+    monkeypatch.setattr("services.graficos_service.GRAFICOS_BACKEND", "numpy")
+    respostas = requisitar(asgi, ("/charts/categoria", dados), ("/charts/insights", dados))
+
+    assert [json.loads(corpo) for _, _, corpo in respostas] == esperado
@@ -0,0 +1,123 @@
+import threading
+import jwt
+import pytest
+from models import session, Usuario
+from services import senhas_service
+from utils import decorator
+from utils.decorator import Principal, autenticar, principais
+
+
+def token_de(auth_headers):
+    return auth_headers["Authorization"].split(" ")[1]
+
+
+def test_principal_em_cache(usuario, auth_headers, monkeypatch):
+    token = token_de(auth_headers)
+    principal = autenticar(token)
+    assert principal == Principal(usuario.id, usuario.username)
+
+    def decode_proibido(*args, **kwargs):
+        raise AssertionError("token deveria vir do cache")
+    monkeypatch.setattr(decorator.jwt, "decode", decode_proibido)
+
+    assert autenticar(token) is principal
+
+
+def test_cache_invalidado_quando_usuario_muda(usuario, auth_headers):
+    token = token_de(auth_headers)
+    autenticar(token)
+
+    session.get(Usuario, usuario.id).username = f"{usuario.username}-novo"
+    session.commit()
+
+    assert principais.obter(token) is None
+    assert autenticar(token).username.endswith("-novo")
+
+
+def test_cache_respeita_expiracao_do_token(usuario):
+    token = jwt.encode({"user_id": usuario.id, "exp": 1}, decorator.SECRET_KEY, algorithm="HS256")
+    principais.guardar(token, Principal(usuario.id, usuario.username), exp=1)
+
+    assert principais.obter(token) is None
+    with pytest.raises(jwt.ExpiredSignatureError):
+        autenticar(token)
+
+
+def test_rota_recebe_principal(client, auth_headers):
+    response = client.get("/categorias", headers=auth_headers)
+    assert response.status_code == 200
+
+    response = client.get("/categorias", headers={"Authorization": "Bearer invalido"})
+    assert response.status_code == 401
+
+
+def test_login_refaz_hash_quando_metodo_muda(client, monkeypatch):
+    from werkzeug.security import generate_password_hash
+    user = Usuario(username="rehash", password_hash=generate_password_hash("segredo", "pbkdf2:sha256:1000"))
+    session.add(user)
+    session.commit()
+    user_id = user.id
+    monkeypatch.setattr(senhas_service, "SENHA_METODO", "pbkdf2:sha256:2000")
+
+    resposta = client.post("/login", json={"username": "rehash", "password": "segredo"})
+    assert resposta.status_code == 200
+    session.expire_all()
+    novo_hash = session.get(Usuario, user_id).password_hash
+    assert novo_hash.startswith("pbkdf2:sha256:2000$")
+
+    assert client.post("/login", json={"username": "rehash", "password": "segredo"}).status_code == 200
+    assert client.post("/login", json={"username": "rehash", "password": "errada"}).status_code == 401
+    session.expire_all()
+    assert session.get(Usuario, user_id).password_hash == novo_hash
+
+
+@pytest.fixture
+def pool_ocupado(monkeypatch):
+    """Pool de hash com o único worker preso em uma tarefa até o teste liberar"""
+    def criar(fila_max, timeout=5):
+        pool = senhas_service.PoolHash(workers=1, fila_max=fila_max, timeout=timeout)
+        monkeypatch.setattr(senhas_service, "pool_hash", pool)
+        pool._obter_executor().submit(liberar.wait)
+        pool._vagas.acquire()
+        return pool
+
+    liberar = threading.Event()
+    yield criar
+    liberar.set()
+
+
+def test_login_recusado_com_429_quando_pool_cheio(client, usuario, pool_ocupado):
+    pool = pool_ocupado(fila_max=0)
+
+    resposta = client.post("/login", json={"username": usuario.username, "password": "123456"})
+
+    assert resposta.status_code == 429
+    assert resposta.headers["Retry-After"] == "1"
+    assert pool.estatisticas()["recusadas"] == 1
+
+
+def test_login_503_quando_hash_demora(client, usuario, pool_ocupado):
+    pool_ocupado(fila_max=1, timeout=0.05)
+
+    resposta = client.post("/login", json={"username": usuario.username, "password": "123456"})
+
+    assert resposta.status_code == 503
+    assert "Retry-After" in resposta.headers
+
+
+def test_cadastro_simultaneo_com_o_mesmo_nome(client, monkeypatch):
+    gerar_hash = senhas_service.gerar_hash
+
+    def hash_com_concorrente(senha):
+        # o outro cadastro termina enquanto este calcula o hash
+        outro = Usuario(username="simultaneo", password_hash="x")
+        session.add(outro)
+        session.commit()
+        session.close()
+        return gerar_hash(senha)
+
+    monkeypatch.setattr("services.auth_service.gerar_hash", hash_com_concorrente)
+    response = client.post("/usuarios", json={"username": "simultaneo", "password": "123456"})
+
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "Usuário já existe"}
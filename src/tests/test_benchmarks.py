@@ -0,0 +1,22 @@
+from benchmarks.executar import comparar
+from utils.faturas import gerar_historico_fake
+
+
+def test_historico_fake_deterministico():
+    primeiro = list(gerar_historico_fake(500, usuarios=3, anos=2, seed=7))
+    segundo = list(gerar_historico_fake(500, usuarios=3, anos=2, seed=7))
+
+    assert primeiro == segundo
+    assert {t["usuario"] for t in primeiro} == {0, 1, 2}
+    assert {t["data"][:4] for t in primeiro} == {"2023", "2024"}
+
+
+def test_comparar_com_baseline():
+    baseline = {"casos": {"a": {"mediana_s": 1.0}, "b": {"mediana_s": 1.0}, "c": {"mediana_s": 1.0}}}
+    resultado = {"casos": {"a": {"mediana_s": 1.5}, "b": {"mediana_s": 0.5}, "c": {"mediana_s": 1.1}, "d": {"mediana_s": 1}}}
+
+    comparacao = comparar(resultado, baseline, tolerancia=0.2)
+
+    assert {nome: c["situacao"] for nome, c in comparacao.items()} == {
+        "a": "regressao", "b": "melhora", "c": "igual"
+    }
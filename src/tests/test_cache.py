@@ -0,0 +1,89 @@
+import pytest
+from services import cache_service
+from services.cache_service import BackendMemoria, BackendCompartilhado, ArmazemLocal, cache_graficos
+from services.graficos_service import gastos_por_categoria_service, gastos_gerais_service, insights_service
+from services.transacoes_service import criar_transacao, deletar_transacao
+
+
+@pytest.fixture(params=["memoria", "compartilhado"])
+def backend(request, monkeypatch):
+    if request.param == "memoria":
+        backend = BackendMemoria()
+    else:
+        backend = BackendCompartilhado(ArmazemLocal())
+    monkeypatch.setattr(cache_graficos, "backend", backend)
+    cache_graficos.limpar()
+    yield backend
+    cache_graficos.limpar()
+
+
+def test_cache_acerta_com_filtros_normalizados(usuario, backend):
+    criar_transacao(usuario, {"data": "2024-01-05", "descricao": "Netflix", "valor": 39.9})
+
+    primeira = gastos_por_categoria_service(usuario, "Assinaturas", "2024-01-01")
+    segunda = gastos_por_categoria_service(usuario, categoria=" assinaturas ", data_inicio="2024-01-01")
+    gastos_gerais_service(usuario)
+    insights_service(usuario)
+    insights_service(usuario, None, None)
+
+    assert segunda == primeira
+    assert (cache_graficos.hits, cache_graficos.misses) == (2, 3)
+
+
+def test_filtro_com_espacos_igual_no_acerto_e_na_falta(usuario, backend, monkeypatch):
+    criar_transacao(usuario, {"data": "2024-01-05", "descricao": "Netflix", "valor": 39.9})
+
+    falta = gastos_por_categoria_service(usuario, " assinaturas ")
+    acerto = gastos_por_categoria_service(usuario, "Assinaturas")
+    monkeypatch.setattr(cache_graficos, "backend", None)
+    sem_cache = gastos_por_categoria_service(usuario, " assinaturas ")
+
+    assert falta == acerto == sem_cache
+    assert [item["categoria"] for item in falta] == ["assinaturas"]
+
+
+def test_escrita_invalida_cache(usuario, backend):
+    t = criar_transacao(usuario, {"data": "2024-01-05", "descricao": "Netflix", "valor": 39.9})
+    assert gastos_gerais_service(usuario)["soma_total"] == pytest.approx(39.9)
+
+    criar_transacao(usuario, {"data": "2024-02-05", "descricao": "Uber", "valor": 10})
+    assert gastos_gerais_service(usuario)["soma_total"] == pytest.approx(49.9)
+
+    deletar_transacao(usuario, t.id)
+    assert gastos_gerais_service(usuario)["soma_total"] == pytest.approx(10)
+    assert cache_graficos.hits == 0
+
+
+def test_data_invalida_nao_entra_no_cache(usuario, backend):
+    with pytest.raises(ValueError):
+        gastos_gerais_service(usuario, data_inicio="01/02/2024")
+    assert cache_graficos.hits == cache_graficos.misses == 0
+
+
+def test_backend_memoria_respeita_limite_e_ttl(monkeypatch):
+    backend = BackendMemoria(ttl=10, max_bytes=10)
+    backend.guardar("a", "12345", 1)
+    backend.guardar("b", "12345", 2)
+    assert backend.obter("a") == "12345"
+    backend.guardar("c", "12345", 1)
+
+    assert backend.obter("b") is None
+    assert backend.tamanho() == {"itens": 2, "bytes": 10}
+
+    backend.invalidar_usuario(1)
+    assert backend.tamanho() == {"itens": 0, "bytes": 0}
+
+    backend.guardar("d", "1", 1)
+    monkeypatch.setattr(cache_service.time, "time", lambda: 10 ** 12)
+    assert backend.obter("d") is None
+
+
+def test_status_do_cache(client, auth_headers, status_headers, backend):
+    client.get("/charts/geral", headers=auth_headers)
+    client.get("/charts/geral", headers=auth_headers)
+
+    assert client.get("/status/cache", headers=auth_headers).status_code == 401
+    estatisticas = client.get("/status/cache", headers=status_headers).get_json()
+    assert estatisticas["hits"] == 1
+    assert estatisticas["misses"] == 1
+    assert estatisticas["backend"] == type(backend).__name__
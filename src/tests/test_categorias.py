@@ -0,0 +1,43 @@
+import re
+import pytest
+from utils.categorias import CATEGORIAS_KEYWORDS, categorizar, categorizar_lote
+
+
+def categorizar_referencia(descricao):
+    """Implementação original, keyword a keyword, usada como referência"""
+    if not descricao:
+        return "outros"
+    desc_lower = descricao.lower()
+    for categoria, palavras in CATEGORIAS_KEYWORDS.items():
+        for palavra in palavras:
+            if re.search(rf"\b{re.escape(palavra.lower())}\b", desc_lower):
+                return categoria
+    return "outros"
+
+
+@pytest.mark.parametrize("descricao", [
+    "",
+    "Padaria do Joao",
+    "UBER *TRIP",
+    "ubereats pedido",
+    "Vivo Fibra mensal",
+    "Porto Seguro auto",
+    "Ração para gato",
+    "posto shell br mania",
+    "bar do ze e netflix",
+    "Item 42",
+])
+def test_categorizar_mantem_prioridade_do_dicionario(descricao):
+    assert categorizar(descricao) == categorizar_referencia(descricao)
+
+
+def test_categorizar_todas_as_keywords():
+    for palavras in CATEGORIAS_KEYWORDS.values():
+        for palavra in palavras:
+            for descricao in (palavra, f"compra {palavra.upper()} 123", f"{palavra}x"):
+                assert categorizar(descricao) == categorizar_referencia(descricao)
+
+
+def test_categorizar_lote():
+    descricoes = ["netflix", "ifood", "netflix", "Item 1", ""]
+    assert categorizar_lote(descricoes) == ["assinaturas", "delivery", "assinaturas", "outros", "outros"]
@@ -0,0 +1,135 @@
+import io
+from sqlalchemy import select
+from models import session, ModeloCategorias
+from services import transacoes_service
+from services.cache_service import modelos_categorias
+from services.categorizador_service import Categorizador, Classificador, carregar_modelo
+from services.transacoes_service import processar_csv, linhas_transacoes
+
+
+def categorias_de(usuario):
+    return {linha.descricao: linha.categoria for linha in linhas_transacoes(usuario)[0]}
+
+
+def enviar(usuario, *linhas):
+    processar_csv(usuario, io.StringIO("data,descricao,valor,categoria\n" + "\n".join(linhas)))
+
+
+def test_correcao_ensina_o_modelo_do_usuario(client, auth_headers, usuario):
+    enviar(usuario, "2024-01-05,Padaria Pao Quente,12.00,", "2024-01-06,Loja Xpto Centro,80.00,")
+    transacoes = {t["descricao"]: t["id"] for t in client.get("/transacoes", headers=auth_headers).get_json()}
+    assert categorias_de(usuario)["Padaria Pao Quente"] == "padaria"
+
+    client.put(f"/transacoes/{transacoes['Padaria Pao Quente']}", headers=auth_headers, json={"categoria": "mercado"})
+    client.put(f"/transacoes/{transacoes['Loja Xpto Centro']}", headers=auth_headers, json={"categoria": "Presentes"})
+    enviar(
+        usuario,
+        "2024-02-05,PADARIA PAO QUENTE 0042,9.50,",
+        "2024-02-06,LOJA XPTO,40.00,",
+        "2024-02-07,Netflix,39.90,",
+        "2024-02-08,Pagamento avulso,5.00,",
+    )
+
+    categorias = categorias_de(usuario)
+    assert categorias["PADARIA PAO QUENTE 0042"] == "mercado"
+    assert categorias["LOJA XPTO"] == "presentes"
+    # sem palavras conhecidas pelo modelo, valem as palavras-chave
+    assert categorias["Netflix"] == "assinaturas"
+    assert categorias["Pagamento avulso"] == "outros"
+
+
+def test_upload_com_categoria_treina_e_nao_afeta_outros_usuarios(usuario):
+    from models import Usuario
+    from utils.decorator import Principal
+    outro = Usuario(username="outro-categorizador")
+    outro.set_password("123456")
+    session.add(outro)
+    session.commit()
+    outro = Principal(outro.id, outro.username)
+
+    enviar(usuario, "2024-01-05,Armazem do Bairro,30.00,Mercado", "2024-01-06,Armazem do Bairro,25.00,")
+    assert categorias_de(usuario)["Armazem do Bairro"] == "mercado"
+
+    # mesmo arquivo: o parse vem do cache, mas a categorização é de cada usuário
+    enviar(usuario, "2024-02-05,Armazem do Bairro,10.00,")
+    enviar(outro, "2024-02-05,Armazem do Bairro,10.00,")
+    assert categorias_de(usuario)["Armazem do Bairro"] == "mercado"
+    assert categorias_de(outro)["Armazem do Bairro"] == "outros"
+
+
+def test_modelo_persistido_e_recarregado(usuario):
+    enviar(usuario, "2024-01-05,Feira Organica Sabado,30.00,Hortifruti")
+    linha = session.execute(select(ModeloCategorias).where(ModeloCategorias.user_id == usuario.id)).scalar_one()
+    assert linha.categorias == ["hortifruti"]
+
+    modelos_categorias.limpar()
+    assert carregar_modelo(usuario.id).prever(["FEIRA ORGANICA"]) == ["hortifruti"]
+    enviar(usuario, "2024-02-05,FEIRA ORGANICA,12.00,")
+    assert categorias_de(usuario)["FEIRA ORGANICA"] == "hortifruti"
+    assert modelos_categorias.tamanho()["usuarios"] >= 1
+
+
+def test_treino_de_outro_processo_nao_se_perde(usuario):
+    enviar(usuario, "2024-01-05,Sacolao Central,20.00,Hortifruti")
+    categorizador = Categorizador(usuario.id)
+    categorizador.categorizar(["qualquer"])
+
+    # escrita de outro worker depois que este leu o modelo
+    enviar(usuario, "2024-01-06,Bazar Popular,15.00,Utilidades")
+    categorizador.treinar(["Bicicletaria Pedal"], ["Bicicleta"])
+    transacoes_service.registrar_alteracao(usuario.id)
+    categorizador.salvar()
+    session.commit()
+    categorizador.publicar()
+
+    assert sorted(carregar_modelo(usuario.id).categorias) == ["bicicleta", "hortifruti", "utilidades"]
+
+
+def test_lote_treina_com_edicoes_e_categoriza_criacoes(client, auth_headers, usuario):
+    enviar(usuario, "2024-01-05,Quitanda da Vila,12.00,")
+    [transacao] = client.get("/transacoes", headers=auth_headers).get_json()
+
+    response = client.post("/transacoes/lote", headers=auth_headers, json={"operacoes": [
+        {"op": "editar", "id": transacao["id"], "categoria": "hortifruti"},
+        {"op": "criar", "data": "2024-01-06", "descricao": "Quitanda da Vila", "valor": 8},
+    ]})
+
+    assert response.status_code == 200
+    assert [t["categoria"] for t in client.get("/transacoes", headers=auth_headers).get_json()] == ["hortifruti"] * 2
+
+
+def test_classificador_sem_confianca_devolve_none():
+    classificador = Classificador()
+    classificador.treinar(["posto centro", "mercado centro"], ["carro", "mercado"])
+
+    assert classificador.prever(["centro", "posto centro", "loja nova", ""]) == [None, "carro", None, None]
+    copia = Classificador.de_bytes(classificador.categorias, classificador.em_bytes(), classificador.dimensoes)
+    assert (copia.contagens == classificador.contagens).all()
+
+
+def test_desligado_usa_so_palavras_chave(usuario, monkeypatch):
+    monkeypatch.setattr(transacoes_service, "CATEGORIZADOR_APRENDIDO", False)
+    enviar(usuario, "2024-01-05,Mercadinho Sol,30.00,Mercado", "2024-01-06,Mercadinho Sol,25.00,")
+
+    assert categorias_de(usuario)["Mercadinho Sol"] == "outros"
+    assert session.execute(select(ModeloCategorias).where(ModeloCategorias.user_id == usuario.id)).first() is None
+
+
+def test_categoria_que_nao_e_texto(client, auth_headers, usuario):
+    import pandas as pd
+    df = pd.DataFrame({"data": ["2024-01-05"] * 2, "descricao": ["A", "B"], "valor": ["1", "2"], "categoria": [1, 2]})
+    linhas, _ = transacoes_service._converter_chunk_csv(df)
+    assert [linha["categoria"] for linha in linhas] == ["1", "2"]
+
+    enviar(usuario, "2024-01-05,Compra A,10.00,1", "2024-01-06,Compra B,20.00,2")
+    assert categorias_de(usuario) == {"Compra A": "1", "Compra B": "2"}
+
+    [transacao, _] = client.get("/transacoes", headers=auth_headers).get_json()
+    response = client.put(f"/transacoes/{transacao['id']}", headers=auth_headers, json={"categoria": ["mercado"]})
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "Categoria deve ser texto"}
+
+    response = client.post("/transacoes/lote", headers=auth_headers, json={"operacoes": [
+        {"op": "editar", "id": transacao["id"], "categoria": 3},
+    ]})
+    assert response.get_json()["resultados"][0]["status"] == 400
@@ -0,0 +1,72 @@
+import io
+import uuid
+import pytest
+from models import session, Usuario
+from services.exportacao_service import consulta_exportacao, exportar_pdf
+from services.transacoes_service import processar_csv, processar_pdf, listar_transacoes
+from utils.decorator import Principal
+
+
+@pytest.fixture
+def transacoes(usuario):
+    linhas = "\n".join(
+        f"2024-{mes:02d}-{dia:02d},Loja (filial) {mes}-{dia},{mes * 10 + dia}.5,"
+        for mes in range(1, 5) for dia in range(1, 29)
+    )
+    processar_csv(usuario, io.StringIO("data,descricao,valor,categoria\n" + linhas + "\n2024-05-01,Pão | Café,,\n"))
+    return usuario
+
+
+def outro_usuario():
+    user = Usuario(username=f"teste-{uuid.uuid4().hex[:8]}", password_hash="-")
+    session.add(user)
+    session.commit()
+    return Principal(user.id, user.username)
+
+
+def chaves(usuario):
+    # o upload de PDF não padroniza a caixa da categoria
+    return sorted((t.data.isoformat(), t.valor, t.categoria.lower()) for t in listar_transacoes(usuario))
+
+
+def test_exportar_csv_filtrado_e_reimportavel(client, auth_headers, transacoes):
+    resposta = client.get("/exportar/csv?data_inicio=2024-03-01", headers=auth_headers)
+
+    assert resposta.status_code == 200
+    assert resposta.is_streamed
+    assert resposta.headers["Content-Disposition"] == "attachment; filename=transacoes.csv"
+    texto = resposta.get_data(as_text=True)
+    assert texto.splitlines()[:2] == ["data,descricao,valor,categoria", "2024-03-01,Loja (filial) 3-1,31.5,outros"]
+
+    destino = outro_usuario()
+    processar_csv(destino, io.StringIO(texto))
+    assert chaves(destino) == [c for c in chaves(transacoes) if c[0] >= "2024-03-01"]
+
+
+def test_exportar_pdf_pagina_a_pagina_e_reimportavel(client, auth_headers, transacoes):
+    pedacos = list(exportar_pdf(consulta_exportacao(transacoes)))
+    # cabeçalho, uma página por pedaço e o fechamento com a xref
+    assert len(pedacos) >= 5
+
+    resposta = client.get("/exportar/pdf", headers=auth_headers)
+    assert resposta.mimetype == "application/pdf"
+    pdf = resposta.get_data()
+    assert pdf == b"".join(pedacos)
+
+    destino = outro_usuario()
+    resultado = processar_pdf(destino, io.BytesIO(pdf), backend="pdfplumber", workers=0)
+    assert resultado["inseridas"] == 113
+    # o upload de PDF lê valor vazio como 0.0
+    esperado = [(d, v if v is not None else 0.0, c) for d, v, c in chaves(transacoes)]
+    assert chaves(destino) == esperado
+
+
+def test_exportar_sem_transacoes(client, auth_headers):
+    assert client.get("/exportar/csv", headers=auth_headers).get_data(as_text=True) == "data,descricao,valor,categoria\r\n"
+    destino = outro_usuario()
+    pdf = client.get("/exportar/pdf", headers=auth_headers).get_data()
+    assert processar_pdf(destino, io.BytesIO(pdf))["inseridas"] == 0
+
+
+def test_exportar_filtro_invalido(client, auth_headers):
+    assert client.get("/exportar/pdf?data_inicio=01/02/2024", headers=auth_headers).status_code == 400
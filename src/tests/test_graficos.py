@@ -0,0 +1,298 @@
+import io
+import pytest
+from datetime import date
+from sqlalchemy import event, update
+from models import engine, session, ResumoMensal, Transacao
+from services import graficos_service, resumo_service
+from services.graficos_service import gastos_por_categoria_service, gastos_gerais_service, insights_service, serie_temporal_service
+from services.cache_service import cache_graficos
+from services.resumo_service import acumular_resumo, recalcular_resumo, reconstruir
+from services.transacoes_service import processar_csv, criar_transacao, editar_transacao, deletar_transacao
+
+
+@pytest.fixture(autouse=True)
+def sem_cache_graficos(monkeypatch):
+    # as comparações entre caminhos de cálculo não podem ser respondidas pelo cache
+    monkeypatch.setattr(cache_graficos, "backend", None)
+
+
+@pytest.fixture
+def usuario_com_transacoes(usuario):
+    processar_csv(usuario, io.StringIO(
+        "data,descricao,valor,categoria\n"
+        "2024-01-05,Netflix,39.90,\n"
+        "2024-01-20,ifood,52.10,\n"
+        "2024-02-03,Uber,18.00,\n"
+        "2024-02-28,Padaria,7.50,\n"
+        "2025-01-10,Netflix,44.90,\n"
+        "2025-03-15,Posto Shell,250.00,Carro\n"
+    ))
+    criar_transacao(usuario, {"data": "2024-02-10", "descricao": "Zaffari", "valor": 310.4})
+    t = criar_transacao(usuario, {"data": "2024-03-01", "descricao": "Steam", "valor": 99.9})
+    editar_transacao(usuario, t.id, {"data": "2024-01-31", "categoria": "jogos"})
+    t = criar_transacao(usuario, {"data": "2024-03-02", "descricao": "Rappi", "valor": 20})
+    deletar_transacao(usuario, t.id)
+    return usuario
+
+
+def arredondar(resposta):
+    if isinstance(resposta, dict):
+        return {k: arredondar(v) for k, v in resposta.items()}
+    if isinstance(resposta, list):
+        return [arredondar(v) for v in resposta]
+    if isinstance(resposta, float):
+        return round(resposta, 6)
+    return resposta
+
+
+def resumos(usuario):
+    return sorted(
+        (r.ano, r.mes, r.categoria, round(r.soma, 6), r.quantidade, r.minimo, r.maximo)
+        for r in session.query(ResumoMensal).filter_by(user_id=usuario.id)
+    )
+
+
+def test_resumo_incremental_igual_a_reconstrucao(usuario_com_transacoes):
+    incremental = resumos(usuario_com_transacoes)
+    reconstruir(usuario_com_transacoes.id)
+    assert resumos(usuario_com_transacoes) == incremental
+    assert (2024, 1, "jogos", 99.9, 1, 99.9, 99.9) in incremental
+
+
+@pytest.mark.parametrize("upsert", [True, False])
+def test_resumo_acumulado_em_sql(usuario, upsert, monkeypatch):
+    if not upsert:
+        monkeypatch.setattr(resumo_service, "_insert_com_conflito", lambda dialeto: None)
+    comandos = []
+    contar = lambda conn, cursor, sql, *args: comandos.append(sql.upper())
+    linha = lambda dia, valor: {"data": date(2024, 1, dia), "valor": valor, "categoria": "mercado"}
+
+    event.listen(engine, "before_cursor_execute", contar)
+    try:
+        acumular_resumo(usuario.id, [linha(1, 10.0), linha(2, 5.0)])
+        acumular_resumo(usuario.id, [linha(3, 2.0), linha(4, 20.0)])
+        session.commit()
+    finally:
+        event.remove(engine, "before_cursor_execute", contar)
+
+    # sem ler e regravar as linhas: o incremento é feito pelo banco
+    assert not any(c.startswith("SELECT") and "RESUMOS_MENSAIS" in c for c in comandos)
+    assert resumos(usuario) == [(2024, 1, "mercado", 37.0, 4, 2.0, 20.0)]
+
+
+@pytest.mark.parametrize("upsert", [True, False])
+def test_resumo_recalculado_em_sql(usuario_com_transacoes, upsert, monkeypatch):
+    if not upsert:
+        monkeypatch.setattr(resumo_service, "_insert_com_conflito", lambda dialeto: None)
+    usuario = usuario_com_transacoes
+    acumular_resumo(usuario.id, [{"data": date(2023, 12, 1), "valor": 1.0, "categoria": "sobra"}])
+    session.execute(update(Transacao).where(Transacao.user_id == usuario.id).values(valor=Transacao.valor * 2))
+    comandos = []
+    contar = lambda conn, cursor, sql, *args: comandos.append(sql.upper())
+
+    event.listen(engine, "before_cursor_execute", contar)
+    try:
+        recalcular_resumo(usuario.id, {(2023, 12), (2024, 1), (2024, 2)})
+        session.commit()
+    finally:
+        event.remove(engine, "before_cursor_execute", contar)
+
+    assert not any(c.startswith("SELECT") and "RESUMOS_MENSAIS" in c for c in comandos)
+    recalculados = resumos(usuario)
+    assert (2024, 1, "jogos", 199.8, 1, 199.8, 199.8) in recalculados
+    assert not any(r[0] == 2023 for r in recalculados)
+    # meses fora do recálculo ficam como estavam
+    assert (2025, 1, "assinaturas", 44.9, 1, 44.9, 44.9) in recalculados
+
+
+@pytest.mark.parametrize("filtros", [
+    {},
+    {"data_inicio": "2024-01-01"},
+    {"data_inicio": "2024-02-01", "data_fim": "2024-12-31"},
+    {"categoria": "ASSINATURAS"},
+    {"categoria": "assinaturas", "data_fim": "2024-01-31"},
+])
+def test_graficos_resumo_igual_ao_bruto(usuario_com_transacoes, filtros, monkeypatch):
+    por_resumo = (
+        gastos_por_categoria_service(usuario_com_transacoes, **filtros),
+        gastos_gerais_service(usuario_com_transacoes, **filtros),
+    )
+    monkeypatch.setattr(graficos_service, "USAR_RESUMO_MENSAL", False)
+    bruto = (
+        gastos_por_categoria_service(usuario_com_transacoes, **filtros),
+        gastos_gerais_service(usuario_com_transacoes, **filtros),
+    )
+    assert arredondar(por_resumo) == arredondar(bruto)
+
+
+def test_graficos_periodo_parcial_usa_transacoes(usuario_com_transacoes):
+    resposta = gastos_gerais_service(usuario_com_transacoes, data_inicio="2024-01-10", data_fim="2024-02-05")
+    assert resposta["meses"] == [{"mes": "Jan", "valor": pytest.approx(152.0)}, {"mes": "Fev", "valor": 18.0}]
+
+
+@pytest.mark.parametrize("modo", ["sql", "python"])
+def test_insights_modos(usuario_com_transacoes, modo, monkeypatch):
+    monkeypatch.setattr("services.motor_insights.INSIGHTS_MODO", modo)
+
+    resposta = insights_service(usuario_com_transacoes, data_fim="2024-12-31")
+
+    assert arredondar(resposta) == {
+        "maior_categoria": "mercado",
+        "maior_categoria_valor": 310.4,
+        "media_semanal": round((39.9 + 52.1 + 18 + 7.5 + 310.4 + 99.9) / 6, 6),
+        "maior_gasto": {"descricao": "Zaffari", "valor": 310.4},
+        "menor_gasto": {"descricao": "Padaria", "valor": 7.5},
+        "dia_maior_gasto_media": 10,
+    }
+
+
+def test_insights_sem_transacoes(usuario):
+    assert insights_service(usuario) == {
+        "maior_categoria": None,
+        "maior_categoria_valor": 0,
+        "media_semanal": 0,
+        "maior_gasto": None,
+        "menor_gasto": None,
+        "dia_maior_gasto_media": None,
+    }
+
+
+@pytest.fixture
+def backend_numpy(monkeypatch):
+    def usar(backend):
+        monkeypatch.setattr(graficos_service, "GRAFICOS_BACKEND", backend)
+    return usar
+
+
+def todos_os_graficos(usuario, filtros):
+    sem_categoria = {k: v for k, v in filtros.items() if k != "categoria"}
+    return [
+        gastos_por_categoria_service(usuario, **filtros),
+        gastos_gerais_service(usuario, **filtros),
+        insights_service(usuario, **sem_categoria),
+    ]
+
+
+FILTROS_PARIDADE = [
+    {},
+    {"data_inicio": "2024-01-01"},
+    {"data_inicio": "2024-01-10", "data_fim": "2024-02-05"},
+    {"data_inicio": "2024-02-01", "data_fim": "2024-12-31"},
+    {"data_inicio": "2030-01-01"},
+    {"categoria": "ASSINATURAS"},
+    {"categoria": "jogos", "data_fim": "2024-01-31"},
+    {"categoria": "inexistente"},
+]
+
+
+@pytest.mark.parametrize("filtros", FILTROS_PARIDADE)
+def test_backend_numpy_igual_ao_sql(usuario_com_transacoes, filtros, backend_numpy):
+    backend_numpy("sql")
+    sql = todos_os_graficos(usuario_com_transacoes, filtros)
+    backend_numpy("numpy")
+    assert arredondar(todos_os_graficos(usuario_com_transacoes, filtros)) == arredondar(sql)
+
+
+def test_backend_numpy_igual_ao_sql_em_historico(usuario, backend_numpy):
+    from utils.faturas import gerar_historico_fake
+    linhas = "\n".join(
+        f"{t['data']},{t['descricao']},{t['valor']},{t['categoria'] or ''}"
+        for t in gerar_historico_fake(1500, anos=2, seed=3)
+    )
+    processar_csv(usuario, io.StringIO("data,descricao,valor,categoria\n" + linhas + "\n"))
+
+    for filtros in FILTROS_PARIDADE + [{"categoria": "mercado", "data_inicio": "2023-03-01", "data_fim": "2024-06-30"}]:
+        backend_numpy("sql")
+        sql = todos_os_graficos(usuario, filtros)
+        backend_numpy("numpy")
+        assert arredondar(todos_os_graficos(usuario, filtros)) == arredondar(sql), filtros
+
+
+def test_backend_numpy_recarrega_depois_de_escritas(usuario_com_transacoes, backend_numpy):
+    from services.analise_numpy import colunas_usuario
+    backend_numpy("numpy")
+
+    colunas = colunas_usuario(usuario_com_transacoes.id)
+    assert colunas_usuario(usuario_com_transacoes.id) is colunas
+
+    criar_transacao(usuario_com_transacoes, {"data": "2024-01-15", "descricao": "Zaffari", "valor": 1000})
+    assert colunas_usuario(usuario_com_transacoes.id) is not colunas
+    assert insights_service(usuario_com_transacoes)["maior_gasto"] == {"descricao": "Zaffari", "valor": 1000.0}
+    assert gastos_por_categoria_service(usuario_com_transacoes)[0]["categoria"] == "mercado"
+
+
+def test_backend_numpy_data_invalida(usuario_com_transacoes, backend_numpy):
+    backend_numpy("numpy")
+    with pytest.raises(ValueError):
+        gastos_gerais_service(usuario_com_transacoes, data_inicio="05/01/2024")
+
+
+def test_serie_mensal_separa_anos_e_preenche_vazios(usuario_com_transacoes):
+    resposta = serie_temporal_service(usuario_com_transacoes, "mes", "2024-01-01", "2025-03-31")
+
+    assert resposta["periodos"][:3] == ["2024-01-01", "2024-02-01", "2024-03-01"]
+    assert len(resposta["periodos"]) == 15
+    assert arredondar(resposta["valores"])[:3] == [191.9, 335.9, 0]
+    assert arredondar(resposta["valores"])[12:] == [44.9, 0, 250.0]
+
+
+@pytest.mark.parametrize("granularidade, inicio, fim, periodos, valores", [
+    ("dia", "2024-01-04", "2024-01-06", ["2024-01-04", "2024-01-05", "2024-01-06"], [0, 39.9, 0]),
+    ("semana", "2024-01-03", "2024-01-21", ["2024-01-01", "2024-01-08", "2024-01-15"], [39.9, 0, 52.1]),
+    ("ano", None, None, ["2024-01-01", "2025-01-01"], [527.8, 294.9]),
+])
+def test_serie_granularidades(usuario_com_transacoes, granularidade, inicio, fim, periodos, valores):
+    resposta = serie_temporal_service(usuario_com_transacoes, granularidade, inicio, fim)
+
+    assert resposta["periodos"] == periodos
+    assert arredondar(resposta["valores"]) == valores
+
+
+@pytest.mark.parametrize("granularidade", ["mes", "ano"])
+def test_serie_resumo_igual_ao_bruto(usuario_com_transacoes, granularidade, monkeypatch):
+    filtros = {"data_inicio": "2024-01-01", "data_fim": "2025-12-31", "categoria": "mercado,jogos", "por_categoria": True}
+    por_resumo = serie_temporal_service(usuario_com_transacoes, granularidade, **filtros)
+    monkeypatch.setattr(graficos_service, "USAR_RESUMO_MENSAL", False)
+    assert serie_temporal_service(usuario_com_transacoes, granularidade, **filtros) == por_resumo
+
+
+def test_serie_por_categoria_soma_o_total(usuario_com_transacoes):
+    resposta = serie_temporal_service(usuario_com_transacoes, "mes", "2024-01-01", "2024-02-29", por_categoria=True)
+
+    assert resposta["series"][0] == {"categoria": "mercado", "valores": [0, 310.4]}
+    assert {"categoria": "jogos", "valores": [99.9, 0]} in resposta["series"]
+    totais = [round(sum(v), 2) for v in zip(*(s["valores"] for s in resposta["series"]))]
+    assert totais == arredondar(resposta["valores"])
+
+
+def test_serie_reduzida_mantem_totais(usuario_com_transacoes):
+    completa = serie_temporal_service(usuario_com_transacoes, "dia", "2024-01-01", "2024-02-29")
+    reduzida = serie_temporal_service(usuario_com_transacoes, "dia", "2024-01-01", "2024-02-29", max_pontos=7)
+
+    assert len(completa["periodos"]) == 60
+    assert (reduzida["agrupamento"], len(reduzida["periodos"])) == (9, 7)
+    assert reduzida["periodos"][1] == "2024-01-10"
+    assert round(sum(reduzida["valores"]), 2) == round(sum(completa["valores"]), 2) == 527.8
+
+
+@pytest.mark.parametrize("argumentos", [
+    {"granularidade": "hora"},
+    {"data_inicio": "05/01/2024"},
+    {"max_pontos": "0"},
+    {"granularidade": "dia", "data_inicio": "1900-01-01", "data_fim": "2024-01-01"},
+])
+def test_serie_argumentos_invalidos(usuario_com_transacoes, argumentos):
+    with pytest.raises(ValueError):
+        serie_temporal_service(usuario_com_transacoes, **argumentos)
+
+
+def test_rota_serie(client, auth_headers):
+    response = client.get("/charts/serie?granularidade=hora", headers=auth_headers)
+    assert response.status_code == 400
+    assert "Granularidade inválida" in response.get_json()["error"]
+
+    response = client.get("/charts/serie?granularidade=dia&data_inicio=2024-01-01&data_fim=2024-01-03", headers=auth_headers)
+    assert response.get_json() == {
+        "granularidade": "dia", "agrupamento": 1,
+        "periodos": ["2024-01-01", "2024-01-02", "2024-01-03"], "valores": [0, 0, 0],
+    }
@@ -0,0 +1,9 @@
+from benchmarks.importacao import medir_importacao, relatorio
+
+
+def test_create_app_nao_carrega_modulos_pesados_nem_abre_o_banco():
+    # um caminho impossível: qualquer conexão na inicialização derrubaria o processo
+    modulos = medir_importacao(ambiente={"DATABASE_URL": "sqlite:////caminho/inexistente/banco.db"})
+
+    assert relatorio(modulos)["adiados_carregados"] == []
+    assert any(nome == "app" for nome, _, _ in modulos)
@@ -0,0 +1,54 @@
+import io
+import logging
+import pytest
+from services.transacoes_service import processar_csv
+from utils import metricas
+
+
+@pytest.fixture
+def transacoes(usuario):
+    processar_csv(usuario, io.StringIO(
+        "data,descricao,valor\n"
+        "2024-01-05,Netflix,39.90\n"
+        "2024-01-06,Uber,12\n"
+    ))
+    return usuario
+
+
+def test_metrics_expoe_latencia_e_sql_por_rota(client, auth_headers, status_headers, transacoes):
+    with client.get("/transacoes?stream=1", headers=auth_headers) as resposta:
+        resposta.get_data()
+
+    assert client.get("/metrics").status_code == 401
+    texto = client.get("/metrics", headers=status_headers).get_data(as_text=True)
+
+    assert 'invoice_requisicao_segundos_count{metodo="GET",rota="/transacoes",status="200"}' in texto
+    assert 'invoice_requisicao_segundos_bucket{metodo="GET",rota="/transacoes",status="200",le="+Inf"}' in texto
+    consultas = [l for l in texto.splitlines() if l.startswith('invoice_sql_consultas_total{rota="/transacoes"}')]
+    assert consultas and float(consultas[0].split()[-1]) > 0
+    hidratadas = [l for l in texto.splitlines() if l.startswith('invoice_linhas_hidratadas_total{rota="/transacoes"}')]
+    assert hidratadas and float(hidratadas[0].split()[-1]) >= 2
+    assert "invoice_cache_graficos_hits" in texto
+
+
+def test_server_timing_opcional(client, auth_headers, transacoes):
+    assert "Server-Timing" not in client.get("/transacoes", headers=auth_headers).headers
+
+    client.application.config["SERVER_TIMING"] = True
+    try:
+        cabecalho = client.get("/transacoes", headers=auth_headers).headers["Server-Timing"]
+    finally:
+        client.application.config["SERVER_TIMING"] = False
+
+    assert cabecalho.startswith("sql;dur=")
+    assert "json;dur=" in cabecalho and "app;dur=" in cabecalho
+
+
+def test_consulta_lenta_loga_plano(client, auth_headers, transacoes, monkeypatch, caplog):
+    monkeypatch.setattr(metricas, "SQL_LENTA_MS", 0)
+
+    with caplog.at_level(logging.WARNING, logger="sql_lenta"):
+        client.get("/transacoes?categoria=assinaturas", headers=auth_headers)
+
+    registros = [r.getMessage() for r in caplog.records if r.name == "sql_lenta"]
+    assert any("FROM transacoes" in r and "plano:" in r and "EXPLAIN falhou" not in r for r in registros)
@@ -0,0 +1,88 @@
+from sqlalchemy import create_engine, func, inspect, select
+from models import Transacao, ResumoMensal, migrar, explicar, indices_usados
+from models.migracoes import MIGRACOES, versao_atual
+
+ESQUEMA_ANTIGO = [
+    """CREATE TABLE usuarios (
+        id INTEGER NOT NULL, username VARCHAR NOT NULL, password_hash VARCHAR NOT NULL,
+        PRIMARY KEY (id), UNIQUE (username))""",
+    """CREATE TABLE transacoes (
+        id INTEGER NOT NULL, data DATE, descricao VARCHAR, valor FLOAT, categoria VARCHAR, user_id INTEGER,
+        PRIMARY KEY (id), FOREIGN KEY(user_id) REFERENCES usuarios (id))""",
+    "INSERT INTO usuarios VALUES (1, 'antigo', 'x')",
+    "INSERT INTO transacoes VALUES (1, '2024-01-05', 'Netflix', 39.9, 'assinaturas', 1)",
+    "INSERT INTO transacoes VALUES (2, '2024-01-20', 'Spotify', 19.9, 'assinaturas', 1)",
+]
+
+
+def test_migrar_atualiza_banco_antigo_no_lugar(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'antigo.db'}")
+    with engine.begin() as conn:
+        for ddl in ESQUEMA_ANTIGO:
+            conn.exec_driver_sql(ddl)
+
+    aplicadas = migrar(engine)
+
+    assert aplicadas == [versao for versao, _, _ in MIGRACOES]
+    assert migrar(engine) == []
+    with engine.connect() as conn:
+        assert versao_atual(conn) == MIGRACOES[-1][0]
+        nomes = {i["name"] for i in inspect(conn).get_indexes("transacoes")}
+        assert "ix_transacoes_user_data" in nomes
+        assert conn.execute(select(Transacao.descricao).order_by(Transacao.id)).scalars().all() == ["Netflix", "Spotify"]
+        resumo = conn.execute(select(ResumoMensal)).one()
+        assert (resumo.ano, resumo.mes, resumo.quantidade) == (2024, 1, 2)
+
+
+def test_explicar_mostra_indices(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'novo.db'}")
+    migrar(engine)
+
+    with engine.connect() as conn:
+        por_data = explicar(conn, select(Transacao).where(Transacao.user_id == 1, Transacao.data >= "2024-01-01"))
+        por_categoria = explicar(conn, select(func.sum(Transacao.valor)).where(
+            Transacao.user_id == 1, func.lower(Transacao.categoria) == "mercado"
+        ))
+
+        assert indices_usados(conn, por_data) == {"ix_transacoes_user_data"}
+        assert indices_usados(conn, por_categoria) == {"ix_transacoes_user_categoria_lower"}
+
+
+def test_cada_migracao_cria_so_as_suas_tabelas(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'historico.db'}")
+    esperadas = {
+        1: {"usuarios", "transacoes", "schema_versao"},
+        3: {"resumos_mensais"},
+        5: {"upload_jobs"},
+        6: {"versoes_dados"},
+        7: {"modelos_categorias"},
+    }
+
+    tabelas = set()
+    for versao, _, _ in MIGRACOES:
+        migrar(engine, ate=versao)
+        with engine.connect() as conn:
+            atuais = {t for t in inspect(conn).get_table_names() if not t.startswith("transacoes_fts")}
+            indices = {i["name"] for i in inspect(conn).get_indexes("transacoes")}
+        assert atuais - tabelas == esperadas.get(versao, set()), versao
+        assert ("ix_transacoes_user_data" in indices) == (versao >= 2)
+        tabelas = atuais
+
+
+def test_busca_fts_indexa_o_usuario(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'busca.db'}")
+    with engine.begin() as conn:
+        for ddl in ESQUEMA_ANTIGO:
+            conn.exec_driver_sql(ddl)
+    migrar(engine, ate=7)
+    migrar(engine)
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO usuarios VALUES (2, 'outro', 'x')")
+        conn.exec_driver_sql("INSERT INTO transacoes VALUES (3, '2024-01-21', 'Netflix Premium', 55.9, NULL, 2)")
+        buscar = lambda consulta: sorted(r for r, in conn.exec_driver_sql(
+            "SELECT rowid FROM transacoes_fts WHERE transacoes_fts MATCH ?", (consulta,)
+        ))
+        # linhas anteriores à migração e gravadas depois dela, pelos gatilhos
+        assert buscar('user_id : "1" AND descricao : ("netf"*)') == [1]
+        assert buscar('user_id : "2" AND descricao : ("netf"*)') == [3]
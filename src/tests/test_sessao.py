@@ -0,0 +1,59 @@
+import os
+import io
+import threading
+from models import session, estatisticas_pool
+from services.transacoes_service import processar_csv
+
+
+def test_sessao_por_thread():
+    sessoes = []
+    thread = threading.Thread(target=lambda: (sessoes.append(session()), session.remove()))
+    thread.start()
+    thread.join()
+
+    assert sessoes[0] is not session()
+
+
+def test_sessao_removida_ao_fim_da_requisicao(client, auth_headers):
+    session.remove()
+
+    response = client.get("/categorias", headers=auth_headers)
+
+    assert response.status_code == 200
+    assert not session.registry.has()
+
+
+def test_estatisticas_pool(client, status_headers):
+    response = client.get("/status/pool", headers=status_headers)
+
+    estatisticas = response.get_json()
+    assert estatisticas["classe"] == "PoolInstrumentado"
+    assert estatisticas["checkouts"] > 0
+    assert estatisticas["timeouts"] == 0
+
+
+def test_status_exige_token(client, auth_headers):
+    assert client.get("/status/pool").status_code == 401
+    # o token de um usuário não serve para as rotas internas
+    assert client.get("/status/pool", headers=auth_headers).status_code == 401
+
+    client.application.config["STATUS_TOKEN"] = None
+    try:
+        assert client.get("/status/pool", headers=auth_headers).status_code == 404
+    finally:
+        client.application.config["STATUS_TOKEN"] = os.environ["STATUS_TOKEN"]
+
+
+def test_stream_devolve_a_conexao(client, auth_headers, usuario):
+    processar_csv(usuario, io.StringIO("data,descricao,valor\n2024-01-05,Netflix,39.90\n2024-01-06,Uber,12\n"))
+    session.remove()
+    em_uso = estatisticas_pool()["em_uso"]
+
+    for _ in range(3):
+        response = client.get("/transacoes?stream=1", headers=auth_headers)
+        assert len(response.get_json()) == 2
+    # cliente que desconecta no meio da resposta
+    with client.get("/transacoes?stream=1", headers=auth_headers, buffered=False) as response:
+        next(response.response)
+
+    assert estatisticas_pool()["em_uso"] == em_uso
@@ -0,0 +1,258 @@
+import io
+import json
+import pytest
+from services.transacoes_service import processar_csv
+
+
+@pytest.fixture
+def transacoes(usuario):
+    linhas = "\n".join(
+        f"2024-01-{dia:02d},Compra {i},{10 + i}"
+        for i, dia in enumerate([5, 5, 5, 6, 7, 7, 8, 9, 10, 10, 11, 12])
+    )
+    processar_csv(usuario, io.StringIO("data,descricao,valor\n" + linhas))
+    return usuario
+
+
+def test_listar_transacoes_sem_paginacao(client, auth_headers, transacoes):
+    response = client.get("/transacoes?data_inicio=2024-01-07", headers=auth_headers)
+
+    assert response.status_code == 200
+    assert len(response.get_json()) == 8
+
+
+def test_listar_transacoes_paginado_por_cursor(client, auth_headers, transacoes):
+    vistos = []
+    cursor = None
+    paginas = 0
+    while True:
+        url = "/transacoes?limit=5" + (f"&cursor={cursor}" if cursor else "")
+        corpo = client.get(url, headers=auth_headers).get_json()
+        vistos.extend(corpo["transacoes"])
+        paginas += 1
+        cursor = corpo["proximo_cursor"]
+        if not cursor:
+            break
+
+    assert paginas == 3
+    assert len({t["id"] for t in vistos}) == 12
+    chaves = [(t["data"], t["id"]) for t in vistos]
+    assert chaves == sorted(chaves, reverse=True)
+
+
+def test_listar_transacoes_cursor_invalido(client, auth_headers, transacoes):
+    response = client.get("/transacoes?limit=5&cursor=xyz", headers=auth_headers)
+    assert response.status_code == 400
+
+
+def test_listar_transacoes_stream(client, auth_headers, transacoes):
+    response = client.get("/transacoes?stream=1&valor_min=15", headers=auth_headers)
+
+    assert response.status_code == 200
+    corpo = json.loads(response.get_data(as_text=True))
+    assert [t["valor"] for t in corpo] == [21, 20, 19, 18, 17, 16, 15]
+
+
+def test_formato_colunar_igual_ao_de_linhas(client, auth_headers, transacoes):
+    linhas = client.get("/transacoes?data_inicio=2024-01-07", headers=auth_headers).get_json()
+    colunas = client.get("/transacoes?data_inicio=2024-01-07&formato=colunas", headers=auth_headers).get_json()
+
+    assert sorted(colunas) == ["categoria", "data", "descricao", "id", "valor"]
+    assert [dict(zip(colunas, valores)) for valores in zip(*colunas.values())] == linhas
+    assert linhas[0]["data"] == "2024-01-07"
+
+
+def test_formato_colunar_paginado_e_vazio(client, auth_headers, transacoes):
+    pagina = client.get("/transacoes?limit=5&formato=colunas", headers=auth_headers).get_json()
+    seguinte = client.get(
+        f"/transacoes?limit=5&formato=colunas&cursor={pagina['proximo_cursor']}", headers=auth_headers
+    ).get_json()
+    vazia = client.get("/transacoes?categoria=nenhuma&formato=colunas", headers=auth_headers).get_json()
+
+    assert pagina["transacoes"]["data"] == ["2024-01-12", "2024-01-11", "2024-01-10", "2024-01-10", "2024-01-09"]
+    assert seguinte["transacoes"]["data"][0] == "2024-01-08"
+    assert vazia == {"id": [], "data": [], "descricao": [], "valor": [], "categoria": []}
+
+
+@pytest.mark.parametrize("backend", ["fts5", "memoria"])
+def test_busca_por_prefixo_sem_acentos(client, auth_headers, usuario, backend, monkeypatch):
+    monkeypatch.setattr("services.busca_service.BUSCA_BACKEND", backend)
+    processar_csv(usuario, io.StringIO(
+        "data,descricao,valor\n"
+        "2024-01-05,Pão de Açúcar Loja 12,50\n"
+        "2024-01-06,PADARIA PÃO QUENTE,12\n"
+        "2024-01-07,Uber Trip,20\n"
+    ))
+
+    def buscar(termo):
+        response = client.get(f"/transacoes?busca={termo}", headers=auth_headers)
+        return sorted(t["descricao"] for t in response.get_json())
+
+    assert buscar("pao") == ["PADARIA PÃO QUENTE", "Pão de Açúcar Loja 12"]
+    assert buscar("acuc") == ["Pão de Açúcar Loja 12"]
+    assert buscar("pão quen") == ["PADARIA PÃO QUENTE"]
+    assert buscar("trip uber") == ["Uber Trip"]
+    assert buscar("loja 1") == ["Pão de Açúcar Loja 12"]
+
+    client.post("/transacoes", json={"data": "2024-01-08", "descricao": "Padaria Nova", "valor": 8}, headers=auth_headers)
+    assert buscar("padar") == ["PADARIA PÃO QUENTE", "Padaria Nova"]
+
+
+def test_etag_responde_304_sem_consultar_transacoes(client, auth_headers, transacoes, monkeypatch):
+    primeira = client.get("/transacoes?categoria=outros", headers=auth_headers)
+    etag = primeira.headers["ETag"]
+
+    def nao_deveria_consultar(*args, **kwargs):
+        raise AssertionError("consultou transacoes")
+
+    monkeypatch.setattr("routes.transacoes_routes.linhas_transacoes", nao_deveria_consultar)
+    repetida = client.get("/transacoes?categoria=outros", headers={**auth_headers, "If-None-Match": etag})
+
+    assert repetida.status_code == 304
+    assert repetida.headers["ETag"] == etag
+    outra = client.get("/charts/geral", headers={**auth_headers, "If-None-Match": etag})
+    assert outra.status_code == 200
+
+
+@pytest.mark.parametrize("url", ["/transacoes", "/categorias", "/charts/categoria", "/charts/insights"])
+def test_etag_muda_apos_escrita(client, auth_headers, transacoes, url):
+    etag = client.get(url, headers=auth_headers).headers["ETag"]
+
+    criada = client.post("/transacoes", json={"data": "2024-02-01", "descricao": "Uber", "valor": 7},
+                         headers=auth_headers).get_json()["transacao"]
+    depois_criar = client.get(url, headers={**auth_headers, "If-None-Match": etag})
+    assert depois_criar.status_code == 200
+
+    etag = depois_criar.headers["ETag"]
+    client.put(f"/transacoes/{criada['id']}", json={"valor": 8}, headers=auth_headers)
+    depois_editar = client.get(url, headers={**auth_headers, "If-None-Match": etag})
+    assert depois_editar.status_code == 200
+
+    etag = depois_editar.headers["ETag"]
+    client.delete(f"/transacoes/{criada['id']}", headers=auth_headers)
+    assert client.get(url, headers={**auth_headers, "If-None-Match": etag}).status_code == 200
+
+
+def _resumos(usuario):
+    from models import session, ResumoMensal
+    session.expire_all()
+    return sorted(
+        (r.ano, r.mes, r.categoria, round(r.soma, 6), r.quantidade)
+        for r in session.query(ResumoMensal).filter_by(user_id=usuario.id)
+    )
+
+
+@pytest.fixture
+def outro_usuario_headers():
+    from models import session, Usuario
+    from services.auth_service import login
+    user = Usuario(username="outro-lote")
+    user.set_password("123456")
+    session.add(user)
+    session.commit()
+    resposta, _ = login({"username": "outro-lote", "password": "123456"})
+    return {"Authorization": f"Bearer {resposta['token']}"}
+
+
+def test_lote_misto_em_uma_transacao(client, auth_headers, transacoes, outro_usuario_headers):
+    from sqlalchemy import event
+    from models import engine
+    from services.resumo_service import reconstruir
+    from services.versao_service import versao_dados
+
+    ids = [t["id"] for t in client.get("/transacoes", headers=auth_headers).get_json()]
+    id_alheio = client.post("/transacoes", headers=outro_usuario_headers, json={
+        "data": "2024-01-05", "descricao": "Alheia", "valor": 1
+    }).get_json()["transacao"]["id"]
+    versao = versao_dados(transacoes.id)
+
+    operacoes = [{"op": "editar", "id": id_, "categoria": "mercado"} for id_ in ids[:8]]
+    operacoes += [
+        {"op": "editar", "id": ids[8], "data": "2024-02-01", "valor": 99},
+        {"op": "deletar", "id": ids[9]},
+        {"op": "editar", "id": ids[9], "categoria": "x"},
+        {"op": "deletar", "id": id_alheio},
+        {"op": "criar", "data": "2024-03-01", "descricao": "Uber", "valor": 18},
+        {"op": "criar", "data": "01/03/2024", "descricao": "Uber", "valor": 18},
+        {"op": "mover", "id": ids[10]},
+    ]
+    comandos = []
+    def contar(conn, cursor, statement, *args):
+        comandos.append(" ".join(statement.split()[:3]).upper())
+    def contar_commit(conn):
+        comandos.append("COMMIT")
+    event.listen(engine, "before_cursor_execute", contar)
+    event.listen(engine, "commit", contar_commit)
+    try:
+        response = client.post("/transacoes/lote", headers=auth_headers, json={"operacoes": operacoes})
+    finally:
+        event.remove(engine, "before_cursor_execute", contar)
+        event.remove(engine, "commit", contar_commit)
+
+    assert response.status_code == 200
+    corpo = response.get_json()
+    assert [r["status"] for r in corpo["resultados"]] == [200] * 10 + [404, 404, 201, 400, 400]
+    assert (corpo["aplicadas"], corpo["falhas"]) == (11, 4)
+    assert comandos.count("COMMIT") == 1
+    # um UPDATE por valor de campo (categoria, data e valor) e um DELETE, independente de quantas linhas
+    assert sum(c.startswith("UPDATE TRANSACOES") for c in comandos) == 3
+    assert sum(c.startswith("DELETE FROM TRANSACOES") for c in comandos) == 1
+    assert sum(c.startswith("INSERT INTO TRANSACOES") for c in comandos) == 1
+
+    listadas = {t["id"]: t for t in client.get("/transacoes", headers=auth_headers).get_json()}
+    assert all(listadas[id_]["categoria"] == "mercado" for id_ in ids[:8])
+    assert listadas[ids[8]]["data"] == "2024-02-01" and listadas[ids[8]]["valor"] == 99
+    assert ids[9] not in listadas
+    assert listadas[corpo["resultados"][12]["id"]]["descricao"] == "Uber"
+    assert versao_dados(transacoes.id) == versao + 1
+
+    incremental = _resumos(transacoes)
+    reconstruir(transacoes.id)
+    assert _resumos(transacoes) == incremental
+
+
+def test_lote_atomico_nao_grava_com_falhas(client, auth_headers, transacoes):
+    antes = client.get("/transacoes", headers=auth_headers).get_json()
+    response = client.post("/transacoes/lote", headers=auth_headers, json={"atomico": True, "operacoes": [
+        {"op": "editar", "id": antes[0]["id"], "categoria": "mercado"},
+        {"op": "criar", "data": "2024-03-01", "descricao": "Uber", "valor": "abc"},
+    ]})
+
+    assert response.status_code == 400
+    assert [r["status"] for r in response.get_json()["resultados"]] == [409, 400]
+    assert client.get("/transacoes", headers=auth_headers).get_json() == antes
+
+
+def test_lote_invalido(client, auth_headers):
+    assert client.post("/transacoes/lote", headers=auth_headers, json={"operacoes": []}).status_code == 400
+    assert client.post("/transacoes/lote", headers=auth_headers, json={}).status_code == 400
+
+
+def test_lote_com_campos_que_nao_sao_texto(client, auth_headers, transacoes):
+    [primeira, segunda] = client.get("/transacoes?limit=2", headers=auth_headers).get_json()["transacoes"]
+    response = client.post("/transacoes/lote", headers=auth_headers, json={"operacoes": [
+        {"op": "editar", "id": primeira["id"], "descricao": ["lista"]},
+        {"op": "editar", "id": primeira["id"], "categoria": {"nome": "mercado"}},
+        {"op": "editar", "id": segunda["id"], "descricao": "  Padaria  ", "categoria": " mercado "},
+    ]})
+
+    assert response.status_code == 200
+    resultados = response.get_json()["resultados"]
+    assert [r["status"] for r in resultados] == [400, 400, 200]
+    assert resultados[0]["error"] == "Descrição deve ser texto"
+    listadas = {t["id"]: t for t in client.get("/transacoes", headers=auth_headers).get_json()}
+    assert (listadas[segunda["id"]]["descricao"], listadas[segunda["id"]]["categoria"]) == ("Padaria", "mercado")
+
+
+def test_editar_data_grava_date(client, auth_headers, transacoes, monkeypatch):
+    from datetime import date
+    from services import transacoes_service
+    [primeira, *_] = client.get("/transacoes", headers=auth_headers).get_json()
+    tipos = []
+    mes_da_transacao = transacoes_service.mes_da_transacao
+    monkeypatch.setattr(transacoes_service, "mes_da_transacao", lambda t: tipos.append(type(t.data)) or mes_da_transacao(t))
+
+    transacoes_service.editar_transacao(transacoes, primeira["id"], {"data": "2024-02-01"})
+
+    # o mês do resumo é calculado antes do commit, com o valor atribuído pela edição
+    assert tipos == [date, date]
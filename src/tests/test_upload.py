@@ -0,0 +1,269 @@
+import gc
+import io
+import time
+import weakref
+from datetime import date, datetime, timedelta, timezone
+import pytest
+from reportlab.pdfgen import canvas
+from models import session, Transacao
+from services import transacoes_service
+from services.transacoes_service import processar_csv, processar_pdf, gerar_fatura_pdf, cache_parse
+
+
+@pytest.fixture(autouse=True)
+def limpar_cache_parse():
+    cache_parse.limpar()
+    yield
+    cache_parse.limpar()
+
+
+def transacoes_do_usuario(usuario):
+    return session.query(Transacao).filter_by(user_id=usuario.id).order_by(Transacao.id).all()
+
+
+def test_processar_csv_insere_e_categoriza(usuario):
+    csv = io.StringIO(
+        "data,descricao,valor,categoria\n"
+        "2024-01-05,Netflix,39.90,\n"
+        "2024-01-06,Compra X,10,Saúde\n"
+        "2024-01-07,ifood,,\n"
+    )
+    processar_csv(usuario, csv, chunksize=2)
+
+    transacoes = transacoes_do_usuario(usuario)
+    assert [(t.data.isoformat(), t.descricao, t.valor, t.categoria) for t in transacoes] == [
+        ("2024-01-05", "Netflix", 39.9, "assinaturas"),
+        ("2024-01-06", "Compra X", 10.0, "saude"),
+        ("2024-01-07", "ifood", None, "delivery"),
+    ]
+
+
+def test_processar_csv_tudo_ou_nada(usuario):
+    csv = io.StringIO(
+        "data,descricao,valor\n"
+        "2024-01-05,Netflix,39.90\n"
+        "05/01/2024,Uber,12\n"
+        "2024-01-07,Uber,abc\n"
+        "2024-01-08,Uber,5\n"
+    )
+    with pytest.raises(ValueError) as exc:
+        processar_csv(usuario, csv, chunksize=2)
+
+    erros = exc.value.args[0]
+    assert erros == [
+        "Linha 2: time data '05/01/2024' does not match format '%Y-%m-%d'",
+        "Linha 3: could not convert string to float: 'abc'",
+    ]
+    assert transacoes_do_usuario(usuario) == []
+
+
+def test_processar_csv_colunas_faltando(usuario):
+    with pytest.raises(ValueError, match="Colunas obrigatórias faltando: valor"):
+        processar_csv(usuario, io.StringIO("data,descricao\n2024-01-05,Netflix\n"))
+
+
+@pytest.mark.parametrize("backend,workers", [
+    ("pdfplumber", 0),
+    ("pypdfium2", 0),
+    ("pdfplumber", 2),
+])
+def test_processar_pdf_backends(usuario, backend, workers, monkeypatch):
+    monkeypatch.setattr("utils.extracao_pdf.PDF_PAGINAS_POR_TAREFA", 1)
+    pdf = gerar_fatura_pdf(qtd_itens=120)
+
+    resp = processar_pdf(usuario, pdf, backend=backend, workers=workers)
+
+    assert resp["transacoes_processadas"] == 120
+    assert len(transacoes_do_usuario(usuario)) == 120
+
+
+def test_processar_pdf_tudo_ou_nada(usuario):
+    pdf = io.BytesIO()
+    p = canvas.Canvas(pdf)
+    p.drawString(50, 800, "2024-01-05 | Netflix | 39.90 | -")
+    p.drawString(50, 785, "05/01/2024 | Uber | 12 | -")
+    p.save()
+    pdf.seek(0)
+
+    with pytest.raises(ValueError) as exc:
+        processar_pdf(usuario, pdf)
+
+    assert exc.value.args[0] == ["Linha 2: Data inválida, use YYYY-MM-DD"]
+    assert transacoes_do_usuario(usuario) == []
+
+
+
+def test_reenvio_do_mesmo_csv_nao_duplica(usuario, monkeypatch):
+    conteudo = (
+        "data,descricao,valor\n"
+        "2024-01-05,Netflix,39.90\n"
+        "2024-01-06,Uber,12\n"
+        "2024-01-06,Uber,12\n"
+    )
+    primeiro = processar_csv(usuario, io.StringIO(conteudo))
+
+    chamadas = []
+    monkeypatch.setattr(transacoes_service, "_lotes_csv", lambda *a, **k: chamadas.append(a) or iter(()))
+    segundo = processar_csv(usuario, io.StringIO(conteudo))
+
+    assert (primeiro["inseridas"], primeiro["ignoradas"]) == (3, 0)
+    assert (segundo["inseridas"], segundo["ignoradas"]) == (0, 3)
+    assert chamadas == []
+    assert len(transacoes_do_usuario(usuario)) == 3
+
+
+def test_csv_acima_do_limite_do_cache_nao_fica_em_memoria(usuario, monkeypatch):
+    class Lote(list):
+        pass
+
+    lotes = []
+
+    def lotes_csv(file, chunksize):
+        for i in range(5):
+            lote = Lote([{"data": date(2024, 1, i + 1), "descricao": f"Compra {i}", "valor": 10.0, "categoria": "outros"}])
+            lotes.append(weakref.ref(lote))
+            yield lote, [], 1
+
+    vivos = []
+
+    def progresso(lidas):
+        gc.collect()
+        vivos.append(sum(1 for ref in lotes if ref() is not None))
+
+    monkeypatch.setattr(cache_parse, "max_linhas", 2)
+    monkeypatch.setattr(transacoes_service, "_lotes_csv", lotes_csv)
+    processar_csv(usuario, io.StringIO("data,descricao,valor\n"), progresso=progresso)
+
+    # até o limite os lotes ficam para o cache; depois, só o lote corrente
+    assert vivos == [1, 2, 1, 1, 1]
+    assert cache_parse.total_linhas == 0
+
+
+def test_csv_sobreposto_insere_so_linhas_novas(usuario):
+    processar_csv(usuario, io.StringIO(
+        "data,descricao,valor\n"
+        "2024-01-05,Netflix,39.90\n"
+        "2024-01-06,Uber,12\n"
+    ))
+    resp = processar_csv(usuario, io.StringIO(
+        "data,descricao,valor\n"
+        "2024-01-06,Uber,12\n"
+        "2024-01-06,Uber,12\n"
+        "2024-01-07,Padaria,8.5\n"
+    ), chunksize=1)
+
+    assert (resp["inseridas"], resp["ignoradas"]) == (2, 1)
+    assert [(t.data.isoformat(), t.descricao) for t in transacoes_do_usuario(usuario)] == [
+        ("2024-01-05", "Netflix"),
+        ("2024-01-06", "Uber"),
+        ("2024-01-06", "Uber"),
+        ("2024-01-07", "Padaria"),
+    ]
+
+
+def test_deduplicacao_desligada(usuario):
+    conteudo = "data,descricao,valor\n2024-01-05,Netflix,39.90\n"
+    processar_csv(usuario, io.StringIO(conteudo))
+    resp = processar_csv(usuario, io.StringIO(conteudo), deduplicar=False)
+
+    assert resp["inseridas"] == 1
+    assert len(transacoes_do_usuario(usuario)) == 2
+
+
+def aguardar_job(client, auth_headers, location, timeout=10):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        job = client.get(location, headers=auth_headers).get_json()
+        if job["status"] in ("concluido", "erro"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"job não terminou: {job}")
+
+
+def test_upload_csv_em_background(client, auth_headers, usuario):
+    csv = b"data,descricao,valor\n2024-01-05,Netflix,39.90\n2024-01-06,Uber,12\n"
+
+    response = client.post("/upload", data={"file": (io.BytesIO(csv), "fatura.csv")}, headers=auth_headers)
+
+    assert response.status_code == 202
+    assert response.get_json()["status"] == "pendente"
+    job = aguardar_job(client, auth_headers, response.headers["Location"])
+    assert job["status"] == "concluido"
+    assert job["linhas_processadas"] == 2
+    assert len(transacoes_do_usuario(usuario)) == 2
+
+
+def test_upload_pdf_em_background_com_erros(client, auth_headers, usuario):
+    pdf = io.BytesIO()
+    p = canvas.Canvas(pdf)
+    p.drawString(50, 800, "05/01/2024 | Uber | 12 | -")
+    p.save()
+
+    response = client.post("/upload/pdf", data={"file": (io.BytesIO(pdf.getvalue()), "fatura.pdf")}, headers=auth_headers)
+
+    job = aguardar_job(client, auth_headers, response.headers["Location"])
+    assert job["status"] == "erro"
+    assert job["erros"] == ["Linha 1: Data inválida, use YYYY-MM-DD"]
+    assert transacoes_do_usuario(usuario) == []
+
+
+def test_upload_sincrono(client, auth_headers, usuario):
+    csv = b"data,descricao,valor\n2024-01-05,Netflix,39.90\n"
+
+    response = client.post("/upload?sincrono=1", data={"file": (io.BytesIO(csv), "fatura.csv")}, headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.get_json()["transacoes_processadas"] == 1
+
+
+def test_job_de_outro_usuario_nao_aparece(client, auth_headers):
+    assert client.get("/upload/jobs/inexistente", headers=auth_headers).status_code == 404
+
+
+def test_job_abandonado_expira(client, auth_headers, usuario, monkeypatch, tmp_path):
+    from models import UploadJob
+    from services import jobs_service
+    monkeypatch.setattr(jobs_service, "UPLOAD_DIR", str(tmp_path))
+    antigo = datetime.now(timezone.utc) - timedelta(seconds=jobs_service.UPLOAD_JOB_TIMEOUT + 60)
+    recente = datetime.now(timezone.utc)
+    for job_id, status, atualizado_em in (("abandonado", "processando", antigo), ("na-fila", "pendente", antigo),
+                                          ("em-outro-worker", "processando", recente)):
+        session.add(UploadJob(id=f"{job_id}-{usuario.id}", user_id=usuario.id, tipo="csv", status=status,
+                              linhas_processadas=0, criado_em=antigo, atualizado_em=atualizado_em))
+        (tmp_path / f"{job_id}-{usuario.id}.csv").write_text("data,descricao,valor\n")
+    session.commit()
+
+    job = client.get(f"/upload/jobs/abandonado-{usuario.id}", headers=auth_headers).get_json()
+    assert job["status"] == "erro"
+    assert job["erros"] == ["Processamento interrompido; envie o arquivo novamente"]
+
+    # na inicialização da fila do processo, os demais abandonados também expiram
+    assert jobs_service.expirar_jobs() == [f"na-fila-{usuario.id}"]
+    assert [p.name for p in tmp_path.iterdir()] == [f"em-outro-worker-{usuario.id}.csv"]
+    job = client.get(f"/upload/jobs/em-outro-worker-{usuario.id}", headers=auth_headers).get_json()
+    assert job["status"] == "processando"
+
+
+def test_progresso_gravado_serve_de_heartbeat(client, auth_headers, usuario):
+    from models import UploadJob
+    from services import jobs_service
+    antigo = datetime.now(timezone.utc) - timedelta(seconds=jobs_service.UPLOAD_JOB_TIMEOUT + 60)
+    job_id = f"rodando-{usuario.id}"
+    session.add(UploadJob(id=job_id, user_id=usuario.id, tipo="csv", status="processando",
+                          linhas_processadas=0, criado_em=antigo, atualizado_em=antigo))
+    session.commit()
+
+    # o worker que processa o job registra o progresso; o intervalo limita as gravações
+    jobs_service._ativos[job_id] = (usuario.id, {"id": job_id})
+    try:
+        jobs_service._registrar_progresso(job_id, 500)
+        jobs_service._registrar_progresso(job_id, 900)
+    finally:
+        jobs_service._ativos.pop(job_id)
+        jobs_service._progresso_gravado_em.pop(job_id)
+
+    # consulta que cai em outro worker: vê o progresso e não expira o job
+    session.expire_all()
+    job = client.get(f"/upload/jobs/{job_id}", headers=auth_headers).get_json()
+    assert (job["status"], job["linhas_processadas"]) == ("processando", 500)
+    assert jobs_service.expirar_jobs(job_id) == []
@@ -1,4 +1,5 @@
 import re
+from functools import lru_cache
 
 CATEGORIAS_KEYWORDS = {
     "padaria": ["padaria"],
@@ -23,17 +24,45 @@ CATEGORIAS_KEYWORDS = {
 
 }
 
+def _compilar_padrao(categorias_keywords):
+    grupos = []
+    iniciais = set()
+    for palavras in categorias_keywords.values():
+        grupos.append("(" + "|".join(re.escape(p.lower()) for p in palavras) + ")")
+        iniciais.update(re.escape(p.lower()[0]) for p in palavras if p)
+    # Um grupo por categoria, na ordem do dicionário: em cada posição a primeira
+    # categoria que casar vence. O lookahead permite matches sobrepostos e a
+    # classe de iniciais descarta rápido as posições que não podem casar.
+    return re.compile(rf"(?=[{''.join(sorted(iniciais))}])\b(?=(?:{'|'.join(grupos)})\b)")
+
+
+_PADRAO = _compilar_padrao(CATEGORIAS_KEYWORDS)
+_CATEGORIAS = list(CATEGORIAS_KEYWORDS.keys())
+
+
+@lru_cache(maxsize=16384)
+def _categorizar_texto(desc_lower: str) -> str:
+    melhor = None
+    for match in _PADRAO.finditer(desc_lower):
+        indice = match.lastindex - 1
+        if melhor is None or indice < melhor:
+            melhor = indice
+            if melhor == 0:
+                break
+    return _CATEGORIAS[melhor] if melhor is not None else "outros"
+
+
 def categorizar(descricao: str) -> str:
     if not descricao:
         return "outros"
-    
-    desc_lower = descricao.lower()
-    for categoria, palavras in CATEGORIAS_KEYWORDS.items():
-        for palavra in palavras:
-            palavra_encontrada = re.search(
-                rf"\b{re.escape(palavra.lower())}\b", desc_lower
-            )
-            if palavra_encontrada:
-                return categoria
-        
-    return "outros"
+    return _categorizar_texto(descricao.lower())
+
+
+def categorizar_lote(descricoes) -> list:
+    resultados = {}
+    categorias = []
+    for descricao in descricoes:
+        if descricao not in resultados:
+            resultados[descricao] = categorizar(descricao)
+        categorias.append(resultados[descricao])
+    return categorias
@@ -1,12 +1,117 @@
 import os
+import time
+import threading
 import jwt
+import hashlib
+from collections import OrderedDict, namedtuple
 from functools import wraps
-from flask import request, jsonify
+from flask import request, jsonify, make_response
+from sqlalchemy import event, select
 from models import session, Usuario
+from services.versao_service import versao_dados
 from dotenv import load_dotenv
 
 load_dotenv()
 SECRET_KEY = os.environ.get("SECRET_KEY")
+TOKEN_CACHE_TTL = float(os.environ.get("TOKEN_CACHE_TTL", 300))
+TOKEN_CACHE_MAX = int(os.environ.get("TOKEN_CACHE_MAX", 10000))
+
+# Identidade do usuário autenticado; imutável e desacoplada da sessão do banco
+Principal = namedtuple("Principal", ["id", "username"])
+
+
+class CachePrincipais:
+    """LRU com TTL de tokens já verificados, invalidável por usuário"""
+
+    def __init__(self, ttl=TOKEN_CACHE_TTL, tamanho_maximo=TOKEN_CACHE_MAX):
+        self.ttl = ttl
+        self.tamanho_maximo = tamanho_maximo
+        self._itens = OrderedDict()
+        self._tokens_por_usuario = {}
+        self._lock = threading.Lock()
+
+    def obter(self, token):
+        with self._lock:
+            item = self._itens.get(token)
+            if item is None:
+                return None
+            principal, expira_em = item
+            if expira_em <= time.time():
+                self._remover(token)
+                return None
+            self._itens.move_to_end(token)
+            return principal
+
+    def guardar(self, token, principal, exp=None):
+        expira_em = time.time() + self.ttl
+        if exp is not None:
+            expira_em = min(expira_em, exp)
+        with self._lock:
+            self._itens[token] = (principal, expira_em)
+            self._itens.move_to_end(token)
+            self._tokens_por_usuario.setdefault(principal.id, set()).add(token)
+            while len(self._itens) > self.tamanho_maximo:
+                self._remover(next(iter(self._itens)))
+
+    def invalidar_usuario(self, user_id):
+        with self._lock:
+            for token in list(self._tokens_por_usuario.get(user_id, ())):
+                self._remover(token)
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+            self._tokens_por_usuario.clear()
+
+    def _remover(self, token):
+        principal, _ = self._itens.pop(token)
+        tokens = self._tokens_por_usuario.get(principal.id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_por_usuario[principal.id]
+
+
+principais = CachePrincipais()
+
+
+@event.listens_for(Usuario, "after_update")
+@event.listens_for(Usuario, "after_delete")
+def _invalidar_principal(mapper, connection, usuario):
+    principais.invalidar_usuario(usuario.id)
+
+
+def _consulta_usuario(user_id):
+    return select(Usuario.id, Usuario.username).where(Usuario.id == user_id)
+
+
+def autenticar(token):
+    current_user = principais.obter(token)
+    if current_user is not None:
+        return current_user
+
+    data = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+    usuario = session.execute(_consulta_usuario(data['user_id'])).first()
+    if not usuario:
+        return None
+    current_user = Principal(usuario.id, usuario.username)
+    principais.guardar(token, current_user, data.get('exp'))
+    return current_user
+
+
+async def autenticar_async(conexao, token):
+    """`autenticar` para o modo ASGI; compartilha o cache de tokens verificados"""
+    current_user = principais.obter(token)
+    if current_user is not None:
+        return current_user
+
+    data = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+    usuario = (await conexao.execute(_consulta_usuario(data['user_id']))).first()
+    if not usuario:
+        return None
+    current_user = Principal(usuario.id, usuario.username)
+    principais.guardar(token, current_user, data.get('exp'))
+    return current_user
 
 
 def token_required(f):
@@ -21,8 +126,7 @@ def token_required(f):
             return jsonify({"error": "Token ausente"}), 401
 
         try:
-            data = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-            current_user = session.query(Usuario).filter_by(id=data['user_id']).first()
+            current_user = autenticar(token)
             if not current_user:
                 return jsonify({"error": "Usuário inválido"}), 401
         except Exception:
@@ -31,3 +135,38 @@ def token_required(f):
         return f(current_user, *args, **kwargs)
 
     return decorated
+
+
+def calcular_etag(user_id, versao, caminho, argumentos):
+    """ETag de uma leitura: usuário, versão dos dados, rota e argumentos em ordem"""
+    chave = f"{user_id}:{versao}:{caminho}:{sorted(argumentos)}"
+    return hashlib.sha1(chave.encode("utf-8")).hexdigest()
+
+
+def etag_da_requisicao(current_user):
+    return calcular_etag(
+        current_user.id, versao_dados(current_user.id), request.path, request.args.items(multi=True)
+    )
+
+
+def etag_por_versao(f):
+    """Responde 304 quando a versão dos dados do usuário não mudou desde o último ETag.
+
+    Usar abaixo de `token_required`: o ETag depende só da versão e dos argumentos,
+    então a consulta às transações não roda quando o cliente já tem a resposta.
+    """
+    @wraps(f)
+    def decorated(current_user, *args, **kwargs):
+        etag = etag_da_requisicao(current_user)
+        if etag in request.if_none_match:
+            response = make_response("", 304)
+        else:
+            response = make_response(f(current_user, *args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.vary.add('Authorization')
+        return response
+
+    return decorated
@@ -0,0 +1,105 @@
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+PDF_BACKEND = os.environ.get("PDF_BACKEND", "pdfplumber")
+PDF_WORKERS = int(os.environ.get("PDF_WORKERS", 0))
+PDF_PAGINAS_POR_TAREFA = int(os.environ.get("PDF_PAGINAS_POR_TAREFA", 16))
+
+
+def _textos_pdfplumber(origem, inicio=0, fim=None):
+    import pdfplumber
+    with pdfplumber.open(origem) as pdf:
+        for page in pdf.pages[inicio:fim]:
+            yield page.extract_text() or ""
+            page.close()
+
+
+def _textos_pypdfium2(origem, inicio=0, fim=None):
+    import pypdfium2 as pdfium
+    if hasattr(origem, "read"):
+        origem = origem.read()
+    pdf = pdfium.PdfDocument(origem)
+    try:
+        for indice in range(inicio, len(pdf) if fim is None else min(fim, len(pdf))):
+            page = pdf[indice]
+            textpage = page.get_textpage()
+            yield textpage.get_text_bounded()
+            textpage.close()
+            page.close()
+    finally:
+        pdf.close()
+
+
+BACKENDS = {
+    "pdfplumber": _textos_pdfplumber,
+    "pypdfium2": _textos_pypdfium2,
+}
+
+
+def _contar_paginas(caminho, backend):
+    if backend == "pypdfium2":
+        import pypdfium2 as pdfium
+        pdf = pdfium.PdfDocument(caminho)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+    import pdfplumber
+    with pdfplumber.open(caminho) as pdf:
+        return len(pdf.pages)
+
+
+def _extrair_intervalo(caminho, backend, inicio, fim):
+    return list(BACKENDS[backend](caminho, inicio, fim))
+
+
+def _textos_paralelo(file, backend, workers):
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as tmp:
+        tmp.write(file.read())
+        tmp.flush()
+        total = _contar_paginas(tmp.name, backend)
+        intervalos = [
+            (inicio, min(inicio + PDF_PAGINAS_POR_TAREFA, total))
+            for inicio in range(0, total, PDF_PAGINAS_POR_TAREFA)
+        ]
+        if len(intervalos) <= 1:
+            yield from BACKENDS[backend](tmp.name)
+            return
+        with ProcessPoolExecutor(max_workers=min(workers, len(intervalos))) as executor:
+            futuros = [
+                executor.submit(_extrair_intervalo, tmp.name, backend, inicio, fim)
+                for inicio, fim in intervalos
+            ]
+            for futuro in futuros:
+                yield from futuro.result()
+
+
+def textos_paginas(file, backend=None, workers=None):
+    backend = backend or PDF_BACKEND
+    workers = PDF_WORKERS if workers is None else workers
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend de PDF desconhecido: {backend}")
+    if workers > 1:
+        yield from _textos_paralelo(file, backend, workers)
+    else:
+        yield from BACKENDS[backend](file)
+
+
+def parse_linha(linha):
+    if "Fatura de Cartão" in linha or linha.strip() == "":
+        return None
+    parts = [p.strip() for p in linha.split("|")]
+    if len(parts) < 3:
+        return None
+    data, descricao, valor_str = parts[0], parts[1], parts[2].strip() if parts[2].strip() != '-' else "0.0"
+    categoria = parts[3] if len(parts) > 3 and parts[3] != '-' else None
+    return {"data": data, "descricao": descricao, "valor": valor_str, "categoria": categoria}
+
+
+def linhas_pdf(file, backend=None, workers=None):
+    for texto in textos_paginas(file, backend, workers):
+        for linha in texto.splitlines():
+            transacao = parse_linha(linha)
+            if transacao:
+                yield transacao
@@ -1,15 +1,34 @@
 import random
-from datetime import datetime, timedelta
+from datetime import datetime, date, timedelta
 
 from utils.categorias import CATEGORIAS_KEYWORDS
 
-def gerar_transacoes_fake(qtd=20):
+
+def _transacao_fake(rng, data, todas_categorias):
+    categoria = rng.choice(todas_categorias + [None])
+
+    if categoria:
+        descricao = rng.choice(CATEGORIAS_KEYWORDS[categoria])
+    else:
+        descricao = f"Item {rng.randint(1, 100)}"
+
+    valor = round(rng.uniform(5, 500), 2) if rng.random() > 0.1 else None
+    return {
+        "data": data,
+        "descricao": descricao,
+        "valor": valor,
+        "categoria": categoria
+    }
+
+
+def gerar_transacoes_fake(qtd=20, seed=None):
+    rng = random.Random(seed) if seed is not None else random
     transacoes = []
 
     hoje = datetime.today()
     todas_categorias = list(CATEGORIAS_KEYWORDS.keys())
-    ano = hoje.year - random.randint(0, 2)
-    mes = random.randint(1, 12)
+    ano = hoje.year - rng.randint(0, 2)
+    mes = rng.randint(1, 12)
 
     if mes == 12:
         ultimo_dia = datetime(ano + 1, 1, 1) - timedelta(days=1)
@@ -17,22 +36,26 @@ def gerar_transacoes_fake(qtd=20):
         ultimo_dia = datetime(ano, mes + 1, 1) - timedelta(days=1)
 
     for _ in range(qtd):
-        dia = random.randint(1, ultimo_dia.day)
+        dia = rng.randint(1, ultimo_dia.day)
         data = datetime(ano, mes, dia).strftime('%Y-%m-%d')
+        transacoes.append(_transacao_fake(rng, data, todas_categorias))
 
-        categoria = random.choice(todas_categorias + [None])
+    return transacoes
 
-        if categoria:
-            descricao = random.choice(CATEGORIAS_KEYWORDS[categoria])
-        else:
-            descricao = f"Item {random.randint(1, 100)}"
 
-        valor = round(random.uniform(5, 500), 2) if random.random() > 0.1 else None
-        transacoes.append({
-            "data": data,
-            "descricao": descricao,
-            "valor": valor,
-            "categoria": categoria
-        })
+def gerar_historico_fake(qtd, usuarios=1, anos=3, seed=42, ano_final=2024):
+    """Transações determinísticas espalhadas por vários anos e usuários.
 
-    return transacoes
+    Gera dicts como `gerar_transacoes_fake`, mais a chave `usuario` (0 a
+    usuarios-1), para montar bases grandes e reprodutíveis nos benchmarks.
+    """
+    rng = random.Random(seed)
+    todas_categorias = list(CATEGORIAS_KEYWORDS.keys())
+    inicio = date(ano_final - anos + 1, 1, 1)
+    dias = (date(ano_final, 12, 31) - inicio).days + 1
+
+    for _ in range(qtd):
+        data = (inicio + timedelta(days=rng.randrange(dias))).isoformat()
+        transacao = _transacao_fake(rng, data, todas_categorias)
+        transacao["usuario"] = rng.randrange(usuarios)
+        yield transacao
@@ -0,0 +1,237 @@
+import os
+import time
+import logging
+import threading
+from flask import current_app, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+from models import Base, explicar_sql
+
+SQL_LENTA_MS = float(os.environ.get("SQL_LENTA_MS", 200))
+SERVER_TIMING = os.environ.get("SERVER_TIMING", "0").lower() in ("1", "true")
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+logger_sql_lenta = logging.getLogger("sql_lenta")
+
+
+class Medicao:
+    """O que uma requisição gastou em SQL, hidratação do ORM e JSON"""
+
+    __slots__ = (
+        "inicio", "consultas", "tempo_sql", "linhas_afetadas", "linhas_hidratadas", "tempo_json",
+        "rota", "metodo", "status", "explicando"
+    )
+
+    def __init__(self, rota, metodo):
+        self.inicio = time.perf_counter()
+        self.rota = rota
+        self.metodo = metodo
+        self.consultas = 0
+        self.tempo_sql = 0.0
+        self.linhas_afetadas = 0
+        self.linhas_hidratadas = 0
+        self.tempo_json = 0.0
+        self.status = 500
+        self.explicando = False
+
+
+def medicao_atual():
+    # fica no environ da requisição, que stream_with_context mantém enquanto o corpo é gerado;
+    # threads de jobs não têm requisição e não são medidas
+    return request.environ.get("invoice.medicao") if has_request_context() else None
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _rotulos(rotulos):
+    if not rotulos:
+        return ""
+    return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in rotulos) + "}"
+
+
+class Contador:
+    def __init__(self, nome, ajuda):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.valores = {}
+        self._lock = threading.Lock()
+
+    def somar(self, valor=1, **rotulos):
+        chave = tuple(sorted(rotulos.items()))
+        with self._lock:
+            self.valores[chave] = self.valores.get(chave, 0) + valor
+
+    def exportar(self):
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} counter"]
+        with self._lock:
+            for chave, valor in sorted(self.valores.items()):
+                linhas.append(f"{self.nome}{_rotulos(chave)} {valor}")
+        return linhas
+
+
+class Histograma:
+    def __init__(self, nome, ajuda, buckets=BUCKETS_SEGUNDOS):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.buckets = buckets
+        self.series = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valor, **rotulos):
+        chave = tuple(sorted(rotulos.items()))
+        with self._lock:
+            contagens, soma, total = self.series.get(chave) or ([0] * len(self.buckets), 0.0, 0)
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    contagens[i] += 1
+            self.series[chave] = (contagens, soma + valor, total + 1)
+
+    def exportar(self):
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} histogram"]
+        with self._lock:
+            for chave, (contagens, soma, total) in sorted(self.series.items()):
+                for limite, contagem in zip(self.buckets, contagens):
+                    linhas.append(f"{self.nome}_bucket{_rotulos(chave + (('le', limite),))} {contagem}")
+                linhas.append(f"{self.nome}_bucket{_rotulos(chave + (('le', '+Inf'),))} {total}")
+                linhas.append(f"{self.nome}_sum{_rotulos(chave)} {soma}")
+                linhas.append(f"{self.nome}_count{_rotulos(chave)} {total}")
+        return linhas
+
+
+latencia = Histograma("invoice_requisicao_segundos", "Latência das requisições por rota")
+sql_por_requisicao = Histograma(
+    "invoice_sql_consultas_por_requisicao", "Consultas SQL por requisição",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 1000)
+)
+sql_segundos = Contador("invoice_sql_segundos_total", "Tempo gasto em SQL por rota")
+sql_consultas = Contador("invoice_sql_consultas_total", "Consultas SQL executadas por rota")
+linhas_hidratadas = Contador("invoice_linhas_hidratadas_total", "Objetos do ORM carregados por rota")
+linhas_afetadas = Contador("invoice_linhas_afetadas_total", "Linhas afetadas por INSERT/UPDATE/DELETE por rota")
+json_segundos = Contador("invoice_json_segundos_total", "Tempo gasto serializando JSON por rota")
+consultas_lentas = Contador("invoice_sql_lentas_total", "Consultas acima de SQL_LENTA_MS")
+
+METRICAS = [latencia, sql_por_requisicao, sql_segundos, sql_consultas, linhas_hidratadas, linhas_afetadas, json_segundos, consultas_lentas]
+
+
+def exportar_prometheus(extras=()):
+    """Todas as métricas no formato texto do Prometheus; `extras` são pares (nome, valor) de gauges"""
+    linhas = []
+    for metrica in METRICAS:
+        linhas.extend(metrica.exportar())
+    for nome, valor in extras:
+        linhas.append(f"# TYPE {nome} gauge")
+        linhas.append(f"{nome} {valor}")
+    return "\n".join(linhas) + "\n"
+
+
+def _antes_de_executar(conn, cursor, statement, parameters, context, executemany):
+    conn.info["inicio_consulta"] = time.perf_counter()
+
+
+def _depois_de_executar(conn, cursor, statement, parameters, context, executemany):
+    duracao = time.perf_counter() - conn.info.pop("inicio_consulta", time.perf_counter())
+    medicao = medicao_atual()
+    if medicao is None or medicao.explicando:
+        return
+
+    medicao.consultas += 1
+    medicao.tempo_sql += duracao
+    if cursor.description is None and cursor.rowcount > 0:
+        medicao.linhas_afetadas += cursor.rowcount
+
+    if duracao * 1000 >= SQL_LENTA_MS:
+        consultas_lentas.somar()
+        _registrar_consulta_lenta(conn, statement, parameters, duracao, executemany, medicao)
+
+
+def _registrar_consulta_lenta(conn, statement, parameters, duracao, executemany, medicao):
+    plano = []
+    if not executemany and statement.lstrip().upper().startswith(("SELECT", "WITH")):
+        medicao.explicando = True
+        try:
+            plano = explicar_sql(conn, statement, parameters)
+        except Exception as e:
+            plano = [f"EXPLAIN falhou: {e}"]
+        finally:
+            medicao.explicando = False
+    logger_sql_lenta.warning(
+        "consulta lenta (%.1f ms) em %s\n%s\nplano:\n  %s",
+        duracao * 1000, getattr(request, "path", "-"), statement, "\n  ".join(plano)
+    )
+
+
+def _ao_carregar(instancia, contexto):
+    medicao = medicao_atual()
+    if medicao is not None:
+        medicao.linhas_hidratadas += 1
+
+
+class JSONMedido(DefaultJSONProvider):
+    """Provider de JSON que soma o tempo de serialização na medição da requisição"""
+
+    def dumps(self, obj, **kwargs):
+        medicao = medicao_atual()
+        if medicao is None:
+            return super().dumps(obj, **kwargs)
+        inicio = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            medicao.tempo_json += time.perf_counter() - inicio
+
+
+def instrumentar(app, engine, server_timing=SERVER_TIMING):
+    """Liga a medição por requisição: latência, SQL via eventos do engine, ORM e JSON"""
+    if not event.contains(engine, "before_cursor_execute", _antes_de_executar):
+        event.listen(engine, "before_cursor_execute", _antes_de_executar)
+        event.listen(engine, "after_cursor_execute", _depois_de_executar)
+        event.listen(Base, "load", _ao_carregar, propagate=True)
+    app.json_provider_class = JSONMedido
+    app.json = JSONMedido(app)
+    app.config.setdefault("SERVER_TIMING", server_timing)
+
+    @app.before_request
+    def iniciar_medicao():
+        rota = request.url_rule.rule if request.url_rule else "desconhecida"
+        request.environ["invoice.medicao"] = Medicao(rota, request.method)
+
+    @app.after_request
+    def cabecalho_server_timing(response):
+        medicao = medicao_atual()
+        if medicao is None:
+            return response
+        medicao.status = response.status_code
+        if current_app.config["SERVER_TIMING"]:
+            total = time.perf_counter() - medicao.inicio
+            response.headers["Server-Timing"] = ", ".join([
+                f'sql;dur={medicao.tempo_sql * 1000:.2f};desc="{medicao.consultas} consultas"',
+                f"json;dur={medicao.tempo_json * 1000:.2f}",
+                f"app;dur={total * 1000:.2f}",
+            ])
+        if response.is_streamed:
+            # o corpo ainda vai ser gerado: registra quando o servidor fechar a resposta
+            request.environ["invoice.medicao_no_fechamento"] = True
+            response.call_on_close(lambda: _registrar(medicao))
+        return response
+
+    @app.teardown_request
+    def registrar_medicao(exc=None):
+        medicao = medicao_atual()
+        if medicao is None or request.environ.get("invoice.medicao_no_fechamento"):
+            return
+        if exc is not None:
+            medicao.status = 500
+        _registrar(medicao)
+
+
+def _registrar(medicao):
+    rota = medicao.rota
+    latencia.observar(time.perf_counter() - medicao.inicio, rota=rota, metodo=medicao.metodo, status=medicao.status)
+    sql_por_requisicao.observar(medicao.consultas, rota=rota)
+    sql_consultas.somar(medicao.consultas, rota=rota)
+    sql_segundos.somar(medicao.tempo_sql, rota=rota)
+    linhas_hidratadas.somar(medicao.linhas_hidratadas, rota=rota)
+    linhas_afetadas.somar(medicao.linhas_afetadas, rota=rota)
+    json_segundos.somar(medicao.tempo_json, rota=rota)
@@ -0,0 +1,108 @@
+"""Escrita de PDF de texto simples em fluxo, página a página.
+
+O reportlab mantém o documento inteiro em memória até o `save()`. Aqui cada
+página é emitida assim que fica pronta; só os offsets dos objetos ficam
+guardados para a tabela xref no final.
+"""
+
+LARGURA, ALTURA = 612, 792  # letter, como gerar_fatura_pdf
+MARGEM_X, TOPO, BASE = 50, 742, 50
+ENTRELINHA = 15
+TAMANHO_FONTE = 10
+
+
+def _texto_pdf(texto):
+    codificado = texto.encode("cp1252", errors="replace")
+    return codificado.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+class EscritorPDF:
+    # objetos 1 a 3 são reservados: catálogo, árvore de páginas e fonte
+    CATALOGO, PAGINAS, FONTE = 1, 2, 3
+
+    def __init__(self):
+        self.offsets = {}
+        self.posicao = 0
+        self.proximo_objeto = 4
+        self.paginas = []
+
+    def _emitir(self, dados):
+        self.posicao += len(dados)
+        return dados
+
+    def _objeto(self, numero, corpo):
+        self.offsets[numero] = self.posicao
+        return self._emitir(b"%d 0 obj\n" % numero + corpo + b"\nendobj\n")
+
+    def _novo_objeto(self):
+        numero = self.proximo_objeto
+        self.proximo_objeto += 1
+        return numero
+
+    def inicio(self):
+        return self._emitir(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n") + self._objeto(
+            self.FONTE,
+            b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"
+        )
+
+    def pagina(self, linhas, titulo=None):
+        comandos = [b"BT"]
+        y = TOPO
+        if titulo:
+            comandos.append(b"/F1 16 Tf 1 0 0 1 200 %d Tm (%s) Tj" % (y, _texto_pdf(titulo)))
+            y -= 2 * ENTRELINHA + 20
+        comandos.append(b"/F1 %d Tf" % TAMANHO_FONTE)
+        for linha in linhas:
+            comandos.append(b"1 0 0 1 %d %d Tm (%s) Tj" % (MARGEM_X, y, _texto_pdf(linha)))
+            y -= ENTRELINHA
+        comandos.append(b"ET")
+        conteudo = b"\n".join(comandos)
+
+        numero_conteudo = self._novo_objeto()
+        numero_pagina = self._novo_objeto()
+        self.paginas.append(numero_pagina)
+        return self._objeto(
+            numero_conteudo, b"<< /Length %d >>\nstream\n" % len(conteudo) + conteudo + b"\nendstream"
+        ) + self._objeto(
+            numero_pagina,
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 %d 0 R >> >> >>"
+            % (self.PAGINAS, LARGURA, ALTURA, numero_conteudo, self.FONTE)
+        )
+
+    def fim(self):
+        if not self.paginas:
+            pagina = self.pagina([])
+        else:
+            pagina = b""
+        kids = b" ".join(b"%d 0 R" % p for p in self.paginas)
+        corpo = pagina + self._objeto(
+            self.PAGINAS, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self.paginas))
+        ) + self._objeto(self.CATALOGO, b"<< /Type /Catalog /Pages %d 0 R >>" % self.PAGINAS)
+
+        inicio_xref = self.posicao
+        total = self.proximo_objeto
+        xref = [b"xref\n0 %d\n" % total, b"0000000000 65535 f \n"]
+        xref.extend(b"%010d 00000 n \n" % self.offsets[n] for n in range(1, total))
+        xref.append(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (total, self.CATALOGO, inicio_xref))
+        return corpo + self._emitir(b"".join(xref))
+
+
+def gerar_pdf(linhas, titulo=None):
+    """Gera os bytes de um PDF com uma linha de texto por item de `linhas`, em pedaços por página"""
+    escritor = EscritorPDF()
+    yield escritor.inicio()
+
+    por_pagina_primeira = (TOPO - BASE - (2 * ENTRELINHA + 20 if titulo else 0)) // ENTRELINHA + 1
+    por_pagina = (TOPO - BASE) // ENTRELINHA + 1
+    pagina = []
+    limite = por_pagina_primeira
+    primeira = True
+    for linha in linhas:
+        pagina.append(linha)
+        if len(pagina) == limite:
+            yield escritor.pagina(pagina, titulo if primeira else None)
+            pagina, limite, primeira = [], por_pagina, False
+    if pagina or primeira:
+        yield escritor.pagina(pagina, titulo if primeira else None)
+    yield escritor.fim()
@@ -1,6 +1,7 @@
+import math
+import unicodedata
 from datetime import datetime
 from utils.categorias import categorizar
-import pandas as pd
 
 def validar_transacao(data, descricao, valor, categoria=None):
     try:
@@ -8,7 +9,7 @@ def validar_transacao(data, descricao, valor, categoria=None):
     except ValueError:
         raise ValueError("Data inválida, use YYYY-MM-DD")
 
-    if valor is not None and not pd.isna(valor):
+    if valor is not None and not (isinstance(valor, float) and math.isnan(valor)):
         try:
             valor = float(valor)
         except ValueError:
@@ -23,10 +24,18 @@ def validar_transacao(data, descricao, valor, categoria=None):
 
     return data, descricao.strip(), valor, categoria
 
-import unicodedata
+def validar_texto(valor, campo):
+    """Texto opcional vindo do JSON: aceita str ou None"""
+    if valor is not None and not isinstance(valor, str):
+        raise ValueError(f"{campo} deve ser texto")
+    return valor
 
-def padronizar_categoria(categoria):
-    categoria = categoria.strip().lower()
-    return ''.join(c for c in unicodedata.normalize('NFD', categoria)
+def normalizar_texto(texto):
+    texto = texto.strip().lower()
+    return ''.join(c for c in unicodedata.normalize('NFD', texto)
                    if unicodedata.category(c) != 'Mn')
 
+
+def padronizar_categoria(categoria):
+    return normalizar_texto(categoria)
+